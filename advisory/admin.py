@@ -1,5 +1,11 @@
+from collections import Counter
+
 from django.contrib import admin
-from .models import AdvisoryLog
+
+from farm.dashboard import invalidate_farmer, invalidate_farmers
+from farm.summary import add_open_advisories
+
+from .models import AdvisoryAlertState, AdvisoryLog, AdvisoryRule, SensorStatistic
 
 
 @admin.register(AdvisoryLog)
@@ -9,3 +15,36 @@ class AdvisoryLogAdmin(admin.ModelAdmin):
     search_fields = ('title', 'message', 'farmer__username')
     readonly_fields = ('created_at',)
 
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_farmer(obj.farmer_id, 'advisories')
+        if not obj.executed:
+            add_open_advisories({obj.farmer_id: -1})
+
+    def delete_queryset(self, request, queryset):
+        deleted = list(queryset.values_list('farmer_id', 'executed'))
+        super().delete_queryset(request, queryset)
+        invalidate_farmers((farmer_id for farmer_id, _ in deleted), 'advisories')
+        opened = Counter(farmer_id for farmer_id, executed in deleted if not executed)
+        add_open_advisories({farmer_id: -total for farmer_id, total in opened.items()})
+
+
+@admin.register(AdvisoryRule)
+class AdvisoryRuleAdmin(admin.ModelAdmin):
+    list_display = ('rule_id', 'name', 'metric', 'comparison', 'threshold_source', 'threshold_value', 'hysteresis', 'cooldown_minutes', 'crop', 'advisory_type', 'priority', 'is_active')
+    list_filter = ('metric', 'advisory_type', 'priority', 'is_active')
+    search_fields = ('name', 'title')
+
+
+@admin.register(AdvisoryAlertState)
+class AdvisoryAlertStateAdmin(admin.ModelAdmin):
+    list_display = ('state_id', 'farm_plot', 'crop', 'rule', 'state', 'opened_at', 'cleared_at', 'notified_at')
+    list_filter = ('state', 'rule')
+    list_select_related = ('farm_plot', 'crop', 'rule')
+
+
+@admin.register(SensorStatistic)
+class SensorStatisticAdmin(admin.ModelAdmin):
+    list_display = ('stat_id', 'farm_plot', 'metric', 'count', 'mean', 'variance', 'last_value', 'last_at', 'alerted_at')
+    list_filter = ('metric',)
+    list_select_related = ('farm_plot',)
@@ -0,0 +1,171 @@
+"""
+Alert state for advisory conditions.
+
+A condition is one rule for one crop on one plot. ``AlertTracker`` walks a
+batch of readings in time order and lets a match through only when its
+condition opens: later readings that break the same rule leave the open
+state alone, and the state clears once the value is back on the safe side
+of the threshold by the rule's hysteresis margin. A condition that re-opens
+within the rule's cooldown of its last advisory opens silently. States are
+only written when they change, and a new condition notifies only if its state
+row is inserted by this batch rather than by a concurrent one. States
+written by a backtest (``backfill=True``) are marked ``backfilled``, so a
+later ``--replace`` removes those and leaves live ones alone.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .engine import METRICS
+from .models import AdvisoryAlertState
+
+STATE_FIELDS = ['state', 'opened_at', 'cleared_at', 'notified_at', 'backfilled']
+
+
+def _clears(value, threshold, below, margin):
+    return value >= threshold + margin if below else value <= threshold - margin
+
+
+class AlertTracker:
+    def __init__(self, plot_ids, backfill=False):
+        self.backfill = backfill
+        self.states = {}
+        self.open = {}
+        self.created = []
+        self.changed = set()
+        self._conditions = {}
+        # Call within a transaction: the rows stay locked until it ends, so a
+        # concurrent batch for the same plots waits and then sees this one's
+        # transitions instead of reopening a condition this one opened.
+        states = AdvisoryAlertState.objects.select_for_update().filter(farm_plot_id__in=plot_ids).order_by('pk')
+        for state in states:
+            key = (state.farm_plot_id, state.crop_id, state.rule_id)
+            self.states[key] = state
+            if state.state == 'open':
+                self.open.setdefault(state.farm_plot_id, set()).add(key)
+
+    def conditions(self, plot_id, resolved):
+        """Return ``{(crop_id, rule_id): (metric, threshold, below, margin)}`` for a plot."""
+        conditions = self._conditions.get(plot_id)
+        if conditions is None:
+            conditions = {}
+            for planting, checks in resolved:
+                for index, (_, _, metric_checks) in enumerate(checks):
+                    for threshold, below, rule, _ in metric_checks:
+                        conditions[(planting.crop_id, rule.rule_id)] = (
+                            METRICS[index], threshold, below, rule.hysteresis,
+                        )
+            self._conditions[plot_id] = conditions
+        return conditions
+
+    def update(self, reading, resolved, matches):
+        """
+        Apply one reading to its plot's states; return the matches to notify.
+
+        ``matches`` are the reading's matches from ``DecisionTable.evaluate``.
+        Readings older than a condition's last transition do not change it.
+        """
+        plot_id = reading.farm_plot_id
+        moment = reading.recorded_at or timezone.now()
+        notify = []
+        fired = set()
+        for match in matches:
+            key = (plot_id, match.planting.crop_id, match.rule.rule_id)
+            if key in fired:
+                continue
+            fired.add(key)
+            if self.open_condition(key, moment, match.rule.cooldown):
+                notify.append(match)
+
+        open_keys = self.open.get(plot_id)
+        if open_keys and len(open_keys) > len(fired):
+            conditions = self.conditions(plot_id, resolved)
+            for key in list(open_keys - fired):
+                condition = conditions.get(key[1:])
+                if condition is None:
+                    continue
+                metric, threshold, below, margin = condition
+                value = getattr(reading, metric)
+                if value is not None and _clears(float(value), threshold, below, margin):
+                    self.clear_condition(key, moment)
+        return notify
+
+    def open_condition(self, key, moment, cooldown):
+        """Record that ``key`` = (plot, crop, rule) broke its rule at ``moment``; return whether to notify."""
+        state = self.states.get(key)
+        if state is None:
+            state = AdvisoryAlertState(
+                farm_plot_id=key[0], crop_id=key[1], rule_id=key[2], state='open', opened_at=moment,
+                backfilled=self.backfill,
+            )
+            self.states[key] = state
+            self.created.append(state)
+        elif state.state == 'open' or moment < (state.cleared_at or state.opened_at):
+            return False
+        else:
+            state.state = 'open'
+            state.opened_at = moment
+            state.cleared_at = None
+            state.backfilled = self.backfill
+            self.changed.add(key)
+        self.open.setdefault(key[0], set()).add(key)
+        if state.notified_at is None or moment - state.notified_at >= cooldown:
+            state.notified_at = moment
+            return True
+        return False
+
+    def clear_condition(self, key, moment):
+        """Clear ``key``'s open condition: a reading at ``moment`` is back on the safe side."""
+        state = self.states.get(key)
+        if state is None or state.state != 'open' or moment < state.opened_at:
+            return
+        state.state = 'cleared'
+        state.cleared_at = moment
+        state.backfilled = self.backfill
+        self.open.get(key[0], set()).discard(key)
+        if state.pk is not None:
+            self.changed.add(key)
+
+    def save(self):
+        """
+        Write the states that changed; return the keys a concurrent batch inserted first.
+
+        Advisories for those keys must not be written: the batch whose insert
+        won has notified them. Their stored states replace this batch's.
+        """
+        lost = set()
+        if self.created:
+            try:
+                with transaction.atomic():
+                    AdvisoryAlertState.objects.bulk_create(self.created)
+            except IntegrityError:
+                for state in self.created:
+                    state.pk = None
+                    try:
+                        with transaction.atomic():
+                            state.save(force_insert=True)
+                    except IntegrityError:
+                        lost.add((state.farm_plot_id, state.crop_id, state.rule_id))
+        changed = [self.states[key] for key in self.changed if self.states[key].pk is not None]
+        if changed:
+            AdvisoryAlertState.objects.bulk_update(changed, STATE_FIELDS)
+        self.created, self.changed = [], set()
+        if lost:
+            self._reload(lost)
+        return lost
+
+    def _reload(self, keys):
+        for key in keys:
+            self.open.get(key[0], set()).discard(key)
+        for state in AdvisoryAlertState.objects.filter(farm_plot_id__in={key[0] for key in keys}):
+            key = (state.farm_plot_id, state.crop_id, state.rule_id)
+            if key in keys:
+                self.states[key] = state
+                if state.state == 'open':
+                    self.open.setdefault(key[0], set()).add(key)
+
+
+def clear_conditions(**filters):
+    """Clear open states matching ``filters``, e.g. when a planting ends."""
+    return AdvisoryAlertState.objects.filter(state='open', **filters).update(
+        state='cleared', cleared_at=timezone.now()
+    )
@@ -0,0 +1,151 @@
+"""
+Streaming anomaly detection for sensor readings.
+
+Each plot keeps one ``SensorStatistic`` row per metric with an
+exponentially weighted mean and variance plus the previous value, so a
+reading is checked in constant time no matter how much history the plot
+has. A reading is flagged when it moves faster than the metric's rate
+limit (units per hour; gaps under an hour count as one hour so sensor
+noise is not read as a slope) or, once the statistics have warmed up,
+when its z-score against the running mean exceeds the limit. One alert
+per plot and metric is raised per cooldown window.
+
+Statistics rows are locked while a batch folds readings into them, so two
+batches for the same plot cannot overwrite each other's updates.
+"""
+import math
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .engine import METRICS
+from .models import SensorStatistic
+
+# Label, unit, default rate limit per hour, the smallest standard
+# deviation used for z-scores (about the sensor's resolution), and the
+# advisory type of a low and a high reading, as in the default rules.
+METRIC_PROFILES = {
+    'temperature': ('Temperature', '°C', 8.0, 0.5, ('other', 'other')),
+    'moisture': ('Soil moisture', '%', 15.0, 1.0, ('irrigation', 'irrigation')),
+    'humidity': ('Air humidity', '%', 25.0, 1.5, ('irrigation', 'pest_control')),
+    'ph_level': ('Soil pH', '', 1.0, 0.05, ('fertilization', 'fertilization')),
+}
+STAT_FIELDS = ['count', 'mean', 'variance', 'last_value', 'last_at', 'alerted_at']
+# An anomaly this many times past its limit is high priority.
+HIGH_SEVERITY = 2.0
+
+# ``severity`` is how many times past its limit (rate or z-score) the reading is.
+Anomaly = namedtuple('Anomaly', ['metric', 'kind', 'value', 'reference', 'elapsed', 'zscore', 'severity'])
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AnomalyTracker:
+    def __init__(self, plot_ids):
+        self.alpha = _setting('ADVISORY_ANOMALY_ALPHA', 0.05)
+        self.z_limit = _setting('ADVISORY_ANOMALY_Z_LIMIT', 4.0)
+        self.warmup = _setting('ADVISORY_ANOMALY_WARMUP', 30)
+        self.cooldown = timedelta(minutes=_setting('ADVISORY_ANOMALY_COOLDOWN_MINUTES', 60))
+        rate_limits = _setting('ADVISORY_ANOMALY_RATE_LIMITS', {})
+        self.rate_limits = {
+            metric: rate_limits.get(metric, profile[2]) for metric, profile in METRIC_PROFILES.items()
+        }
+        # Call within a transaction: the rows stay locked until it ends.
+        stats = SensorStatistic.objects.select_for_update().filter(farm_plot_id__in=plot_ids).order_by('pk')
+        self.stats = {(stat.farm_plot_id, stat.metric): stat for stat in stats}
+        self.created = []
+        self.changed = set()
+
+    def update(self, reading):
+        """
+        Fold one reading into its plot's statistics; return its anomalies.
+
+        Readings must arrive in recorded order per plot; a reading that is
+        not newer than the last one seen is ignored.
+        """
+        moment = reading.recorded_at or timezone.now()
+        anomalies = []
+        for metric in METRICS:
+            raw = getattr(reading, metric)
+            if raw is None:
+                continue
+            value = float(raw)
+            key = (reading.farm_plot_id, metric)
+            stat = self.stats.get(key)
+            if stat is None:
+                stat = SensorStatistic(
+                    farm_plot_id=reading.farm_plot_id, metric=metric, count=1, mean=value, variance=0.0,
+                    last_value=value, last_at=moment,
+                )
+                self.stats[key] = stat
+                self.created.append(stat)
+                continue
+            if stat.last_at is not None and moment <= stat.last_at:
+                continue
+
+            anomaly = self.check(stat, metric, value, moment)
+            if anomaly is not None and (stat.alerted_at is None or moment - stat.alerted_at >= self.cooldown):
+                stat.alerted_at = moment
+                anomalies.append(anomaly)
+
+            diff = value - stat.mean
+            increment = self.alpha * diff
+            stat.mean += increment
+            stat.variance = (1 - self.alpha) * (stat.variance + diff * increment)
+            stat.count += 1
+            stat.last_value = value
+            stat.last_at = moment
+            if stat.pk is not None:
+                self.changed.add(key)
+        return anomalies
+
+    def check(self, stat, metric, value, moment):
+        if stat.last_value is not None and stat.last_at is not None:
+            elapsed = moment - stat.last_at
+            hours = max(elapsed.total_seconds() / 3600, 1.0)
+            severity = abs(value - stat.last_value) / (self.rate_limits[metric] * hours)
+            if severity > 1:
+                return Anomaly(metric, 'rate', value, stat.last_value, elapsed, None, severity)
+        if stat.count >= self.warmup:
+            deviation = max(math.sqrt(stat.variance), METRIC_PROFILES[metric][3])
+            zscore = (value - stat.mean) / deviation
+            if abs(zscore) > self.z_limit:
+                return Anomaly(metric, 'zscore', value, stat.mean, None, zscore, abs(zscore) / self.z_limit)
+        return None
+
+    def save(self):
+        """Write the statistics touched by the batch (one insert and one update at most)."""
+        if self.created:
+            # A concurrent batch for the same plot may have created the row first.
+            SensorStatistic.objects.bulk_create(self.created, ignore_conflicts=True)
+        changed = [self.stats[key] for key in self.changed]
+        if changed:
+            SensorStatistic.objects.bulk_update(changed, STAT_FIELDS)
+
+
+def classify(anomaly):
+    """Return ``(advisory_type, priority)`` for an anomaly."""
+    low, high = METRIC_PROFILES[anomaly.metric][4]
+    advisory_type = high if anomaly.value > anomaly.reference else low
+    return advisory_type, 'high' if anomaly.severity >= HIGH_SEVERITY else 'medium'
+
+
+def render(anomaly):
+    """Return ``(title, message)`` for an anomaly."""
+    label, unit = METRIC_PROFILES[anomaly.metric][:2]
+    if anomaly.kind == 'rate':
+        minutes = max(1, round(anomaly.elapsed.total_seconds() / 60))
+        return (
+            f'Rapid {label} Change',
+            f'{label} changed from {anomaly.reference:.2f}{unit} to {anomaly.value:.2f}{unit} '
+            f'in {minutes} minutes. Check the sensor and the field.',
+        )
+    return (
+        f'Unusual {label} Reading',
+        f'{label} ({anomaly.value:.2f}{unit}) is far from this plot\'s recent average '
+        f'({anomaly.reference:.2f}{unit}, z={anomaly.zscore:+.1f}). Check the sensor and the field.',
+    )
@@ -5,3 +5,5 @@ class AdvisoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'advisory'
 
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,44 @@
+"""
+Checks that the cache is shared between processes.
+
+The planting cache (``advisory.plantings``) and the dashboard panel
+versions (``farm.dashboard``) are invalidated by the process that makes a
+change. With the per-process LocMemCache, the default without
+``REDIS_URL``, other gunicorn workers, the ASGI server and
+``ingest_server`` never see those invalidations and keep serving stale
+entries until they expire. ``check --deploy`` reports this as
+``advisory.W001``; servers log it when they start, because the check
+framework does not run under gunicorn or uvicorn.
+"""
+import logging
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+logger = logging.getLogger(__name__)
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+PROCESS_LOCAL_CACHE = (
+    'The default cache is LocMemCache, which every process keeps to itself: cache invalidations made by '
+    'one web worker, the ASGI server or ingest_server do not reach the others, which keep using stale '
+    'plantings and dashboard panels until ADVISORY_PLANTING_CACHE_TTL and DASHBOARD_CACHE_TTL expire.'
+)
+SHARED_CACHE_HINT = 'Set REDIS_URL so that all processes share one cache.'
+
+
+def process_local_cache():
+    """Whether a deployed (DEBUG off) site runs on a per-process cache."""
+    return not settings.DEBUG and settings.CACHES.get('default', {}).get('BACKEND') == LOCMEM_BACKEND
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not process_local_cache():
+        return []
+    return [Warning(PROCESS_LOCAL_CACHE, hint=SHARED_CACHE_HINT, id='advisory.W001')]
+
+
+def warn_if_process_local_cache():
+    """Log advisory.W001 at server start."""
+    if process_local_cache():
+        logger.warning('%s %s', PROCESS_LOCAL_CACHE, SHARED_CACHE_HINT)
@@ -0,0 +1,226 @@
+"""
+Compiled advisory rule engine.
+
+``AdvisoryRule`` rows are compiled once into a ``DecisionTable``: rules are
+grouped per metric with their thresholds resolved to floats, so evaluating a
+reading is a handful of float comparisons per active planting. The table is
+rebuilt when the rules' version in the database (their count and latest
+``updated_at``) changes. Each process checks it at most every
+``ADVISORY_RULES_CHECK_SECONDS``, so an edit reaches every web worker and
+``ingest_server`` within that time whatever the cache backend; the
+``AdvisoryRule`` signals make the editing process check at once. Writes
+that skip ``save()``, such as ``AdvisoryRule.objects.update(...)``, must
+set ``updated_at`` themselves (``auto_now`` does not apply to them), or
+other processes keep the old rules until the rule count changes.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+METRICS = ('temperature', 'moisture', 'humidity', 'ph_level')
+CROP_RANGE_FIELDS = {
+    'temperature': ('optimal_temperature_min', 'optimal_temperature_max'),
+    'moisture': ('optimal_moisture_min', 'optimal_moisture_max'),
+    'humidity': ('optimal_humidity_min', 'optimal_humidity_max'),
+}
+INF = float('inf')
+
+# One active planting as the engine sees it. ``bounds`` holds a (min, max)
+# float pair per metric (None when the crop has no complete range) and
+# ``limits`` the same values as stored, for message rendering.
+ActivePlanting = namedtuple('ActivePlanting', ['record_id', 'plot_id', 'crop_id', 'crop_name', 'bounds', 'limits'])
+
+CompiledRule = namedtuple('CompiledRule', [
+    'rule_id', 'metric_index', 'below', 'bound_index', 'threshold', 'display_threshold', 'crop_id',
+    'advisory_type', 'priority', 'title', 'template', 'hysteresis', 'cooldown',
+])
+
+Match = namedtuple('Match', ['rule', 'planting', 'value', 'message'])
+
+
+def crop_ranges(crop):
+    """Return ``(bounds, limits)`` for a Crop, in METRICS order."""
+    bounds = []
+    limits = []
+    for metric in METRICS:
+        fields = CROP_RANGE_FIELDS.get(metric)
+        low, high = (getattr(crop, fields[0]), getattr(crop, fields[1])) if fields else (None, None)
+        if low is None or high is None:
+            bounds.append(None)
+            limits.append(None)
+        else:
+            bounds.append((float(low), float(high)))
+            limits.append((low, high))
+    return tuple(bounds), tuple(limits)
+
+
+def active_planting(record, crop):
+    bounds, limits = crop_ranges(crop)
+    return ActivePlanting(record.record_id, record.farm_plot_id, crop.crop_id, crop.name, bounds, limits)
+
+
+class DecisionTable:
+    def __init__(self, rules):
+        by_metric = {metric: [] for metric in METRICS}
+        for rule in rules:
+            if rule.metric not in by_metric:
+                continue
+            if rule.threshold_source == 'fixed':
+                if rule.threshold_value is None:
+                    continue
+                bound_index, threshold = None, float(rule.threshold_value)
+            else:
+                bound_index, threshold = (0 if rule.threshold_source == 'crop_min' else 1), None
+            by_metric[rule.metric].append(CompiledRule(
+                rule.rule_id, METRICS.index(rule.metric), rule.comparison == 'lt',
+                bound_index, threshold, rule.threshold_value, rule.crop_id,
+                rule.advisory_type, rule.priority, rule.title, rule.message_template,
+                float(rule.hysteresis), timedelta(minutes=rule.cooldown_minutes),
+            ))
+        self.rules = tuple(
+            (index, metric, tuple(by_metric[metric]))
+            for index, metric in enumerate(METRICS) if by_metric[metric]
+        )
+        self.metrics = tuple((index, metric) for index, metric, _ in self.rules)
+        self._checks = {}
+
+    def __len__(self):
+        return sum(len(rules) for _, _, rules in self.rules)
+
+    def checks_for(self, planting):
+        """
+        Resolve the table against one crop's ranges.
+
+        Returns one ``(low, high, checks)`` entry per metric in METRICS
+        order. ``checks`` holds ``(threshold, below, rule, message)`` with
+        float thresholds and every placeholder except ``{value}`` filled in;
+        a value inside ``[low, high]`` cannot break any of them, so most
+        readings cost one chained comparison per metric. Memoised per crop
+        and range.
+        """
+        key = (planting.crop_id, planting.bounds)
+        checks = self._checks.get(key)
+        if checks is not None:
+            return checks
+        checks = [(-INF, INF, ())] * len(METRICS)
+        for index, metric, rules in self.rules:
+            bounds = planting.bounds[index]
+            low, high = planting.limits[index] or (None, None)
+            metric_checks = []
+            for rule in rules:
+                if rule.crop_id is not None and rule.crop_id != planting.crop_id:
+                    continue
+                if rule.bound_index is None:
+                    threshold, display = rule.threshold, rule.display_threshold
+                elif bounds is None:
+                    continue
+                else:
+                    threshold = bounds[rule.bound_index]
+                    display = low if rule.bound_index == 0 else high
+                message = _prerender(rule.template, threshold=display, min=low, max=high, crop=planting.crop_name)
+                metric_checks.append((threshold, rule.below, rule, message))
+            safe_low = max((check[0] for check in metric_checks if check[1]), default=-INF)
+            safe_high = min((check[0] for check in metric_checks if not check[1]), default=INF)
+            checks[index] = (safe_low, safe_high, tuple(metric_checks))
+        checks = tuple(checks)
+        self._checks[key] = checks
+        return checks
+
+    def resolve(self, plantings):
+        """Pair each planting with its resolved checks; do this once per batch."""
+        return tuple((planting, self.checks_for(planting)) for planting in plantings or ())
+
+    def evaluate(self, reading, resolved):
+        """
+        Return a Match for every rule a reading breaks.
+
+        ``resolved`` comes from ``resolve()`` for the reading's plot. Each
+        reading value is read and converted once, then compared with every
+        active planting in a single pass.
+        """
+        matches = []
+        if not resolved:
+            return matches
+        for index, metric in self.metrics:
+            raw = getattr(reading, metric)
+            if raw is None:
+                continue
+            value = float(raw)
+            for planting, checks in resolved:
+                low, high, metric_checks = checks[index]
+                if low <= value <= high:
+                    continue
+                for threshold, below, rule, message in metric_checks:
+                    if (value < threshold) if below else (value > threshold):
+                        matches.append(Match(rule, planting, raw, message))
+        return matches
+
+    def render(self, match):
+        """Return ``(title, message)`` for a match."""
+        return match.rule.title, match.message.replace('{value}', str(match.value))
+
+
+def _prerender(template, **values):
+    # Fill every placeholder except {value}, which is substituted per match.
+    placeholders = _Placeholders((key, '-' if value is None else value) for key, value in values.items())
+    placeholders['value'] = '{value}'
+    try:
+        return template.format_map(placeholders)
+    except (ValueError, IndexError):
+        return template
+
+
+class _Placeholders(dict):
+    # Unknown placeholders in an admin-edited template render as "-".
+    def __missing__(self, key):
+        return '-'
+
+
+_lock = threading.Lock()
+_table = None
+_table_version = None
+_checked_at = None
+
+
+def rules_version():
+    """The rules' count and latest change, read with one aggregate query."""
+    from .models import AdvisoryRule
+
+    version = AdvisoryRule.objects.aggregate(count=Count('pk'), changed=Max('updated_at'))
+    return version['count'], version['changed']
+
+
+def bump_rules_version():
+    """Make this process re-read the rules' version on its next evaluation."""
+    global _checked_at
+    _checked_at = None
+
+
+def reset_decision_table():
+    """Forget the compiled table, e.g. after a test built it from rules it rolled back."""
+    global _table, _table_version, _checked_at
+    with _lock:
+        _table = _table_version = _checked_at = None
+
+
+def get_decision_table():
+    """Return the compiled table, rebuilding it if the rules changed."""
+    global _table, _table_version, _checked_at
+    from .models import AdvisoryRule
+
+    checked_at = _checked_at
+    interval = getattr(settings, 'ADVISORY_RULES_CHECK_SECONDS', 5)
+    if _table is not None and checked_at is not None and time.monotonic() - checked_at < interval:
+        return _table
+    version = rules_version()
+    if _table is None or version != _table_version:
+        with _lock:
+            if _table is None or version != _table_version:
+                _table = DecisionTable(AdvisoryRule.objects.filter(is_active=True))
+                _table_version = version
+    _checked_at = time.monotonic()
+    return _table
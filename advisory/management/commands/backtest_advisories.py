@@ -0,0 +1,370 @@
+import itertools
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, FloatField, Q
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from advisory.alerts import AlertTracker
+from advisory.engine import CROP_RANGE_FIELDS, METRICS, _prerender
+from advisory.models import AdvisoryAlertState, AdvisoryLog, AdvisoryRule
+from farm.dashboard import invalidate_farmers
+from farm.summary import add_open_advisories
+from farm.models import Crop, FarmPlot, PlantingRecord, SensorData
+
+OPEN_END = np.inf
+
+
+def _display(value):
+    # Stored values have two decimal places; render them the way the live engine does.
+    return None if np.isnan(value) else f'{value:.2f}'
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min)).timestamp()
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the advisory rules over historical sensor data with NumPy. '
+        'Prints how many readings broke a rule per plot/crop/type (raw hits, before alert '
+        'de-duplication); with --commit the hits go through the alert states like live '
+        'ingestion, so one advisory is written to ADVISORY_LOG, with the reading time, per '
+        'condition that opens outside its rule\'s cooldown.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='First day to replay (YYYY-MM-DD).')
+        parser.add_argument('--end', required=True, help='Last day to replay, inclusive (YYYY-MM-DD).')
+        parser.add_argument('--plot', type=int, action='append', dest='plots', help='Limit to a plot id (repeatable).')
+        parser.add_argument(
+            '--set', action='append', dest='overrides', default=[], metavar='CROP_ID.FIELD=VALUE',
+            help='Try a different crop threshold, e.g. --set 3.optimal_moisture_min=55 (repeatable).',
+        )
+        parser.add_argument('--chunk-size', type=int, default=250000, help='Readings loaded per chunk.')
+        parser.add_argument('--top', type=int, default=30, help='Plot/crop/type rows to print (default: 30).')
+        parser.add_argument('--commit', action='store_true', help='Write the advisories instead of only reporting.')
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='With --commit, first delete the unexecuted rule advisories of the replayed plots in the date range '
+                 '(anomaly, price alert and executed advisories are kept) and the alert states an earlier backtest '
+                 'wrote since its start, which the replay rebuilds. Live alert states are kept.',
+        )
+
+    def handle(self, *args, **options):
+        start, end = parse_date(options['start'] or ''), parse_date(options['end'] or '')
+        if start is None or end is None or start > end:
+            raise CommandError('--start and --end must be dates (YYYY-MM-DD) with start <= end.')
+        if options['replace'] and not options['commit']:
+            raise CommandError('--replace only makes sense with --commit.')
+        started = time.perf_counter()
+        range_start = timezone.make_aware(datetime.combine(start, dt_time.min))
+        range_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min))
+
+        rules = self.load_rules()
+        crop_ids, crop_names, crop_bounds = self.load_crops(options['overrides'])
+        crop_index = {crop_id: position for position, crop_id in enumerate(crop_ids)}
+        self.crop_ids, self.written = crop_ids, 0
+        plantings = self.load_plantings(start, end, options['plots'], crop_index)
+        plot_farmers = dict(FarmPlot.objects.values_list('plot_id', 'farmer_id'))
+
+        counts = Counter()
+        total_readings = 0
+        pending = []
+        tracker = None
+        # A committing run replaces and rebuilds in one transaction, so a
+        # failure halfway leaves the earlier advisories and states in place.
+        with transaction.atomic() if options['commit'] else nullcontext():
+            if options['commit']:
+                plot_ids = options['plots'] or sorted(set(plantings['plot'].tolist()))
+                if options['replace']:
+                    replaced = self.delete_existing(range_start, range_end, plot_ids)
+                    self.stdout.write(f'Deleted {replaced:,} unexecuted rule advisories in the range.')
+                tracker = AlertTracker(plot_ids, backfill=True)
+
+            for chunk in self.iter_chunks(range_start, range_end, options['plots'], options['chunk_size']):
+                total_readings += len(chunk['plot'])
+                reading_idx, planting_idx = self.join(chunk, plantings)
+                if not len(reading_idx):
+                    continue
+                for rule in rules:
+                    fired, clears = self.evaluate(rule, chunk, reading_idx, planting_idx, plantings, crop_bounds,
+                                                  crop_index)
+                    hits = np.flatnonzero(fired)
+                    if len(hits):
+                        keys = np.stack(
+                            [chunk['plot'][reading_idx[hits]], plantings['crop'][planting_idx[hits]]], axis=1
+                        )
+                        unique, per_key = np.unique(keys, axis=0, return_counts=True)
+                        for (plot_id, crop_pos), count in zip(unique.tolist(), per_key.tolist()):
+                            counts[(plot_id, crop_pos, rule['advisory_type'])] += count
+                    if tracker is None:
+                        continue
+                    notified = self.track(tracker, rule, chunk, reading_idx, planting_idx, plantings, fired,
+                                          clears)
+                    if len(notified):
+                        pending.extend(self.build_logs(rule, chunk, reading_idx[notified], planting_idx[notified],
+                                                       plantings, crop_names, crop_bounds, plot_farmers))
+                        if len(pending) >= 5000:
+                            self.write(pending, tracker)
+                            pending = []
+            if tracker is not None:
+                self.write(pending, tracker)
+
+        self.report(counts, crop_names, total_readings, options, time.perf_counter() - started)
+
+    def load_rules(self):
+        rules = []
+        for rule in AdvisoryRule.objects.filter(is_active=True):
+            rules.append({
+                'rule_id': rule.rule_id,
+                'metric': METRICS.index(rule.metric),
+                'below': rule.comparison == 'lt',
+                'bound': None if rule.threshold_source == 'fixed' else (0 if rule.threshold_source == 'crop_min' else 1),
+                'fixed': float(rule.threshold_value) if rule.threshold_value is not None else np.nan,
+                'crop_id': rule.crop_id,
+                'advisory_type': rule.advisory_type,
+                'priority': rule.priority,
+                'margin': float(rule.hysteresis),
+                'cooldown': timedelta(minutes=rule.cooldown_minutes),
+                'title': rule.title,
+                'template': rule.message_template,
+            })
+        if not rules:
+            raise CommandError('No active advisory rules.')
+        return rules
+
+    def load_crops(self, overrides):
+        crops = list(Crop.objects.all())
+        crop_index = {crop.crop_id: position for position, crop in enumerate(crops)}
+        for override in overrides:
+            try:
+                target, value = override.split('=', 1)
+                crop_id, field = target.split('.', 1)
+                crop = crops[crop_index[int(crop_id)]]
+                if field not in {name for pair in CROP_RANGE_FIELDS.values() for name in pair}:
+                    raise ValueError
+                setattr(crop, field, float(value))
+            except (ValueError, KeyError):
+                raise CommandError(f'Bad --set {override!r}; expected CROP_ID.optimal_<metric>_<min|max>=VALUE.')
+        # bounds[metric, min/max, crop position]; NaN where the crop lacks a full range.
+        bounds = np.full((len(METRICS), 2, len(crops)), np.nan)
+        for position, crop in enumerate(crops):
+            for metric_pos, metric in enumerate(METRICS):
+                fields = CROP_RANGE_FIELDS.get(metric)
+                if not fields:
+                    continue
+                low, high = getattr(crop, fields[0]), getattr(crop, fields[1])
+                if low is not None and high is not None:
+                    bounds[metric_pos, 0, position] = float(low)
+                    bounds[metric_pos, 1, position] = float(high)
+        return [crop.crop_id for crop in crops], [crop.name for crop in crops], bounds
+
+    def load_plantings(self, start, end, plots, crop_index):
+        # A planting covers readings from its planting date until it was
+        # harvested; failed or harvested records without a harvest date
+        # end at their expected harvest date, others are still open.
+        records = PlantingRecord.objects.filter(planting_date__lte=end).exclude(actual_harvest_date__lt=start)
+        if plots:
+            records = records.filter(farm_plot_id__in=plots)
+        rows = records.values_list(
+            'farm_plot_id', 'crop_id', 'planting_date', 'actual_harvest_date', 'expected_harvest_date', 'status',
+        ).order_by('farm_plot_id', 'planting_date')
+        plot, crop, begins, ends = [], [], [], []
+        for plot_id, crop_id, planted, harvested, expected, status in rows:
+            finished = harvested or (expected if status in ('harvested', 'failed') else None)
+            plot.append(plot_id)
+            crop.append(crop_index[crop_id])
+            begins.append(_day_start(planted))
+            ends.append(_day_start(finished + timedelta(days=1)) if finished else OPEN_END)
+        return {
+            'plot': np.array(plot, dtype=np.int64),
+            'crop': np.array(crop, dtype=np.int64),
+            'start': np.array(begins, dtype=float),
+            'end': np.array(ends, dtype=float),
+        }
+
+    def iter_chunks(self, range_start, range_end, plots, chunk_size):
+        readings = SensorData.objects.filter(recorded_at__gte=range_start, recorded_at__lt=range_end)
+        if plots:
+            readings = readings.filter(farm_plot_id__in=plots)
+        # Alert states are replayed chunk by chunk, so chunks follow reading
+        # time; history imported out of order has ids out of time order. One
+        # streamed query sorts the range once.
+        readings = readings.annotate(
+            **{f'{metric}_value': Cast(metric, FloatField()) for metric in METRICS}
+        ).order_by('recorded_at', 'data_id')
+        columns = ['farm_plot_id', 'recorded_at', *(f'{metric}_value' for metric in METRICS)]
+        rows = readings.values_list(*columns).iterator(chunk_size=min(chunk_size, 10000))
+        while batch := list(itertools.islice(rows, chunk_size)):
+            plot, recorded, *metrics = zip(*batch)
+            yield {
+                'plot': np.array(plot, dtype=np.int64),
+                'time': np.array([moment.timestamp() for moment in recorded], dtype=float),
+                'values': np.array(metrics, dtype=float),
+            }
+
+    def join(self, chunk, plantings):
+        """Return parallel (reading, planting) index arrays for every covering planting."""
+        order = np.argsort(chunk['plot'], kind='stable')
+        sorted_plots = chunk['plot'][order]
+        reading_parts, planting_parts = [], []
+        for position in range(len(plantings['plot'])):
+            plot_id = plantings['plot'][position]
+            low = np.searchsorted(sorted_plots, plot_id, side='left')
+            high = np.searchsorted(sorted_plots, plot_id, side='right')
+            if low == high:
+                continue
+            candidates = order[low:high]
+            times = chunk['time'][candidates]
+            covered = candidates[(times >= plantings['start'][position]) & (times < plantings['end'][position])]
+            if len(covered):
+                reading_parts.append(covered)
+                planting_parts.append(np.full(len(covered), position, dtype=np.int64))
+        if not reading_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(reading_parts), np.concatenate(planting_parts)
+
+    def evaluate(self, rule, chunk, reading_idx, planting_idx, plantings, crop_bounds, crop_index):
+        """
+        Return masks over the joined arrays of where ``rule`` fires and where
+        the value is back on the safe side by the rule's hysteresis margin.
+        """
+        values = chunk['values'][rule['metric'], reading_idx]
+        crops = plantings['crop'][planting_idx]
+        if rule['bound'] is None:
+            thresholds = np.full(len(values), rule['fixed'])
+        else:
+            # Crop-range rules need both bounds, like the live engine.
+            thresholds = crop_bounds[rule['metric'], rule['bound'], crops]
+            thresholds = np.where(np.isnan(crop_bounds[rule['metric'], 1 - rule['bound'], crops]), np.nan, thresholds)
+        if rule['crop_id'] is not None:
+            thresholds = np.where(crops == crop_index.get(rule['crop_id'], -1), thresholds, np.nan)
+        with np.errstate(invalid='ignore'):
+            if rule['below']:
+                return values < thresholds, values >= thresholds + rule['margin']
+            return values > thresholds, values <= thresholds - rule['margin']
+
+    def track(self, tracker, rule, chunk, reading_idx, planting_idx, plantings, fired, clears):
+        """
+        Apply ``rule``'s hits and clearing readings to ``tracker`` in time
+        order per condition; return the joined positions that notify.
+        """
+        events = np.flatnonzero(fired | clears)
+        plots = chunk['plot'][reading_idx[events]]
+        crops = plantings['crop'][planting_idx[events]]
+        times = chunk['time'][reading_idx[events]]
+        # Like live ingestion, readings older than a condition's last transition leave it alone.
+        pairs, inverse = np.unique(np.stack([plots, crops], axis=1).reshape(-1, 2), axis=0, return_inverse=True)
+        resume = np.full(len(pairs), -np.inf)
+        for position, (plot_id, crop_pos) in enumerate(pairs.tolist()):
+            state = tracker.states.get((plot_id, self.crop_ids[crop_pos], rule['rule_id']))
+            if state is not None:
+                resume[position] = (state.cleared_at or state.opened_at).timestamp()
+        current = times >= resume[inverse.reshape(-1)]
+        events, plots, crops, times = events[current], plots[current], crops[current], times[current]
+        order = np.lexsort((times, crops, plots))
+        events, plots, crops, times = events[order], plots[order], crops[order], times[order]
+        kinds = fired[events]
+        # From there on only a change between breaking and clearing can move a condition.
+        changes = np.ones(len(events), dtype=bool)
+        changes[1:] = (plots[1:] != plots[:-1]) | (crops[1:] != crops[:-1]) | (kinds[1:] != kinds[:-1])
+        notified = []
+        for position, plot_id, crop_pos, moment, fires in zip(
+            events[changes].tolist(), plots[changes].tolist(), crops[changes].tolist(), times[changes].tolist(),
+            kinds[changes].tolist(),
+        ):
+            key = (plot_id, self.crop_ids[crop_pos], rule['rule_id'])
+            moment = datetime.fromtimestamp(moment, tz=dt_timezone.utc)
+            if not fires:
+                tracker.clear_condition(key, moment)
+            elif tracker.open_condition(key, moment, rule['cooldown']):
+                notified.append(position)
+        return np.array(notified, dtype=np.int64)
+
+    def build_logs(self, rule, chunk, hit_readings, hit_plantings, plantings, crop_names, crop_bounds, plot_farmers):
+        logs = []
+        metric = rule['metric']
+        for reading, planting in zip(hit_readings.tolist(), hit_plantings.tolist()):
+            crop_pos = int(plantings['crop'][planting])
+            plot_id = int(chunk['plot'][reading])
+            low, high = crop_bounds[metric, 0, crop_pos], crop_bounds[metric, 1, crop_pos]
+            threshold = rule['fixed'] if rule['bound'] is None else (low, high)[rule['bound']]
+            message = _prerender(
+                rule['template'], threshold=_display(threshold), min=_display(low), max=_display(high),
+                crop=crop_names[crop_pos],
+            ).replace('{value}', _display(chunk['values'][metric, reading]))
+            logs.append(AdvisoryLog(
+                farmer_id=plot_farmers[plot_id],
+                advisory_type=rule['advisory_type'],
+                title=rule['title'],
+                message=message,
+                farm_plot_id=plot_id,
+                crop_id=self.crop_ids[crop_pos],
+                rule_id=rule['rule_id'],
+                priority=rule['priority'],
+                created_at=datetime.fromtimestamp(chunk['time'][reading], tz=dt_timezone.utc),
+            ))
+        return logs
+
+    def delete_existing(self, range_start, range_end, plot_ids):
+        # Only what a replay rewrites: rule advisories nobody has acted on yet,
+        # and the states an earlier backtest left that the replayed readings
+        # would otherwise be older than. Live states stay; the replay skips
+        # readings older than their last transition.
+        AdvisoryAlertState.objects.filter(farm_plot_id__in=plot_ids, backfilled=True).filter(
+            Q(opened_at__gte=range_start) | Q(cleared_at__gte=range_start)
+        ).delete()
+        existing = AdvisoryLog.objects.filter(
+            created_at__gte=range_start, created_at__lt=range_end, rule__isnull=False, executed=False,
+        )
+        existing = existing.filter(farm_plot_id__in=plot_ids)
+        invalidate_farmers(
+            FarmPlot.objects.filter(plot_id__in=plot_ids).values_list('farmer_id', flat=True), 'advisories'
+        )
+        open_counts = existing.values('farmer_id').annotate(total=Count('pk'))
+        add_open_advisories({row['farmer_id']: -row['total'] for row in open_counts})
+        deleted, _ = existing.delete()
+        return deleted
+
+    @transaction.atomic
+    def write(self, logs, tracker):
+        lost = tracker.save()
+        if lost:
+            logs = [log for log in logs if (log.farm_plot_id, log.crop_id, log.rule_id) not in lost]
+        AdvisoryLog.objects.bulk_create(logs, batch_size=1000)
+        invalidate_farmers((log.farmer_id for log in logs), 'advisories')
+        add_open_advisories(Counter(log.farmer_id for log in logs))
+        self.written += len(logs)
+
+    def report(self, counts, crop_names, total_readings, options, elapsed):
+        plot_locations = dict(FarmPlot.objects.filter(
+            plot_id__in={plot_id for plot_id, _, _ in counts}
+        ).values_list('plot_id', 'location'))
+        total = sum(counts.values())
+        self.stdout.write(f'{"Plot":<32} {"Crop":<28} {"Type":<14} {"Advisories":>10}')
+        for (plot_id, crop_pos, advisory_type), count in counts.most_common(options['top']):
+            plot = f'#{plot_id} {plot_locations.get(plot_id, "")}'
+            self.stdout.write(f'{plot[:32]:<32} {crop_names[crop_pos][:28]:<28} {advisory_type:<14} {count:>10,}')
+        if len(counts) > options['top']:
+            self.stdout.write(f'... {len(counts) - options["top"]:,} more plot/crop/type combinations')
+
+        by_type = Counter()
+        for (_, _, advisory_type), count in counts.items():
+            by_type[advisory_type] += count
+        self.stdout.write('')
+        for advisory_type, count in by_type.most_common():
+            self.stdout.write(f'{advisory_type:<14} {count:>10,}')
+        rate = total_readings / elapsed if elapsed else total_readings
+        self.stdout.write(self.style.SUCCESS(
+            f'{total:,} advisories from {total_readings:,} readings in {elapsed:.1f}s ({rate:,.0f} readings/s).'
+        ))
+        if options['commit']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {self.written:,} advisories.'))
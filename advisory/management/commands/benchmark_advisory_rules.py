@@ -0,0 +1,149 @@
+import gc
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from advisory.engine import DecisionTable, active_planting
+from advisory.models import AdvisoryRule
+from farm.models import Crop, PlantingRecord, SensorData
+
+
+def legacy_evaluate(crop, sensor_data):
+    # The hand-written chain generate_advisory() used before the rule
+    # engine, kept here as the baseline to measure against.
+    advisories = []
+    if sensor_data.moisture is not None and crop.optimal_moisture_min and crop.optimal_moisture_max:
+        if float(sensor_data.moisture) < float(crop.optimal_moisture_min):
+            advisories.append({
+                'type': 'irrigation',
+                'title': 'Low Soil Moisture Detected',
+                'message': f'Soil moisture ({sensor_data.moisture}%) is below optimal range ({crop.optimal_moisture_min}-{crop.optimal_moisture_max}%). Please irrigate the field.',
+                'priority': 'high'
+            })
+        elif float(sensor_data.moisture) > float(crop.optimal_moisture_max):
+            advisories.append({
+                'type': 'irrigation',
+                'title': 'High Soil Moisture Detected',
+                'message': f'Soil moisture ({sensor_data.moisture}%) is above optimal range. Consider reducing irrigation.',
+                'priority': 'medium'
+            })
+    if sensor_data.temperature is not None and crop.optimal_temperature_min and crop.optimal_temperature_max:
+        if float(sensor_data.temperature) < float(crop.optimal_temperature_min):
+            advisories.append({
+                'type': 'other',
+                'title': 'Low Temperature Alert',
+                'message': f'Temperature ({sensor_data.temperature}°C) is below optimal range ({crop.optimal_temperature_min}-{crop.optimal_temperature_max}°C). Consider protective measures.',
+                'priority': 'medium'
+            })
+        elif float(sensor_data.temperature) > float(crop.optimal_temperature_max):
+            advisories.append({
+                'type': 'other',
+                'title': 'High Temperature Alert',
+                'message': f'Temperature ({sensor_data.temperature}°C) is above optimal range. Ensure adequate irrigation.',
+                'priority': 'high'
+            })
+    if sensor_data.humidity is not None and crop.optimal_humidity_min and crop.optimal_humidity_max:
+        if float(sensor_data.humidity) < float(crop.optimal_humidity_min):
+            advisories.append({
+                'type': 'irrigation',
+                'title': 'Low Humidity Alert',
+                'message': f'Air humidity ({sensor_data.humidity}%) is below optimal range. Consider increasing irrigation frequency.',
+                'priority': 'medium'
+            })
+        elif float(sensor_data.humidity) > float(crop.optimal_humidity_max):
+            advisories.append({
+                'type': 'pest_control',
+                'title': 'High Humidity Alert',
+                'message': f'High humidity ({sensor_data.humidity}%) may promote fungal growth. Monitor for diseases.',
+                'priority': 'medium'
+            })
+    return advisories
+
+
+def _decimal(rng, low, high):
+    return Decimal(f'{rng.uniform(low, high):.2f}')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the compiled advisory rule table against the former if/elif evaluation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=200000, help='Synthetic readings to evaluate.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the best one is reported.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rules = list(AdvisoryRule.objects.filter(is_active=True))
+        if not rules:
+            raise CommandError('No active advisory rules; run migrations first.')
+        rng = random.Random(options['seed'])
+        crops = [
+            Crop(crop_id=index, name=f'Crop {index}',
+                 optimal_temperature_min=_decimal(rng, 22, 26), optimal_temperature_max=_decimal(rng, 31, 35),
+                 optimal_moisture_min=_decimal(rng, 55, 70), optimal_moisture_max=_decimal(rng, 80, 95),
+                 optimal_humidity_min=_decimal(rng, 65, 75), optimal_humidity_max=_decimal(rng, 88, 98))
+            for index in range(1, 11)
+        ]
+        readings = [
+            (rng.choice(crops), SensorData(
+                farm_plot_id=1,
+                temperature=_decimal(rng, 23, 34), moisture=_decimal(rng, 58, 92),
+                humidity=_decimal(rng, 68, 96), ph_level=_decimal(rng, 5.4, 7.6),
+            ))
+            for _ in range(options['readings'])
+        ]
+
+        plantings = {
+            crop.crop_id: [active_planting(PlantingRecord(record_id=crop.crop_id, farm_plot_id=1), crop)]
+            for crop in crops
+        }
+        # Same six checks as the legacy chain first, then every active rule.
+        legacy_rules = [rule for rule in rules if rule.threshold_source != 'fixed' and rule.crop_id is None]
+        results = [
+            ('Legacy if/elif', self.timed(self.run_legacy, readings, options['repeat'])),
+            ('Compiled table (same rules)', self.timed(
+                lambda items: self.run_engine(DecisionTable(legacy_rules), items, plantings),
+                readings, options['repeat'])),
+            ('Compiled table (all rules)', self.timed(
+                lambda items: self.run_engine(DecisionTable(rules), items, plantings),
+                readings, options['repeat'])),
+        ]
+
+        count = len(readings)
+        baseline = results[0][1][0]
+        self.stdout.write(f'Readings: {count:,}   active rules: {len(rules)}   best of {options["repeat"]}')
+        for label, (elapsed, matches) in results:
+            self.stdout.write(
+                f'{label:28}: {elapsed / count * 1e6:6.2f} us/reading  ({matches:,} advisories, '
+                f'{baseline / elapsed:.2f}x)'
+            )
+
+    def timed(self, run, readings, repeat):
+        best = None
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                matches = run(readings)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+        finally:
+            gc.enable()
+        return best, matches
+
+    def run_legacy(self, readings):
+        matches = 0
+        for crop, reading in readings:
+            matches += len(legacy_evaluate(crop, reading))
+        return matches
+
+    def run_engine(self, table, readings, plantings):
+        resolved = {crop_id: table.resolve(crop_plantings) for crop_id, crop_plantings in plantings.items()}
+        matches = 0
+        for crop, reading in readings:
+            for match in table.evaluate(reading, resolved[crop.crop_id]):
+                table.render(match)
+                matches += 1
+        return matches
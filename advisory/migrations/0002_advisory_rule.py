@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0004_sensor_data_unique_reading'),
+        ('advisory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdvisoryRule',
+            fields=[
+                ('rule_id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('metric', models.CharField(choices=[('temperature', 'Temperature'), ('moisture', 'Soil Moisture'), ('humidity', 'Humidity'), ('ph_level', 'pH Level')], max_length=20)),
+                ('comparison', models.CharField(choices=[('lt', 'Below threshold'), ('gt', 'Above threshold')], max_length=2)),
+                ('threshold_source', models.CharField(choices=[('crop_min', "Crop's optimal minimum"), ('crop_max', "Crop's optimal maximum"), ('fixed', 'Fixed value')], max_length=10)),
+                ('threshold_value', models.DecimalField(blank=True, decimal_places=2, help_text='Only used with a fixed threshold.', max_digits=6, null=True)),
+                ('advisory_type', models.CharField(choices=[('irrigation', 'Irrigation'), ('fertilization', 'Fertilization'), ('pest_control', 'Pest Control'), ('harvest', 'Harvest'), ('other', 'Other')], max_length=50)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='medium', max_length=20)),
+                ('title', models.CharField(max_length=255)),
+                ('message_template', models.TextField(help_text='Placeholders: {value}, {threshold}, {min}, {max}, {crop}.')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('crop', models.ForeignKey(blank=True, help_text='Leave empty to apply the rule to every crop.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='advisory_rules', to='farm.crop')),
+            ],
+            options={
+                'verbose_name': 'Advisory Rule',
+                'verbose_name_plural': 'Advisory Rules',
+                'db_table': 'ADVISORY_RULE',
+                'ordering': ['metric', 'rule_id'],
+            },
+        ),
+    ]
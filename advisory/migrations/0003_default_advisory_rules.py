@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# The checks generate_advisory() used to hard-code, plus pH checks against
+# the usual 5.5-7.5 band because crops carry no optimal pH range.
+DEFAULT_RULES = [
+    ('Low soil moisture', 'moisture', 'lt', 'crop_min', None, 'irrigation', 'high',
+     'Low Soil Moisture Detected',
+     'Soil moisture ({value}%) is below optimal range ({min}-{max}%). Please irrigate the field.'),
+    ('High soil moisture', 'moisture', 'gt', 'crop_max', None, 'irrigation', 'medium',
+     'High Soil Moisture Detected',
+     'Soil moisture ({value}%) is above optimal range. Consider reducing irrigation.'),
+    ('Low temperature', 'temperature', 'lt', 'crop_min', None, 'other', 'medium',
+     'Low Temperature Alert',
+     'Temperature ({value}°C) is below optimal range ({min}-{max}°C). Consider protective measures.'),
+    ('High temperature', 'temperature', 'gt', 'crop_max', None, 'other', 'high',
+     'High Temperature Alert',
+     'Temperature ({value}°C) is above optimal range. Ensure adequate irrigation.'),
+    ('Low humidity', 'humidity', 'lt', 'crop_min', None, 'irrigation', 'medium',
+     'Low Humidity Alert',
+     'Air humidity ({value}%) is below optimal range. Consider increasing irrigation frequency.'),
+    ('High humidity', 'humidity', 'gt', 'crop_max', None, 'pest_control', 'medium',
+     'High Humidity Alert',
+     'High humidity ({value}%) may promote fungal growth. Monitor for diseases.'),
+    ('Acidic soil', 'ph_level', 'lt', 'fixed', '5.50', 'fertilization', 'medium',
+     'Acidic Soil Detected',
+     'Soil pH ({value}) is below {threshold}. Consider applying agricultural lime.'),
+    ('Alkaline soil', 'ph_level', 'gt', 'fixed', '7.50', 'fertilization', 'medium',
+     'Alkaline Soil Detected',
+     'Soil pH ({value}) is above {threshold}. Consider sulphur or acidifying fertiliser.'),
+]
+
+
+def create_default_rules(apps, schema_editor):
+    AdvisoryRule = apps.get_model('advisory', 'AdvisoryRule')
+    AdvisoryRule.objects.bulk_create([
+        AdvisoryRule(
+            name=name,
+            metric=metric,
+            comparison=comparison,
+            threshold_source=source,
+            threshold_value=value,
+            advisory_type=advisory_type,
+            priority=priority,
+            title=title,
+            message_template=template,
+        )
+        for name, metric, comparison, source, value, advisory_type, priority, title, template in DEFAULT_RULES
+    ])
+
+
+def remove_default_rules(apps, schema_editor):
+    AdvisoryRule = apps.get_model('advisory', 'AdvisoryRule')
+    AdvisoryRule.objects.filter(name__in=[rule[0] for rule in DEFAULT_RULES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisory', '0002_advisory_rule'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_rules, remove_default_rules),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisory', '0003_default_advisory_rules'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='advisorylog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Margins roughly twice the usual sensor noise for each metric.
+DEFAULT_HYSTERESIS = {
+    'temperature': '1.00',
+    'moisture': '2.00',
+    'humidity': '2.00',
+    'ph_level': '0.10',
+}
+
+
+def set_default_hysteresis(apps, schema_editor):
+    AdvisoryRule = apps.get_model('advisory', 'AdvisoryRule')
+    for metric, margin in DEFAULT_HYSTERESIS.items():
+        AdvisoryRule.objects.filter(metric=metric, hysteresis=0).update(hysteresis=margin)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0004_sensor_data_unique_reading'),
+        ('advisory', '0004_advisory_log_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advisoryrule',
+            name='cooldown_minutes',
+            field=models.PositiveIntegerField(default=60, help_text='A condition that re-opens within this many minutes of its last advisory does not write another one.'),
+        ),
+        migrations.AddField(
+            model_name='advisoryrule',
+            name='hysteresis',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='An open alert clears only once the value is this far back on the safe side of the threshold.', max_digits=6),
+        ),
+        migrations.RunPython(set_default_hysteresis, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='AdvisoryAlertState',
+            fields=[
+                ('state_id', models.AutoField(primary_key=True, serialize=False)),
+                ('state', models.CharField(choices=[('open', 'Open'), ('cleared', 'Cleared')], default='open', max_length=10)),
+                ('opened_at', models.DateTimeField()),
+                ('cleared_at', models.DateTimeField(blank=True, null=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('crop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to='farm.crop')),
+                ('farm_plot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to='farm.farmplot')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to='advisory.advisoryrule')),
+            ],
+            options={
+                'verbose_name': 'Advisory Alert State',
+                'verbose_name_plural': 'Advisory Alert States',
+                'db_table': 'ADVISORY_ALERT_STATE',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='advisoryalertstate',
+            constraint=models.UniqueConstraint(fields=('farm_plot', 'crop', 'rule'), name='unique_alert_state_per_condition'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0004_sensor_data_unique_reading'),
+        ('advisory', '0005_advisory_alert_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorStatistic',
+            fields=[
+                ('stat_id', models.AutoField(primary_key=True, serialize=False)),
+                ('metric', models.CharField(choices=[('temperature', 'Temperature'), ('moisture', 'Soil Moisture'), ('humidity', 'Humidity'), ('ph_level', 'pH Level')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('variance', models.FloatField(default=0)),
+                ('last_value', models.FloatField(blank=True, null=True)),
+                ('last_at', models.DateTimeField(blank=True, null=True)),
+                ('alerted_at', models.DateTimeField(blank=True, null=True)),
+                ('farm_plot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sensor_statistics', to='farm.farmplot')),
+            ],
+            options={
+                'verbose_name': 'Sensor Statistic',
+                'verbose_name_plural': 'Sensor Statistics',
+                'db_table': 'SENSOR_STATISTIC',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sensorstatistic',
+            constraint=models.UniqueConstraint(fields=('farm_plot', 'metric'), name='unique_sensor_statistic_per_metric'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisory', '0006_sensor_statistic'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='advisorylog',
+            index=models.Index(fields=['farmer', '-created_at'], name='advisory_farmer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='advisorylog',
+            index=models.Index(condition=models.Q(('executed', False)), fields=['farmer', '-created_at'], name='advisory_farmer_open_idx'),
+        ),
+    ]
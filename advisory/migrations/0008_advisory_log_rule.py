@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisory', '0007_advisory_log_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advisorylog',
+            name='rule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='advisories', to='advisory.advisoryrule'),
+        ),
+    ]
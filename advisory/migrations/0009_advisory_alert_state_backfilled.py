@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advisory', '0008_advisory_log_rule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='advisoryalertstate',
+            name='backfilled',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 Farmer = get_user_model()
 
@@ -20,9 +22,11 @@ class AdvisoryLog(models.Model):
     message = models.TextField()
     farm_plot = models.ForeignKey('farm.FarmPlot', on_delete=models.CASCADE, null=True, blank=True, related_name='advisories')
     crop = models.ForeignKey('farm.Crop', on_delete=models.CASCADE, null=True, blank=True, related_name='advisories')
+    # The rule that wrote the advisory; empty for anomaly, price alert and manual advisories.
+    rule = models.ForeignKey('AdvisoryRule', on_delete=models.SET_NULL, null=True, blank=True, related_name='advisories')
     executed = models.BooleanField(default=False)
     executed_at = models.DateTimeField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
     priority = models.CharField(max_length=20, default='medium')
     
     class Meta:
@@ -30,7 +34,143 @@ class AdvisoryLog(models.Model):
         verbose_name = 'Advisory Log'
         verbose_name_plural = 'Advisory Logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['farmer', '-created_at'], name='advisory_farmer_created_idx'),
+            # Dashboard and "not executed" filter; skipped on backends without partial indexes.
+            models.Index(fields=['farmer', '-created_at'], condition=models.Q(executed=False),
+                         name='advisory_farmer_open_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.farmer.username}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        advisory = super().from_db(db, field_names, values)
+        # The stored farmer and executed flag, which advisory.signals moves
+        # the open advisory counters away from on save without a query.
+        if {'farmer_id', 'executed'} <= set(field_names):
+            advisory._stored_open = (advisory.farmer_id, advisory.executed)
+        return advisory
+
+
+class AdvisoryRule(models.Model):
+    METRIC_CHOICES = [
+        ('temperature', 'Temperature'),
+        ('moisture', 'Soil Moisture'),
+        ('humidity', 'Humidity'),
+        ('ph_level', 'pH Level'),
+    ]
+    COMPARISON_CHOICES = [
+        ('lt', 'Below threshold'),
+        ('gt', 'Above threshold'),
+    ]
+    THRESHOLD_SOURCE_CHOICES = [
+        ('crop_min', "Crop's optimal minimum"),
+        ('crop_max', "Crop's optimal maximum"),
+        ('fixed', 'Fixed value'),
+    ]
+    PRIORITY_CHOICES = [
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+    ]
+    
+    rule_id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    comparison = models.CharField(max_length=2, choices=COMPARISON_CHOICES)
+    threshold_source = models.CharField(max_length=10, choices=THRESHOLD_SOURCE_CHOICES)
+    threshold_value = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True,
+                                          help_text='Only used with a fixed threshold.')
+    crop = models.ForeignKey('farm.Crop', on_delete=models.CASCADE, null=True, blank=True, related_name='advisory_rules',
+                             help_text='Leave empty to apply the rule to every crop.')
+    advisory_type = models.CharField(max_length=50, choices=AdvisoryLog.ADVISORY_TYPE_CHOICES)
+    priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='medium')
+    title = models.CharField(max_length=255)
+    message_template = models.TextField(
+        help_text='Placeholders: {value}, {threshold}, {min}, {max}, {crop}.'
+    )
+    hysteresis = models.DecimalField(
+        max_digits=6, decimal_places=2, default=0,
+        help_text='An open alert clears only once the value is this far back on the safe side of the threshold.'
+    )
+    cooldown_minutes = models.PositiveIntegerField(
+        default=60,
+        help_text='A condition that re-opens within this many minutes of its last advisory does not write another one.'
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'ADVISORY_RULE'
+        verbose_name = 'Advisory Rule'
+        verbose_name_plural = 'Advisory Rules'
+        ordering = ['metric', 'rule_id']
+    
+    def __str__(self):
+        return self.name
+    
+    def clean(self):
+        if self.threshold_source == 'fixed' and self.threshold_value is None:
+            raise ValidationError({'threshold_value': 'A fixed threshold needs a value.'})
+
 
+class AdvisoryAlertState(models.Model):
+    """
+    Whether a rule's condition currently holds for a crop on a plot.
+
+    Advisories are written when the state opens, not for every reading that
+    breaks the rule; see ``advisory.alerts``.
+    """
+    STATE_CHOICES = [
+        ('open', 'Open'),
+        ('cleared', 'Cleared'),
+    ]
+    
+    state_id = models.AutoField(primary_key=True)
+    farm_plot = models.ForeignKey('farm.FarmPlot', on_delete=models.CASCADE, related_name='alert_states')
+    crop = models.ForeignKey('farm.Crop', on_delete=models.CASCADE, related_name='alert_states')
+    rule = models.ForeignKey(AdvisoryRule, on_delete=models.CASCADE, related_name='alert_states')
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='open')
+    opened_at = models.DateTimeField()
+    cleared_at = models.DateTimeField(null=True, blank=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    # Last written by backtest_advisories --commit rather than live ingestion.
+    backfilled = models.BooleanField(default=False)
+    
+    class Meta:
+        db_table = 'ADVISORY_ALERT_STATE'
+        verbose_name = 'Advisory Alert State'
+        verbose_name_plural = 'Advisory Alert States'
+        constraints = [
+            models.UniqueConstraint(fields=['farm_plot', 'crop', 'rule'], name='unique_alert_state_per_condition'),
+        ]
+    
+    def __str__(self):
+        return f"{self.rule} - plot {self.farm_plot_id} ({self.state})"
+
+
+class SensorStatistic(models.Model):
+    """Running statistics of one metric on one plot, updated per reading."""
+    stat_id = models.AutoField(primary_key=True)
+    farm_plot = models.ForeignKey('farm.FarmPlot', on_delete=models.CASCADE, related_name='sensor_statistics')
+    metric = models.CharField(max_length=20, choices=AdvisoryRule.METRIC_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    variance = models.FloatField(default=0)
+    last_value = models.FloatField(null=True, blank=True)
+    last_at = models.DateTimeField(null=True, blank=True)
+    alerted_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'SENSOR_STATISTIC'
+        verbose_name = 'Sensor Statistic'
+        verbose_name_plural = 'Sensor Statistics'
+        constraints = [
+            models.UniqueConstraint(fields=['farm_plot', 'metric'], name='unique_sensor_statistic_per_metric'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_metric_display()} - plot {self.farm_plot_id}"
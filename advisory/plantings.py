@@ -0,0 +1,96 @@
+"""
+Cached active plantings for the advisory hot path.
+
+Two kinds of entries live in the Django cache: ``advisory:plot:<id>`` holds
+the ``(record_id, crop_id)`` pairs of a plot's planted/growing records, and
+``advisory:crop:<id>`` a crop's name and threshold ranges. A batch of
+readings costs two ``get_many`` calls and no queries once the entries are
+warm. The ``PlantingRecord`` and ``Crop`` signals delete the affected
+entries once the change commits; deleting earlier would let a concurrent
+reader cache the pre-commit rows again. ``ADVISORY_PLANTING_CACHE_TTL``
+bounds how long a change made without signals (``QuerySet.update()``, raw
+SQL) can go unnoticed. Web workers, the ASGI server and ``ingest_server``
+only see each other's deletes through a shared cache (``REDIS_URL``; see
+``advisory.checks``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from farm.models import Crop, PlantingRecord
+
+from .engine import ActivePlanting, crop_ranges
+
+ACTIVE_STATUSES = ('planted', 'growing')
+
+
+def cache_ttl():
+    return getattr(settings, 'ADVISORY_PLANTING_CACHE_TTL', 3600)
+
+
+def plot_key(plot_id):
+    return f'advisory:plot:{plot_id}'
+
+
+def crop_key(crop_id):
+    return f'advisory:crop:{crop_id}'
+
+
+def _crop_entry(crop):
+    bounds, limits = crop_ranges(crop)
+    return crop.name, bounds, limits
+
+
+def active_plantings_for(plot_ids):
+    """
+    Return ``{plot_id: [ActivePlanting, ...]}`` for the given plots.
+
+    Plots and crops missing from the cache are loaded with one query each
+    and stored, including plots without an active planting.
+    """
+    plot_ids = list(plot_ids)
+    cached = cache.get_many([plot_key(plot_id) for plot_id in plot_ids])
+    pairs = {plot_id: cached[plot_key(plot_id)] for plot_id in plot_ids if plot_key(plot_id) in cached}
+    crops = {}
+
+    missing = [plot_id for plot_id in plot_ids if plot_id not in pairs]
+    if missing:
+        loaded = {plot_id: [] for plot_id in missing}
+        records = PlantingRecord.objects.filter(
+            farm_plot_id__in=missing,
+            status__in=ACTIVE_STATUSES
+        ).select_related('crop')
+        for record in records:
+            loaded[record.farm_plot_id].append((record.record_id, record.crop_id))
+            crops[record.crop_id] = _crop_entry(record.crop)
+        cache.set_many({plot_key(plot_id): entry for plot_id, entry in loaded.items()}, cache_ttl())
+        cache.set_many({crop_key(crop_id): entry for crop_id, entry in crops.items()}, cache_ttl())
+        pairs.update(loaded)
+
+    crop_ids = {crop_id for entry in pairs.values() for _, crop_id in entry} - crops.keys()
+    if crop_ids:
+        cached = cache.get_many([crop_key(crop_id) for crop_id in crop_ids])
+        crops.update({crop_id: cached[crop_key(crop_id)] for crop_id in crop_ids if crop_key(crop_id) in cached})
+        missing = crop_ids - crops.keys()
+        if missing:
+            loaded = {crop.crop_id: _crop_entry(crop) for crop in Crop.objects.filter(crop_id__in=missing)}
+            cache.set_many({crop_key(crop_id): entry for crop_id, entry in loaded.items()}, cache_ttl())
+            crops.update(loaded)
+
+    plantings = {}
+    for plot_id, entry in pairs.items():
+        for record_id, crop_id in entry:
+            if crop_id not in crops:
+                continue
+            name, bounds, limits = crops[crop_id]
+            plantings.setdefault(plot_id, []).append(ActivePlanting(record_id, plot_id, crop_id, name, bounds, limits))
+    return plantings
+
+
+def invalidate_plots(*plot_ids):
+    keys = [plot_key(plot_id) for plot_id in plot_ids if plot_id is not None]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_crop(crop_id):
+    transaction.on_commit(lambda: cache.delete(crop_key(crop_id)))
@@ -0,0 +1,77 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from farm.dashboard import invalidate_farmer
+from farm.models import Crop, FarmPlot, PlantingRecord
+from farm.summary import add_open_advisories
+
+from .alerts import clear_conditions
+from .engine import bump_rules_version
+from .models import AdvisoryLog, AdvisoryRule
+from .plantings import ACTIVE_STATUSES, invalidate_crop, invalidate_plots
+
+Farmer = get_user_model()
+
+
+@receiver(post_save, sender=AdvisoryRule)
+@receiver(post_delete, sender=AdvisoryRule)
+def advisory_rule_changed(sender, **kwargs):
+    bump_rules_version()
+
+
+@receiver(post_save, sender=AdvisoryRule)
+def advisory_rule_saved(sender, instance, created, **kwargs):
+    # Thresholds may have moved; let open conditions re-evaluate from scratch.
+    if not created:
+        clear_conditions(rule=instance)
+
+
+# farm.signals stores _previous_plot_id on PlantingRecord in pre_save.
+@receiver(post_save, sender=PlantingRecord)
+@receiver(post_delete, sender=PlantingRecord)
+def planting_record_changed(sender, instance, **kwargs):
+    invalidate_plots(instance.farm_plot_id, getattr(instance, '_previous_plot_id', None))
+    if kwargs.get('signal') is post_delete:
+        # A plot's, crop's or farmer's delete takes the alert states along.
+        origin = kwargs.get('origin')
+        if not issubclass(origin.model if isinstance(origin, QuerySet) else type(origin), (FarmPlot, Crop, Farmer)):
+            clear_conditions(farm_plot_id=instance.farm_plot_id, crop_id=instance.crop_id)
+    elif instance.status not in ACTIVE_STATUSES:
+        clear_conditions(farm_plot_id=instance.farm_plot_id, crop_id=instance.crop_id)
+
+
+@receiver(post_save, sender=Crop)
+@receiver(post_delete, sender=Crop)
+def crop_changed(sender, instance, **kwargs):
+    invalidate_crop(instance.pk)
+
+
+# No post_delete receiver: it would make cascade deletes of a farmer's or
+# plot's advisories run row by row. Plot deletes refresh the dashboard
+# through farm.signals; other deletes go through AdvisoryLogAdmin.
+@receiver(pre_save, sender=AdvisoryLog)
+def advisory_log_saving(sender, instance, **kwargs):
+    # Instances loaded from the database carry their stored values (see
+    # AdvisoryLog.from_db); only one built by hand with a pk is read back.
+    instance._previous_open = getattr(instance, '_stored_open', None)
+    if instance._previous_open is None and instance.pk is not None:
+        instance._previous_open = (
+            AdvisoryLog.objects.filter(pk=instance.pk).values_list('farmer_id', 'executed').first()
+        )
+
+
+@receiver(post_save, sender=AdvisoryLog)
+def advisory_log_saved(sender, instance, **kwargs):
+    invalidate_farmer(instance.farmer_id, 'advisories')
+    instance._stored_open = (instance.farmer_id, instance.executed)
+    deltas = Counter()
+    previous = getattr(instance, '_previous_open', None)
+    if previous is not None and not previous[1]:
+        deltas[previous[0]] -= 1
+    if not instance.executed:
+        deltas[instance.farmer_id] += 1
+    add_open_advisories(deltas)
@@ -0,0 +1,234 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from farm.models import Crop, FarmPlot, PlantingRecord, SensorData
+from sass.querybudget import assert_query_budget
+from sass.queryplans import assert_no_full_scans
+
+from .alerts import AlertTracker
+from .engine import bump_rules_version, get_decision_table, reset_decision_table
+from .views import generate_advisories_bulk
+from .checks import check_shared_cache
+from .models import AdvisoryAlertState, AdvisoryLog, AdvisoryRule
+from .plantings import active_plantings_for, plot_key
+
+Farmer = get_user_model()
+
+
+class DecisionTableVersionTests(TestCase):
+    def setUp(self):
+        # The tables built here compile rule edits that the test rolls back.
+        self.addCleanup(reset_decision_table)
+
+    def test_rule_edits_reach_processes_without_the_signal(self):
+        bump_rules_version()
+        with override_settings(ADVISORY_RULES_CHECK_SECONDS=60):
+            table = get_decision_table()
+            self.assertTrue(table.rules)
+            # An edit made in another process: no signal reaches this one.
+            AdvisoryRule.objects.update(is_active=False, updated_at=timezone.now())
+            self.assertIs(get_decision_table(), table)
+        with override_settings(ADVISORY_RULES_CHECK_SECONDS=0):
+            self.assertFalse(get_decision_table().rules)
+
+    def test_edits_in_this_process_apply_at_once(self):
+        bump_rules_version()
+        with override_settings(ADVISORY_RULES_CHECK_SECONDS=60):
+            table = get_decision_table()
+            rule = AdvisoryRule.objects.filter(is_active=True).first()
+            rule.is_active = False
+            rule.save()
+            self.assertIsNot(get_decision_table(), table)
+
+
+class BacktestReplaceTests(TestCase):
+    def test_replace_keeps_executed_and_non_rule_advisories(self):
+        farmer = Farmer.objects.create_user('backtest-farmer')
+        plot = FarmPlot.objects.create(farmer=farmer, location='Jitra, Kedah', size_hectares=1, soil_type='loamy')
+        rule = AdvisoryRule.objects.first()
+        created_at = datetime(2025, 3, 2, 6, tzinfo=dt_timezone.utc)
+
+        def advisory(title, **fields):
+            return AdvisoryLog.objects.create(farmer=farmer, farm_plot=plot, advisory_type='other', title=title,
+                                              message=title, created_at=created_at, **fields)
+
+        advisory('Stale rule advisory', rule=rule)
+        kept = {
+            advisory('Executed rule advisory', rule=rule, executed=True).pk,
+            advisory('Rapid Soil moisture Change').pk,
+        }
+        call_command('backtest_advisories', start='2025-03-01', end='2025-03-31', plots=[plot.pk],
+                     commit=True, replace=True, stdout=StringIO())
+        self.assertEqual(set(AdvisoryLog.objects.values_list('pk', flat=True)), kept)
+
+
+class BacktestCommitTests(TestCase):
+    def setUp(self):
+        farmer = Farmer.objects.create_user('alert-farmer')
+        self.plot = FarmPlot.objects.create(farmer=farmer, location='Yan, Kedah', size_hectares=1, soil_type='loamy')
+        self.crop = Crop.objects.create(name='Jagung')
+        PlantingRecord.objects.create(farm_plot=self.plot, crop=self.crop, planting_date='2025-01-01',
+                                      status='growing')
+        AdvisoryRule.objects.update(is_active=False)
+        self.rule = AdvisoryRule.objects.create(
+            name='Dry soil', metric='moisture', comparison='lt', threshold_source='fixed', threshold_value=40,
+            hysteresis=5, cooldown_minutes=0, advisory_type='irrigation', title='Dry soil',
+            message_template='Moisture {value}% is below {threshold}%.',
+        )
+
+    def test_committed_hits_open_conditions_once(self):
+        start = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        # Opens, stays open, is not clear of the hysteresis margin, clears, opens again.
+        SensorData.objects.bulk_create(
+            SensorData(farm_plot=self.plot, moisture=moisture, recorded_at=start + timedelta(hours=hour))
+            for hour, moisture in enumerate([30, 35, 42, 50, 38])
+        )
+        call_command('backtest_advisories', start='2025-03-01', end='2025-03-01', plots=[self.plot.pk],
+                     commit=True, stdout=StringIO())
+        self.assertEqual(
+            list(AdvisoryLog.objects.order_by('created_at').values_list('created_at', flat=True)),
+            [start, start + timedelta(hours=4)],
+        )
+        state = AdvisoryAlertState.objects.get()
+        self.assertEqual((state.state, state.opened_at), ('open', start + timedelta(hours=4)))
+
+        call_command('backtest_advisories', start='2025-03-01', end='2025-03-01', plots=[self.plot.pk],
+                     commit=True, stdout=StringIO())
+        self.assertEqual(AdvisoryLog.objects.count(), 2)
+
+    def test_history_imported_out_of_order_replays_in_time_order(self):
+        start = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        SensorData.objects.bulk_create(
+            SensorData(farm_plot=self.plot, moisture=moisture, recorded_at=start + timedelta(hours=hour))
+            for hour, moisture in reversed(list(enumerate([30, 50, 38])))
+        )
+        call_command('backtest_advisories', start='2025-03-01', end='2025-03-01', plots=[self.plot.pk],
+                     commit=True, chunk_size=1, stdout=StringIO())
+        self.assertEqual(AdvisoryLog.objects.count(), 2)
+        self.assertTrue(AdvisoryAlertState.objects.get().backfilled)
+
+    def test_replace_keeps_live_alert_states(self):
+        moment = datetime(2025, 3, 1, 12, tzinfo=dt_timezone.utc)
+        live = AdvisoryAlertState.objects.create(farm_plot=self.plot, crop=self.crop, rule=self.rule,
+                                                 opened_at=moment, notified_at=moment)
+        SensorData.objects.create(farm_plot=self.plot, moisture=30, recorded_at=moment - timedelta(hours=6))
+        call_command('backtest_advisories', start='2025-03-01', end='2025-03-01', plots=[self.plot.pk],
+                     commit=True, replace=True, stdout=StringIO())
+        state = AdvisoryAlertState.objects.get()
+        self.assertEqual((state.pk, state.opened_at, state.backfilled), (live.pk, moment, False))
+        self.assertFalse(AdvisoryLog.objects.exists())
+
+    def test_only_the_batch_that_inserts_the_state_notifies(self):
+        tracker = AlertTracker([self.plot.pk])
+        key = (self.plot.pk, self.crop.pk, self.rule.pk)
+        moment = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        self.assertTrue(tracker.open_condition(key, moment, timedelta(0)))
+        # A concurrent batch opened the same condition first.
+        AdvisoryAlertState.objects.create(farm_plot=self.plot, crop=self.crop, rule=self.rule, opened_at=moment,
+                                          notified_at=moment)
+        self.assertEqual(tracker.save(), {key})
+        self.assertEqual(AdvisoryAlertState.objects.count(), 1)
+        self.assertFalse(tracker.open_condition(key, moment + timedelta(hours=1), timedelta(0)))
+
+
+class AnomalyAdvisoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anomalies_are_typed_by_metric_and_ranked_by_severity(self):
+        farmer = Farmer.objects.create_user('anomaly-farmer')
+        plot = FarmPlot.objects.create(farmer=farmer, location='Pendang, Kedah', size_hectares=1, soil_type='clay')
+        start = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        # Moisture rises 20 points in an hour (1.3 times the limit), humidity 60 (2.4 times).
+        for hour, moisture, humidity in [(0, 40, 20), (1, 60, 80)]:
+            reading = SensorData(farm_plot=plot, moisture=moisture, humidity=humidity,
+                                 recorded_at=start + timedelta(hours=hour))
+            logs = generate_advisories_bulk([reading], {plot.pk: farmer.pk})
+        self.assertEqual(
+            sorted((log.title, log.advisory_type, log.priority) for log in logs),
+            [('Rapid Air humidity Change', 'pest_control', 'high'),
+             ('Rapid Soil moisture Change', 'irrigation', 'medium')],
+        )
+
+
+class PlantingCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_entries_are_invalidated_when_the_change_commits(self):
+        farmer = Farmer.objects.create_user('cache-farmer')
+        plot = FarmPlot.objects.create(farmer=farmer, location='Kangar, Perlis', size_hectares=1, soil_type='clay')
+        crop = Crop.objects.create(name='Cili', optimal_moisture_min=60, optimal_moisture_max=80)
+        self.assertEqual(active_plantings_for([plot.pk]), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            PlantingRecord.objects.create(farm_plot=plot, crop=crop, planting_date='2025-01-01', status='growing')
+            # Other readers keep the committed state until the commit.
+            self.assertEqual(cache.get(plot_key(plot.pk)), [])
+        self.assertIsNone(cache.get(plot_key(plot.pk)))
+        self.assertEqual([planting.crop_id for planting in active_plantings_for([plot.pk])[plot.pk]], [crop.pk])
+
+    def test_process_local_cache_is_reported(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(DEBUG=False, CACHES=locmem):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['advisory.W001'])
+        with override_settings(DEBUG=False, CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class QueryPlanTests(TestCase):
+    """The advisory views and the engine must not read ADVISORY_LOG or PLANTING_RECORD in full."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('plan-grower')
+        other = Farmer.objects.create_user('plan-other')
+        crop = Crop.objects.create(name='Kelapa Sawit')
+        cls.plots = [
+            FarmPlot.objects.create(farmer=owner, location='Teluk Intan, Perak', size_hectares=3, soil_type='peat')
+            for owner in (cls.farmer, other)
+        ]
+        PlantingRecord.objects.bulk_create(
+            PlantingRecord(farm_plot=plot, crop=crop, planting_date='2025-01-01', status=status)
+            for plot in cls.plots for status in ('growing', 'harvested', 'failed')
+        )
+        created_at = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        AdvisoryLog.objects.bulk_create(
+            AdvisoryLog(farmer=plot.farmer, farm_plot=plot, advisory_type='irrigation', title='Dry soil',
+                        message='Dry soil', executed=hour % 3 == 0, created_at=created_at + timedelta(hours=hour))
+            for plot in cls.plots for hour in range(60)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.farmer)
+
+    def test_advisory_list_pages(self):
+        url = reverse('advisory_list')
+        with assert_no_full_scans():
+            for params in ({}, {'executed': 'false'}):
+                page = self.client.get(url, params).context['page']
+                self.assertTrue(page.has_next)
+                self.client.get(url + page.next_query)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_advisory_list_stays_within_budget(self):
+        url = reverse('advisory_list')
+        for params in ({}, {'executed': 'false'}):
+            with assert_query_budget(queries=4, repeats=1):
+                page = self.client.get(url, params).context['page']
+            self.assertTrue(page.has_next)
+            with assert_query_budget(queries=4, repeats=1):
+                self.client.get(url + page.next_query)
+
+    def test_engine_loads_active_plantings(self):
+        with assert_no_full_scans() as recorder:
+            active_plantings_for([plot.pk for plot in self.plots])
+        self.assertTrue(recorder.statements)
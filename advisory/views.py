@@ -1,102 +1,111 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.utils import timezone
+from collections import Counter
+
+from farm.dashboard import invalidate_farmers
+from farm.summary import add_open_advisories
+from sass.pagination import paginate
+from sass.querybudget import query_budget
+from .alerts import AlertTracker
+from .anomaly import AnomalyTracker, classify as classify_anomaly, render as render_anomaly
+from .engine import get_decision_table
 from .models import AdvisoryLog
-from farm.models import SensorData, Crop, PlantingRecord
+from .plantings import active_plantings_for
 
 
-def generate_advisory(farmer, sensor_data):
-    plot = sensor_data.farm_plot
-    active_planting = PlantingRecord.objects.filter(
-        farm_plot=plot,
-        status__in=['planted', 'growing']
-    ).first()
-    
-    if not active_planting:
-        return None
-    
-    crop = active_planting.crop
-    advisories = []
-    
-    if sensor_data.moisture is not None and crop.optimal_moisture_min and crop.optimal_moisture_max:
-        if float(sensor_data.moisture) < float(crop.optimal_moisture_min):
-            advisories.append({
-                'type': 'irrigation',
-                'title': 'Low Soil Moisture Detected',
-                'message': f'Soil moisture ({sensor_data.moisture}%) is below optimal range ({crop.optimal_moisture_min}-{crop.optimal_moisture_max}%). Please irrigate the field.',
-                'priority': 'high'
-            })
-        elif float(sensor_data.moisture) > float(crop.optimal_moisture_max):
-            advisories.append({
-                'type': 'irrigation',
-                'title': 'High Soil Moisture Detected',
-                'message': f'Soil moisture ({sensor_data.moisture}%) is above optimal range. Consider reducing irrigation.',
-                'priority': 'medium'
-            })
-    
-    if sensor_data.temperature is not None and crop.optimal_temperature_min and crop.optimal_temperature_max:
-        if float(sensor_data.temperature) < float(crop.optimal_temperature_min):
-            advisories.append({
-                'type': 'other',
-                'title': 'Low Temperature Alert',
-                'message': f'Temperature ({sensor_data.temperature}°C) is below optimal range ({crop.optimal_temperature_min}-{crop.optimal_temperature_max}°C). Consider protective measures.',
-                'priority': 'medium'
-            })
-        elif float(sensor_data.temperature) > float(crop.optimal_temperature_max):
-            advisories.append({
-                'type': 'other',
-                'title': 'High Temperature Alert',
-                'message': f'Temperature ({sensor_data.temperature}°C) is above optimal range. Ensure adequate irrigation.',
-                'priority': 'high'
-            })
+@transaction.atomic(savepoint=False)
+def generate_advisories_bulk(readings, plot_farmers):
+    """
+    Evaluate advisories for a batch of saved SensorData rows.
+
+    Readings are processed in recorded order. Each one updates its plot's
+    running statistics (see ``advisory.anomaly``) and is checked against
+    every active planting on its plot through the compiled rule table. A
+    rule advisory is only written when a condition opens (see
+    ``advisory.alerts``), not for every reading that stays out of range.
+    Active plantings come from the planting cache, so a warm batch costs
+    one state query per table and at most one insert or update each,
+    regardless of its size. ``plot_farmers`` maps plot id to farmer id.
+    """
+    plot_ids = {reading.farm_plot_id for reading in readings}
+    if not plot_ids:
+        return []
     
-    if sensor_data.humidity is not None and crop.optimal_humidity_min and crop.optimal_humidity_max:
-        if float(sensor_data.humidity) < float(crop.optimal_humidity_min):
-            advisories.append({
-                'type': 'irrigation',
-                'title': 'Low Humidity Alert',
-                'message': f'Air humidity ({sensor_data.humidity}%) is below optimal range. Consider increasing irrigation frequency.',
-                'priority': 'medium'
-            })
-        elif float(sensor_data.humidity) > float(crop.optimal_humidity_max):
-            advisories.append({
-                'type': 'pest_control',
-                'title': 'High Humidity Alert',
-                'message': f'High humidity ({sensor_data.humidity}%) may promote fungal growth. Monitor for diseases.',
-                'priority': 'medium'
-            })
+    table = get_decision_table()
+    resolved = {
+        plot_id: table.resolve(plantings)
+        for plot_id, plantings in active_plantings_for(plot_ids).items()
+    }
+    # Both trackers lock their plots' rows; always statistics first.
+    statistics = AnomalyTracker(list(plot_ids))
+    tracker = AlertTracker(list(resolved))
     
-    for adv in advisories:
-        AdvisoryLog.objects.create(
-            farmer=farmer,
-            advisory_type=adv['type'],
-            title=adv['title'],
-            message=adv['message'],
-            farm_plot=plot,
-            crop=crop,
-            priority=adv['priority']
-        )
+    logs = []
+    ordered = sorted(readings, key=lambda reading: (reading.recorded_at is None, reading.recorded_at))
+    for reading in ordered:
+        for anomaly in statistics.update(reading):
+            title, message = render_anomaly(anomaly)
+            advisory_type, priority = classify_anomaly(anomaly)
+            logs.append(AdvisoryLog(
+                farmer_id=plot_farmers[reading.farm_plot_id],
+                advisory_type=advisory_type,
+                title=title,
+                message=message,
+                farm_plot_id=reading.farm_plot_id,
+                priority=priority
+            ))
+        plot_resolved = resolved.get(reading.farm_plot_id)
+        if not plot_resolved:
+            continue
+        matches = table.evaluate(reading, plot_resolved)
+        for match in tracker.update(reading, plot_resolved, matches):
+            title, message = table.render(match)
+            logs.append(AdvisoryLog(
+                farmer_id=plot_farmers[reading.farm_plot_id],
+                advisory_type=match.rule.advisory_type,
+                title=title,
+                message=message,
+                farm_plot_id=reading.farm_plot_id,
+                crop_id=match.planting.crop_id,
+                rule_id=match.rule.rule_id,
+                priority=match.rule.priority
+            ))
     
-    return advisories
+    statistics.save()
+    lost = tracker.save()
+    if lost:
+        logs = [log for log in logs if (log.farm_plot_id, log.crop_id, log.rule_id) not in lost]
+    AdvisoryLog.objects.bulk_create(logs, batch_size=1000)
+    invalidate_farmers((log.farmer_id for log in logs), 'advisories')
+    add_open_advisories(Counter(log.farmer_id for log in logs))
+    return logs
+
 
+def generate_advisory(farmer, sensor_data):
+    return generate_advisories_bulk([sensor_data], {sensor_data.farm_plot_id: farmer.pk})
 
+
+@query_budget(queries=4, repeats=1)
 @login_required
 def advisory_list(request):
-    advisories = AdvisoryLog.objects.filter(farmer=request.user)
+    advisories = AdvisoryLog.objects.filter(farmer=request.user).select_related('farm_plot', 'crop')
     executed_filter = request.GET.get('executed')
     if executed_filter == 'true':
         advisories = advisories.filter(executed=True)
     elif executed_filter == 'false':
         advisories = advisories.filter(executed=False)
     
-    advisories = advisories.order_by('-created_at')
-    return render(request, 'advisory/advisory_list.html', {'advisories': advisories})
+    page = paginate(request, advisories, ('-created_at', '-pk'), per_page=20)
+    return render(request, 'advisory/advisory_list.html', {'advisories': page, 'page': page})
 
 
+@query_budget(queries=3, repeats=1)
 @login_required
 def advisory_detail(request, pk):
-    advisory = get_object_or_404(AdvisoryLog, pk=pk, farmer=request.user)
+    advisory = get_object_or_404(AdvisoryLog.objects.select_related('farm_plot', 'crop'), pk=pk, farmer=request.user)
     return render(request, 'advisory/advisory_detail.html', {'advisory': advisory})
 
 
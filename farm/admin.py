@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import FarmPlot, Crop, PlantingRecord, SensorData
+from django.contrib import admin, messages
+from .models import FarmPlot, Crop, FarmerSummary, PlantingRecord, SensorData, SensorDevice
+from .dashboard import invalidate_plot_readings
+from .rollups import refresh_rollups
+from .summary import rebuild_summaries
 
 
 @admin.register(FarmPlot)
@@ -27,4 +30,55 @@ class SensorDataAdmin(admin.ModelAdmin):
     list_display = ('data_id', 'farm_plot', 'temperature', 'moisture', 'humidity', 'recorded_at')
     list_filter = ('recorded_at',)
     search_fields = ('farm_plot__location',)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_rollups([obj])
+        invalidate_plot_readings(obj.farm_plot_id)
+    
+    def delete_queryset(self, request, queryset):
+        deleted = list(queryset.only('farm_plot_id', 'recorded_at'))
+        super().delete_queryset(request, queryset)
+        refresh_rollups(deleted)
+        invalidate_plot_readings(*(reading.farm_plot_id for reading in deleted))
 
+
+@admin.register(SensorDevice)
+class SensorDeviceAdmin(admin.ModelAdmin):
+    list_display = ('device_id', 'name', 'farm_plot', 'token_prefix', 'is_active', 'revoked_at', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'farm_plot__location', 'token_prefix')
+    readonly_fields = ('token_prefix', 'revoked_at')
+    actions = ('revoke_devices', 'rotate_tokens')
+
+    def save_model(self, request, obj, form, change):
+        token = None if change else obj.issue_token()
+        super().save_model(request, obj, form, change)
+        if token:
+            messages.warning(request, f'API token for "{obj.name}": {token} (copy it now, it will not be shown again)')
+
+    @admin.action(description='Revoke selected devices')
+    def revoke_devices(self, request, queryset):
+        for device in queryset.filter(is_active=True):
+            device.revoke()
+        messages.success(request, 'Selected devices revoked.')
+
+    @admin.action(description='Issue new tokens for selected devices')
+    def rotate_tokens(self, request, queryset):
+        for device in queryset:
+            token = device.issue_token()
+            device.save(update_fields=['token_hash', 'token_prefix', 'updated_at'])
+            messages.warning(request, f'New API token for "{device.name}": {token}')
+
+
+@admin.register(FarmerSummary)
+class FarmerSummaryAdmin(admin.ModelAdmin):
+    list_display = ('farmer', 'plot_count', 'active_crop_count', 'open_advisory_count')
+    search_fields = ('farmer__username',)
+    readonly_fields = ('farmer', 'plot_count', 'active_crop_count', 'open_advisory_count')
+    actions = ('recount',)
+
+    @admin.action(description='Recount selected summaries')
+    def recount(self, request, queryset):
+        drift = rebuild_summaries(queryset.values_list('pk', flat=True))
+        messages.success(request, f'Recounted; {len(drift)} had drifted.')
@@ -5,3 +5,5 @@ class FarmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'farm'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,168 @@
+"""
+Columnar archive of old sensor readings.
+
+``archive_sensor_data`` moves readings older than the retention period out
+of SENSOR_DATA into ``SENSOR_ARCHIVE_DIR``::
+
+    <plot_id>/index.json            months with row counts and time bounds
+    <plot_id>/<YYYY-MM>/recorded_at.npy   int64 microseconds since the epoch, sorted
+    <plot_id>/<YYYY-MM>/<metric>.npy      float32 per metric, NaN when missing
+
+Months are calendar months in UTC. ``read_range`` opens the files with
+``np.load(mmap_mode='r')`` and binary-searches the timestamps, so reading a
+day out of a month only touches the pages it needs. Archived readings keep
+their hourly and daily rollups in the database; ``farm.rollups`` reads
+these files when it recomputes a bucket that is not newer than the plot's
+last archived reading (``archived_until``). Indexes are cached per process
+and re-read when their file changes, so that check costs one ``stat``.
+"""
+import copy
+import json
+import os
+import shutil
+import tempfile
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+
+METRICS = ('temperature', 'moisture', 'humidity', 'ph_level')
+TIME_COLUMN = 'recorded_at'
+INDEX_FILE = 'index.json'
+
+
+def archive_root():
+    return getattr(settings, 'SENSOR_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive', 'sensor'))
+
+
+def to_micros(moment):
+    return int(round(moment.timestamp() * 1_000_000))
+
+
+def month_key(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return f'{moment.year:04d}-{moment.month:02d}'
+
+
+# {path: (mtime_ns, size, index)}; treat the cached indexes as read-only.
+_indexes = {}
+
+
+def load_index(plot_id):
+    path = os.path.join(archive_root(), str(plot_id), INDEX_FILE)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {'months': {}}
+    cached = _indexes.get(path)
+    if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+        with open(path, encoding='utf-8') as handle:
+            cached = _indexes[path] = (stat.st_mtime_ns, stat.st_size, json.load(handle))
+    return cached[2]
+
+
+def archived_until(plot_id):
+    """Microseconds since the epoch of a plot's newest archived reading, or None."""
+    months = load_index(plot_id)['months']
+    return max((month['last'] for month in months.values()), default=None)
+
+
+def _write_index(plot_id, index):
+    directory = os.path.join(archive_root(), str(plot_id))
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.json')
+    with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+        json.dump(index, stream, indent=1, sort_keys=True)
+    os.replace(temporary, os.path.join(directory, INDEX_FILE))
+
+
+def _open_month(plot_id, key, metrics):
+    directory = os.path.join(archive_root(), str(plot_id), key)
+    times = np.load(os.path.join(directory, f'{TIME_COLUMN}.npy'), mmap_mode='r')
+    columns = {metric: np.load(os.path.join(directory, f'{metric}.npy'), mmap_mode='r') for metric in metrics}
+    return times, columns
+
+
+def write_month(plot_id, key, times, columns):
+    """
+    Add readings to one plot-month and update the plot's index.
+
+    ``times`` are microseconds since the epoch and ``columns`` one float
+    array per metric. Readings already archived for the same timestamp are
+    replaced. The month directory is swapped in whole, so readers never see
+    a half-written month.
+    """
+    plot_dir = os.path.join(archive_root(), str(plot_id))
+    os.makedirs(plot_dir, exist_ok=True)
+    index = copy.deepcopy(load_index(plot_id))
+    times = np.asarray(times, dtype=np.int64)
+    columns = {metric: np.asarray(columns[metric], dtype=np.float32) for metric in METRICS}
+
+    if key in index['months']:
+        old_times, old_columns = _open_month(plot_id, key, METRICS)
+        times = np.concatenate([np.asarray(old_times), times])
+        columns = {metric: np.concatenate([np.asarray(old_columns[metric]), columns[metric]]) for metric in METRICS}
+    # Keep the last reading per timestamp, in time order.
+    order = np.argsort(times, kind='stable')[::-1]
+    _, first = np.unique(times[order], return_index=True)
+    keep = order[first]
+    times = times[keep]
+    columns = {metric: column[keep] for metric, column in columns.items()}
+
+    staging = tempfile.mkdtemp(dir=plot_dir, prefix=f'.{key}-')
+    np.save(os.path.join(staging, f'{TIME_COLUMN}.npy'), times)
+    for metric, column in columns.items():
+        np.save(os.path.join(staging, f'{metric}.npy'), column)
+    target = os.path.join(plot_dir, key)
+    if os.path.exists(target):
+        retired = f'{staging}.old'
+        os.replace(target, retired)
+        os.replace(staging, target)
+        shutil.rmtree(retired)
+    else:
+        os.replace(staging, target)
+
+    index['months'][key] = {'rows': int(len(times)), 'first': int(times[0]), 'last': int(times[-1])}
+    index['columns'] = {TIME_COLUMN: 'int64 microseconds', **{metric: 'float32' for metric in METRICS}}
+    _write_index(plot_id, index)
+    return len(times)
+
+
+def read_range(plot_id, start, end, metrics=METRICS):
+    """
+    Return ``(times, columns)`` of archived readings in ``[start, end)``.
+
+    ``times`` are epoch seconds as float64 and ``columns`` float64 arrays
+    with NaN for missing values. Only the overlapping months are opened and
+    only the matching slices are copied out of the memory maps.
+    """
+    low, high = to_micros(start), to_micros(end)
+    times_parts = []
+    column_parts = {metric: [] for metric in metrics}
+    for key, month in sorted(load_index(plot_id)['months'].items()):
+        if month['last'] < low or month['first'] >= high:
+            continue
+        times, columns = _open_month(plot_id, key, metrics)
+        first, last = np.searchsorted(times, low, side='left'), np.searchsorted(times, high, side='left')
+        if first == last:
+            continue
+        times_parts.append(times[first:last] / 1_000_000)
+        for metric in metrics:
+            column_parts[metric].append(np.round(columns[metric][first:last].astype(np.float64), 2))
+    if not times_parts:
+        return np.empty(0), {metric: np.empty(0) for metric in metrics}
+    return np.concatenate(times_parts), {metric: np.concatenate(parts) for metric, parts in column_parts.items()}
+
+
+def count_range(plot_id, start, end):
+    """Return how many archived readings fall in ``[start, end)`` without copying any."""
+    low, high = to_micros(start), to_micros(end)
+    total = 0
+    for key, month in load_index(plot_id)['months'].items():
+        if month['last'] < low or month['first'] >= high:
+            continue
+        if low <= month['first'] and month['last'] < high:
+            total += month['rows']
+            continue
+        times, _ = _open_month(plot_id, key, ())
+        total += int(np.searchsorted(times, high, side='left') - np.searchsorted(times, low, side='left'))
+    return total
@@ -0,0 +1,251 @@
+"""
+In-process write coalescer for the async ingestion path.
+
+Async views hand validated readings to ``WriteCoalescer.submit`` and return
+immediately. A background task on the server's event loop collects them and
+flushes a batch through ``store_readings`` every
+``SENSOR_COALESCE_INTERVAL_MS`` milliseconds or ``SENSOR_COALESCE_MAX_ROWS``
+rows, whichever comes first, so request latency does not depend on commit
+latency. The queue is bounded by ``SENSOR_COALESCE_QUEUE_SIZE``; when it is
+full ``submit`` raises ``Backpressure`` and the caller should ask the client
+to retry.
+
+Queued readings have already been acknowledged, so a failed flush is not
+dropped: it is retried ``SENSOR_COALESCE_RETRIES`` times with exponential
+backoff, then written device by device and finally row by row, so one bad
+reading cannot sink a batch that spans many devices. Rows that still fail
+are appended to the CSV file ``SENSOR_DEAD_LETTER_PATH``, in the format
+``import_sensor_csv`` reads, with the calibrated values and the error.
+
+The coalescer is started and drained by the ASGI lifespan handler in
+``sass/asgi.py``. Without lifespan support (runserver, WSGI) there is no
+long-lived loop to own the task and ``get_coalescer`` returns None.
+"""
+import asyncio
+import csv
+import logging
+import os
+import time
+from itertools import groupby
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .ingest import METRIC_FIELDS, store_readings
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+DEAD_LETTER_FIELDS = ['recorded_at', 'plot', *METRIC_FIELDS, 'notes', 'device_id', 'error']
+
+
+class Backpressure(Exception):
+    """The coalescer queue cannot take the submitted readings."""
+
+
+def _source(item):
+    reading = item[0]
+    return (reading.device_id or 0, reading.farm_plot_id)
+
+
+def dead_letter_path():
+    return getattr(settings, 'SENSOR_DEAD_LETTER_PATH', 'sensor_dead_letter.csv')
+
+
+def write_dead_letters(items):
+    """Append ``(reading, farmer_id, error)`` triples to the dead-letter CSV."""
+    path = dead_letter_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a', newline='', encoding='utf-8') as handle:
+        writer = csv.DictWriter(handle, fieldnames=DEAD_LETTER_FIELDS)
+        if handle.tell() == 0:
+            writer.writeheader()
+        for reading, _, error in items:
+            row = {name: getattr(reading, name) for name in METRIC_FIELDS}
+            row.update({
+                'recorded_at': reading.recorded_at.isoformat() if reading.recorded_at else '',
+                'plot': reading.farm_plot_id,
+                'notes': reading.notes,
+                'device_id': reading.device_id or '',
+                'error': f'{type(error).__name__}: {error}',
+            })
+            writer.writerow(row)
+
+
+class WriteCoalescer:
+    def __init__(self, max_rows=None, interval_ms=None, queue_size=None, writer=store_readings):
+        self.max_rows = max_rows or getattr(settings, 'SENSOR_COALESCE_MAX_ROWS', 1000)
+        self.interval = (interval_ms or getattr(settings, 'SENSOR_COALESCE_INTERVAL_MS', 200)) / 1000
+        self.queue_size = queue_size or getattr(settings, 'SENSOR_COALESCE_QUEUE_SIZE', 50000)
+        self.writer = writer
+        self.retries = getattr(settings, 'SENSOR_COALESCE_RETRIES', 3)
+        self.backoff = getattr(settings, 'SENSOR_COALESCE_BACKOFF_MS', 100) / 1000
+        self._queue = None
+        self._task = None
+        self._closing = False
+        self.counters = {
+            'submitted_rows': 0,
+            'rejected_rows': 0,
+            'flushed_rows': 0,
+            'failed_rows': 0,
+            'retried_flushes': 0,
+            'dead_letter_rows': 0,
+            'flushes': 0,
+            'last_flush_size': 0,
+            'max_flush_size': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    @property
+    def accepting(self):
+        return self.running and not self._closing
+
+    def start(self):
+        if self.running:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, readings, plot_farmers):
+        """Queue validated readings; all of them or none are accepted."""
+        if not self.accepting:
+            raise Backpressure('Ingestion is shutting down.')
+        free = self._queue.maxsize - self._queue.qsize()
+        if len(readings) > free:
+            self.counters['rejected_rows'] += len(readings)
+            raise Backpressure(f'Ingestion queue is full ({self._queue.qsize()} readings pending).')
+        for reading in readings:
+            self._queue.put_nowait((reading, plot_farmers[reading.farm_plot_id]))
+        self.counters['submitted_rows'] += len(readings)
+
+    async def close(self):
+        """Stop accepting readings and wait until everything queued is flushed."""
+        if not self.running:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['queue_depth'] = self._queue.qsize() if self._queue is not None else 0
+        stats['queue_size'] = self.queue_size
+        stats['avg_flush_size'] = (
+            round(stats['flushed_rows'] / stats['flushes'], 1) if stats['flushes'] else 0
+        )
+        stats['running'] = self.running
+        return stats
+
+    async def _collect(self, first):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.interval
+        batch = [first]
+        while len(batch) < self.max_rows:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _write(self, batch, attempts=1):
+        """Write ``batch`` (``(reading, farmer_id)`` pairs), retrying with backoff; returns the last error or None."""
+        readings = [reading for reading, _ in batch]
+        plot_farmers = {reading.farm_plot_id: farmer_id for reading, farmer_id in batch}
+        for attempt in range(attempts):
+            if attempt:
+                self.counters['retried_flushes'] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                await sync_to_async(self.writer)(readings, plot_farmers)
+                return None
+            except Exception as exc:
+                error = exc
+                logger.warning('Failed to write %d sensor readings (attempt %d of %d): %s',
+                               len(readings), attempt + 1, attempts, exc)
+        return error
+
+    async def _flush(self, batch):
+        started = time.perf_counter()
+        dead = []
+        error = await self._write(batch, attempts=1 + self.retries)
+        if error is not None:
+            # Narrow the failure down: each device's readings, then each reading.
+            for _, group in groupby(sorted(batch, key=_source), key=_source):
+                group = list(group)
+                error = await self._write(group)
+                if error is None:
+                    continue
+                for item in group:
+                    row_error = await self._write([item]) if len(group) > 1 else error
+                    if row_error is not None:
+                        dead.append((*item, row_error))
+        if dead:
+            self.counters['failed_rows'] += len(dead)
+            try:
+                await sync_to_async(write_dead_letters)(dead)
+            except OSError:
+                logger.exception('Lost %d sensor readings: cannot write %s', len(dead), dead_letter_path())
+            else:
+                self.counters['dead_letter_rows'] += len(dead)
+                logger.error('Wrote %d sensor readings to %s', len(dead), dead_letter_path())
+        size = len(batch)
+        self.counters['flushes'] += 1
+        self.counters['flushed_rows'] += size - len(dead)
+        self.counters['last_flush_size'] = size
+        self.counters['max_flush_size'] = max(self.counters['max_flush_size'], size)
+        self.counters['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is _STOP:
+                return
+            batch, stop = await self._collect(first)
+            await self._flush(batch)
+            if stop:
+                return
+
+
+_coalescer = None
+
+
+def get_coalescer():
+    """Return the running process-wide coalescer, or None if it is not started."""
+    if _coalescer is not None and _coalescer.running:
+        return _coalescer
+    return None
+
+
+def coalescer_stats():
+    return _coalescer.stats() if _coalescer is not None else {'running': False}
+
+
+async def handle_lifespan(receive, send):
+    """ASGI lifespan protocol: start the coalescer on startup, drain it on shutdown."""
+    global _coalescer
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            _coalescer = WriteCoalescer()
+            _coalescer.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _coalescer is not None:
+                await _coalescer.close()
+                logger.info('Sensor coalescer drained: %s', _coalescer.stats())
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,178 @@
+"""
+Cached dashboard panels.
+
+Every panel of a farmer's dashboard is cached on its own under
+``dashboard:<farmer>:<scope>:<version>:<panel>``. The version of a scope
+lives in its own key, and changing what a panel shows replaces that key with
+a new random value, so stale fragments are never read again and simply
+expire; nothing is deleted by pattern. There are two kinds of version:
+
+* per farmer, ``dashboard:<farmer>:plots`` (their set of plots, which every
+  plot-based panel is stored under) and ``dashboard:<farmer>:advisories``;
+* per object, ``dashboard:plot:<id>:readings``, ``dashboard:plot:<id>:plantings``
+  and ``dashboard:crop:<id>:price``. A fragment records the versions of the
+  objects it was built from and is rebuilt when any of them has moved.
+
+That way a new reading only bumps its plot's key, without looking up the
+farmer. A warm dashboard costs three ``get_many`` calls and no queries.
+Model signals and the bulk writers (``write_readings``,
+``generate_advisories_bulk``, ``refresh_latest_prices``) do the bumping,
+once their transaction commits: a bump any earlier would let another
+request cache the uncommitted state's old rows under the new version.
+``DASHBOARD_CACHE_TTL`` bounds how long a change made without them
+(``QuerySet.update()``, raw SQL) can go unnoticed.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from advisory.models import AdvisoryLog
+from market.models import LatestMarketPrice
+
+from .models import FarmPlot, PlantingRecord, SensorData
+from .summary import ACTIVE_STATUSES, summary_for
+
+# Build order matters: crops need the plot ids, prices the crop ids.
+PANELS = ('plots', 'summary', 'crops', 'prices', 'advisories', 'readings')
+PANEL_SCOPES = {
+    'plots': 'plots',
+    'summary': 'plots',
+    'crops': 'plots',
+    'prices': 'plots',
+    'readings': 'plots',
+    'advisories': 'advisories',
+}
+
+
+def cache_ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', 600)
+
+
+def farmer_key(farmer_id, scope):
+    return f'dashboard:{farmer_id}:{scope}'
+
+
+def plot_key(plot_id, kind):
+    return f'dashboard:plot:{plot_id}:{kind}'
+
+
+def crop_price_key(crop_id):
+    return f'dashboard:crop:{crop_id}:price'
+
+
+def _bump(keys):
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def _versions(keys):
+    """Return the current version of each key, starting a new one for keys that have none."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def invalidate_farmer(farmer_id, *scopes):
+    """Drop a farmer's ``plots`` and/or ``advisories`` panels (both when no scope is given)."""
+    if farmer_id is not None:
+        _bump(farmer_key(farmer_id, scope) for scope in scopes or ('plots', 'advisories'))
+
+
+def invalidate_farmers(farmer_ids, *scopes):
+    for farmer_id in set(farmer_ids):
+        invalidate_farmer(farmer_id, *scopes)
+
+
+def invalidate_plot_readings(*plot_ids):
+    _bump(plot_key(plot_id, 'readings') for plot_id in set(plot_ids) if plot_id is not None)
+
+
+def invalidate_plot_plantings(*plot_ids):
+    _bump(plot_key(plot_id, 'plantings') for plot_id in set(plot_ids) if plot_id is not None)
+
+
+def invalidate_crop_prices(*crop_ids):
+    _bump(crop_price_key(crop_id) for crop_id in set(crop_ids) if crop_id is not None)
+
+
+def _dependencies(panel, farmer_id, values):
+    if panel == 'readings':
+        return [plot_key(plot_id, 'readings') for plot_id in values['plots']]
+    if panel == 'crops':
+        return [plot_key(plot_id, 'plantings') for plot_id in values['plots']]
+    if panel == 'summary':
+        return [farmer_key(farmer_id, 'advisories')] + [plot_key(plot_id, 'plantings') for plot_id in values['plots']]
+    if panel == 'prices':
+        return [plot_key(plot_id, 'plantings') for plot_id in values['plots']] + [
+            crop_price_key(crop_id) for crop_id in values['crops']
+        ]
+    return []
+
+
+def _build(panel, farmer_id, values):
+    if panel == 'plots':
+        return list(FarmPlot.objects.filter(farmer_id=farmer_id).order_by('plot_id').values_list('plot_id', flat=True))
+    if panel == 'summary':
+        return summary_for(farmer_id)
+    if panel == 'crops':
+        return sorted(set(PlantingRecord.objects.filter(
+            farm_plot_id__in=values['plots'], status__in=ACTIVE_STATUSES
+        ).values_list('crop_id', flat=True)))
+    if panel == 'prices':
+        return [
+            {'crop': latest.crop.name, 'price': latest.price_per_kg, 'unit': latest.unit}
+            for latest in LatestMarketPrice.objects.filter(
+                crop_id__in=values['crops']
+            ).select_related('crop').order_by('crop__name')
+        ]
+    if panel == 'advisories':
+        return list(AdvisoryLog.objects.filter(farmer_id=farmer_id, executed=False).order_by('-created_at')[:5])
+    return list(
+        SensorData.objects.filter(farm_plot_id__in=values['plots'])
+        .select_related('farm_plot').order_by('-recorded_at')[:5]
+    )
+
+
+def dashboard_panels(farmer_id):
+    """
+    Return ``{panel: value}`` for a farmer's dashboard.
+
+    ``plots`` and ``crops`` are id lists, ``summary`` the FarmerSummary,
+    ``prices`` a list of dicts and ``advisories``/``readings`` model
+    instances. Only panels that are
+    missing or out of date are queried.
+    """
+    scopes = _versions(farmer_key(farmer_id, scope) for scope in set(PANEL_SCOPES.values()))
+    keys = {
+        panel: f'{farmer_key(farmer_id, scope)}:{scopes[farmer_key(farmer_id, scope)]}:{panel}'
+        for panel, scope in PANEL_SCOPES.items()
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {panel: cached[key] for panel, key in keys.items() if key in cached}
+    current = _versions({key for fragment in fragments.values() for key in fragment['deps']})
+    values = {
+        panel: fragment['value'] for panel, fragment in fragments.items()
+        if all(current[key] == version for key, version in fragment['deps'].items())
+    }
+
+    fresh = {}
+    for panel in PANELS:
+        if panel in values:
+            continue
+        # Read the versions before querying, so a change that lands in
+        # between leaves this fragment out of date rather than stale.
+        deps = _versions(_dependencies(panel, farmer_id, values))
+        values[panel] = _build(panel, farmer_id, values)
+        fresh[keys[panel]] = {'deps': deps, 'value': values[panel]}
+    if fresh:
+        cache.set_many(fresh, cache_ttl())
+    return values
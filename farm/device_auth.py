@@ -0,0 +1,141 @@
+"""
+API-token authentication for sensor devices.
+
+Devices send ``Authorization: Token <key>`` (``Bearer`` is accepted too).
+The token hash is resolved to a ``DeviceIdentity`` through an in-process
+cache, so a device that posts repeatedly costs no session, user or device
+queries. Every entry records the devices' version, a random value kept in
+the shared Django cache under ``VERSION_KEY``. The ``SensorDevice`` signals
+drop the process's own entry and replace the version once the change
+commits, which makes every process that shares the cache (web workers,
+ASGI, ``ingest_server``) load its devices again on the next request. With
+the per-process LocMemCache only the editing process sees the new version,
+so entries also expire after ``SENSOR_DEVICE_CACHE_TTL`` seconds; that,
+and changes made without ``save()`` (``QuerySet.update()``), are the only
+delay a revocation can have.
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import SensorDevice
+
+DeviceIdentity = namedtuple('DeviceIdentity', ['device_id', 'plot_id', 'farmer_id', 'offsets'])
+
+TOKEN_KEYWORDS = ('token', 'bearer')
+
+_lock = threading.Lock()
+_identities = {}
+_device_tokens = {}
+
+VERSION_KEY = 'sensor-devices:version'
+
+
+def cache_ttl():
+    return getattr(settings, 'SENSOR_DEVICE_CACHE_TTL', 60)
+
+
+def devices_version():
+    """Return the shared devices version, starting a new one if the cache has none."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() so that processes racing here agree on one value.
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_devices_version():
+    """Make every process reload its devices once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def get_request_token(request):
+    """Return the raw token from the Authorization header, or None."""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    parts = header.split()
+    if len(parts) == 2 and parts[0].lower() in TOKEN_KEYWORDS:
+        return parts[1]
+    return None
+
+
+IDENTITY_FIELDS = (
+    'device_id', 'farm_plot_id', 'farm_plot__farmer_id',
+    'temperature_offset', 'moisture_offset', 'humidity_offset', 'ph_offset',
+)
+OFFSET_METRICS = ('temperature', 'moisture', 'humidity', 'ph_level')
+
+
+def _identity(row):
+    device_id, plot_id, farmer_id, *offsets = row
+    # Only keep the offsets that actually change a reading.
+    offsets = {name: value for name, value in zip(OFFSET_METRICS, offsets) if value}
+    return DeviceIdentity(device_id, plot_id, farmer_id, offsets)
+
+
+def _load_identity(token_hash):
+    row = (
+        SensorDevice.objects
+        .filter(token_hash=token_hash, is_active=True)
+        .values_list(*IDENTITY_FIELDS)
+        .first()
+    )
+    return _identity(row) if row is not None else None
+
+
+def load_active_devices():
+    """Return ``{device_id: DeviceIdentity}`` for every active device (one query)."""
+    rows = SensorDevice.objects.filter(is_active=True).values_list(*IDENTITY_FIELDS)
+    return {row[0]: _identity(row) for row in rows}
+
+
+def resolve_token(token):
+    """Return the DeviceIdentity for a raw token, or None if it is not valid."""
+    token_hash = SensorDevice.hash_token(token)
+    version = devices_version()
+    now = time.monotonic()
+    cached = _identities.get(token_hash)
+    if cached is not None and cached[1] > now and cached[2] == version:
+        return cached[0]
+
+    identity = _load_identity(token_hash)
+    with _lock:
+        if identity is None:
+            _identities.pop(token_hash, None)
+        else:
+            _identities[token_hash] = (identity, now + cache_ttl(), version)
+            _device_tokens[identity.device_id] = token_hash
+    return identity
+
+
+def authenticate_device(request):
+    """
+    Return ``(identity, token_present)`` for the request.
+
+    ``identity`` is None when no token was sent or the token is unknown or
+    revoked; ``token_present`` lets callers tell those two cases apart.
+    """
+    token = get_request_token(request)
+    if token is None:
+        return None, False
+    return resolve_token(token), True
+
+
+def invalidate_device(device_id):
+    with _lock:
+        token_hash = _device_tokens.pop(device_id, None)
+        if token_hash is not None:
+            _identities.pop(token_hash, None)
+    bump_devices_version()
+
+
+def clear_cache():
+    with _lock:
+        _identities.clear()
+        _device_tokens.clear()
@@ -0,0 +1,186 @@
+"""
+Full account export as a streamed ZIP of CSV files.
+
+``iter_account_export`` yields the bytes of a ZIP archive holding one CSV
+per table for a farmer::
+
+    account.csv        profile fields (no password or permissions)
+    plots.csv
+    devices.csv        token prefixes only, never hashes
+    plantings.csv
+    sensor_data.csv    readings still in SENSOR_DATA, per plot in time order
+    sensor_archive.csv readings moved out by archive_sensor_data (farm.archive)
+    advisories.csv
+
+Rows come from ``values_list(...).iterator(chunk_size)`` and are written
+into a deflated entry a chunk at a time; the ZIP goes to a write-only sink
+(``zipfile`` then uses data descriptors instead of seeking back), which is
+drained after every chunk. Memory therefore stays at one chunk of rows
+plus the compressor's window however many readings an account has. The
+same generator backs the ``account_export`` view (``StreamingHttpResponse``)
+and the ``export_accounts`` command. Under ASGI the view streams
+``aiter_account_export`` instead: Django 4.2 reads a synchronous iterator
+there in full before sending any of it.
+"""
+import csv
+import io
+import math
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db.models import DateField
+from django.utils import timezone
+
+from advisory.models import AdvisoryLog
+
+from . import archive
+from .models import FarmPlot, PlantingRecord, SensorData, SensorDevice
+
+Farmer = get_user_model()
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class _Sink:
+    """Write-only file object that hands back what ``zipfile`` wrote since the last drain."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _temporal_columns(model, columns):
+    """Positions of the date and datetime columns, which are written as ISO 8601."""
+    positions = []
+    for position, name in enumerate(columns):
+        *relations, attribute = name.split('__')
+        target = model
+        for relation in relations:
+            target = target._meta.get_field(relation).related_model
+        if isinstance(target._meta.get_field(attribute), DateField):
+            positions.append(position)
+    return positions
+
+
+def _query(queryset, columns, chunk_size):
+    temporal = _temporal_columns(queryset.model, columns)
+    for row in queryset.values_list(*columns).iterator(chunk_size=chunk_size):
+        row = list(row)
+        for position in temporal:
+            if row[position] is not None:
+                row[position] = row[position].isoformat()
+        yield row
+
+
+def _sensor_rows(plot_ids, columns, chunk_size):
+    # One plot at a time, so each query walks the (farm_plot, recorded_at) index in order.
+    for plot_id in plot_ids:
+        yield from _query(SensorData.objects.filter(farm_plot_id=plot_id).order_by('recorded_at'), columns, chunk_size)
+
+
+def _archive_rows(plot_ids):
+    # One archived plot-month is in memory at a time.
+    for plot_id in plot_ids:
+        for key, month in sorted(archive.load_index(plot_id)['months'].items()):
+            start = datetime.fromtimestamp(month['first'] / 1_000_000, dt_timezone.utc)
+            end = datetime.fromtimestamp((month['last'] + 1) / 1_000_000, dt_timezone.utc)
+            times, columns = archive.read_range(plot_id, start, end)
+            values = [columns[metric].tolist() for metric in archive.METRICS]
+            for position, seconds in enumerate(times.tolist()):
+                yield [
+                    plot_id, datetime.fromtimestamp(seconds, dt_timezone.utc).isoformat(),
+                    *('' if math.isnan(column[position]) else column[position] for column in values),
+                ]
+
+
+def export_tables(farmer_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield ``(file name, header, rows)`` for each table in a farmer's export."""
+    plot_ids = list(FarmPlot.objects.filter(farmer_id=farmer_id).order_by('pk').values_list('pk', flat=True))
+
+    columns = ('id', 'username', 'first_name', 'last_name', 'email', 'phone', 'address', 'date_joined', 'created_at')
+    yield 'account.csv', columns, _query(Farmer.objects.filter(pk=farmer_id), columns, chunk_size)
+
+    columns = ('plot_id', 'location', 'size_hectares', 'soil_type', 'created_at', 'updated_at')
+    yield 'plots.csv', columns, _query(FarmPlot.objects.filter(farmer_id=farmer_id).order_by('pk'), columns, chunk_size)
+
+    columns = (
+        'device_id', 'farm_plot_id', 'name', 'token_prefix', 'temperature_offset', 'moisture_offset',
+        'humidity_offset', 'ph_offset', 'is_active', 'revoked_at', 'created_at',
+    )
+    devices = SensorDevice.objects.filter(farm_plot_id__in=plot_ids).order_by('pk')
+    yield 'devices.csv', columns, _query(devices, columns, chunk_size)
+
+    columns = (
+        'record_id', 'farm_plot_id', 'crop_id', 'crop__name', 'planting_date', 'expected_harvest_date',
+        'actual_harvest_date', 'expected_yield_kg', 'actual_yield_kg', 'status', 'notes', 'created_at', 'updated_at',
+    )
+    plantings = PlantingRecord.objects.filter(farm_plot_id__in=plot_ids).order_by('pk')
+    yield 'plantings.csv', columns, _query(plantings, columns, chunk_size)
+
+    columns = ('data_id', 'farm_plot_id', 'device_id', 'recorded_at', *archive.METRICS, 'notes')
+    yield 'sensor_data.csv', columns, _sensor_rows(plot_ids, columns, chunk_size)
+
+    yield 'sensor_archive.csv', ('farm_plot_id', 'recorded_at', *archive.METRICS), _archive_rows(plot_ids)
+
+    columns = (
+        'advisory_id', 'created_at', 'advisory_type', 'priority', 'title', 'message', 'farm_plot_id', 'crop_id',
+        'crop__name', 'executed', 'executed_at',
+    )
+    advisories = AdvisoryLog.objects.filter(farmer_id=farmer_id).order_by('created_at', 'pk')
+    yield 'advisories.csv', columns, _query(advisories, columns, chunk_size)
+
+
+def iter_account_export(farmer_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a farmer's export ZIP as byte strings; see the module docstring."""
+    sink = _Sink()
+    text = io.StringIO()
+    writer = csv.writer(text)
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        for name, header, rows in export_tables(farmer_id, chunk_size):
+            info = zipfile.ZipInfo(name, date_time=timezone.localtime().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with bundle.open(info, 'w', force_zip64=True) as entry:
+                writer.writerow(header)
+                for count, row in enumerate(rows, start=1):
+                    writer.writerow(row)
+                    if count % chunk_size == 0:
+                        entry.write(text.getvalue().encode())
+                        text.seek(0)
+                        text.truncate()
+                        data = sink.drain()
+                        if data:
+                            yield data
+                entry.write(text.getvalue().encode())
+                text.seek(0)
+                text.truncate()
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def aiter_account_export(farmer_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Async iterator over ``iter_account_export``; each chunk is built in the thread that owns the connection."""
+    chunks = iter_account_export(farmer_id, chunk_size)
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (data := await step(chunks, None)) is not None:
+            yield data
+    finally:
+        # A client that disconnects leaves the generator, and its cursor, open.
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def export_filename(farmer):
+    return f'sass-export-{farmer.username}-{timezone.localdate().isoformat()}.zip'
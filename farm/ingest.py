@@ -0,0 +1,346 @@
+"""
+Batch ingestion of sensor readings.
+
+Gateways post many readings for many plots in a single request as a JSON
+array (or ``{"readings": [...]}``), NDJSON or CSV. Every row is validated
+on its own so one bad reading does not reject the whole batch; the accepted
+rows are written with ``bulk_create`` and evaluated for advisories in bulk.
+Rows may carry their own ``recorded_at`` (epoch seconds or ISO 8601);
+otherwise the time of ingestion is used.
+"""
+import csv
+import json
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .dashboard import invalidate_plot_readings
+from .models import FarmPlot, SensorData
+from .rollups import refresh_rollups
+
+METRIC_FIELDS = ('temperature', 'moisture', 'humidity', 'ph_level')
+
+JSON_CONTENT_TYPES = ('application/json',)
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+
+
+class IngestError(ValueError):
+    """The payload as a whole could not be read."""
+
+
+def max_batch_rows():
+    return getattr(settings, 'SENSOR_INGEST_MAX_ROWS', 10000)
+
+
+def _metric_limits():
+    limits = {}
+    for name in METRIC_FIELDS:
+        field = SensorData._meta.get_field(name)
+        quantum = Decimal(1).scaleb(-field.decimal_places)
+        bound = Decimal(10) ** (field.max_digits - field.decimal_places)
+        limits[name] = (quantum, bound)
+    return limits
+
+
+METRIC_LIMITS = _metric_limits()
+
+
+def _iter_json(stream, key):
+    try:
+        payload = json.load(stream)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise IngestError(f'Invalid JSON: {exc}')
+    if isinstance(payload, dict):
+        payload = payload.get(key)
+    if not isinstance(payload, list):
+        raise IngestError(f'Expected a JSON array of {key} or {{"{key}": [...]}}.')
+    return iter(payload)
+
+
+def _iter_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            # Keep the row so it is reported as rejected at its position.
+            yield {'__error__': f'Invalid JSON: {exc}'}
+
+
+def _iter_csv(stream, columns):
+    reader = csv.DictReader(stream)
+    missing = [name for name in columns if name not in (reader.fieldnames or ())]
+    if missing:
+        names = ', '.join(f'"{name}"' for name in missing)
+        raise IngestError(f'CSV header must include {names}.')
+    for row in reader:
+        yield row
+
+
+def _text_lines(stream):
+    for line in stream:
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            raise IngestError('Payload must be UTF-8 encoded.')
+
+
+def iter_payload(stream, content_type, key='readings', csv_columns=('plot',)):
+    """
+    Yield raw row dicts from a binary, line-iterable request stream.
+
+    JSON payloads are an array or an object with the array under ``key``;
+    CSV payloads must have the ``csv_columns`` in their header.
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in JSON_CONTENT_TYPES:
+        return _iter_json(stream, key)
+    text = _text_lines(stream)
+    if content_type in NDJSON_CONTENT_TYPES:
+        return _iter_ndjson(text)
+    if content_type in CSV_CONTENT_TYPES:
+        return _iter_csv(text, csv_columns)
+    raise IngestError(f'Unsupported content type "{content_type}". '
+                      'Use application/json, application/x-ndjson or text/csv.')
+
+
+def _clean_metric(name, value):
+    if value is None or value == '':
+        return None
+    quantum, bound = METRIC_LIMITS[name]
+    try:
+        number = Decimal(str(value)).quantize(quantum)
+    except (InvalidOperation, ValueError):
+        raise ValueError('Enter a number.')
+    if not number.is_finite() or abs(number) >= bound:
+        raise ValueError(f'Ensure the value is less than {bound} in magnitude.')
+    return number
+
+
+def parse_timestamp(value):
+    """
+    Parse a reading timestamp: epoch seconds or ISO 8601.
+
+    Naive ISO values are taken to be in the project time zone. Returns None
+    for an empty value and raises ValueError for anything unreadable.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    value = str(value).strip()
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except ValueError:
+        pass
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError('Enter epoch seconds or an ISO 8601 date/time.')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _apply_offset(name, value, offset):
+    quantum, bound = METRIC_LIMITS[name]
+    value = (value + offset).quantize(quantum)
+    if abs(value) >= bound:
+        raise ValueError(f'Calibrated value must be less than {bound} in magnitude.')
+    return value
+
+
+def clean_reading(raw, plot_farmers, device=None):
+    """
+    Validate one raw reading.
+
+    Returns ``(SensorData, None)`` for a valid row and ``(None, errors)``
+    otherwise. ``plot_farmers`` holds the plots the caller may write to.
+    Readings sent by a ``device`` default to its plot and get its
+    calibration offsets applied.
+    """
+    if not isinstance(raw, dict):
+        return None, {'__all__': 'Each reading must be an object.'}
+    if '__error__' in raw:
+        return None, {'__all__': raw['__error__']}
+
+    errors = {}
+    plot_id = raw.get('plot', raw.get('farm_plot'))
+    if device is not None and plot_id in (None, ''):
+        plot_id = device.plot_id
+    try:
+        plot_id = int(plot_id)
+    except (TypeError, ValueError):
+        errors['plot'] = 'A valid plot id is required.'
+    else:
+        if plot_id not in plot_farmers:
+            errors['plot'] = 'Unknown plot.'
+
+    try:
+        recorded_at = parse_timestamp(raw.get('recorded_at'))
+    except (ValueError, OverflowError, OSError) as exc:
+        errors['recorded_at'] = str(exc)
+
+    values = {}
+    for name in METRIC_FIELDS:
+        try:
+            values[name] = _clean_metric(name, raw.get(name))
+        except ValueError as exc:
+            errors[name] = str(exc)
+
+    if not errors and all(value is None for value in values.values()):
+        errors['__all__'] = 'At least one measurement is required.'
+    if not errors and device is not None:
+        for name, offset in device.offsets.items():
+            if values[name] is not None:
+                try:
+                    values[name] = _apply_offset(name, values[name], offset)
+                except ValueError as exc:
+                    errors[name] = str(exc)
+    if errors:
+        return None, errors
+
+    reading = SensorData(
+        farm_plot_id=plot_id,
+        device_id=device.device_id if device is not None else None,
+        notes=raw.get('notes') or '',
+        **values
+    )
+    if recorded_at is not None:
+        reading.recorded_at = recorded_at
+    return reading, None
+
+
+# Plots looked up per query by stored_keys; each adds one range to the WHERE clause.
+PLOTS_PER_QUERY = 200
+
+
+def stored_keys(readings):
+    """Return the (plot id, recorded_at) pairs of ``readings`` that are already in SENSOR_DATA."""
+    ranges = {}
+    for reading in readings:
+        low, high = ranges.get(reading.farm_plot_id, (reading.recorded_at, reading.recorded_at))
+        ranges[reading.farm_plot_id] = (min(low, reading.recorded_at), max(high, reading.recorded_at))
+    ranges = list(ranges.items())
+    keys = set()
+    for offset in range(0, len(ranges), PLOTS_PER_QUERY):
+        # One (farm_plot, recorded_at) index range per plot.
+        condition = Q()
+        for plot_id, (low, high) in ranges[offset:offset + PLOTS_PER_QUERY]:
+            condition |= Q(farm_plot_id=plot_id, recorded_at__gte=low, recorded_at__lte=high)
+        keys.update(SensorData.objects.filter(condition).order_by().values_list('farm_plot_id', 'recorded_at'))
+    return keys
+
+
+def write_readings(readings, batch_size=None):
+    """
+    Upsert validated readings in batches.
+
+    A reading for a (plot, recorded_at) pair that already exists replaces
+    the stored values instead of adding a duplicate, so retried uploads and
+    re-run imports are idempotent. Within one call the last reading for a
+    pair wins. The hourly and daily rollups of the touched buckets are
+    refreshed in the same call.
+
+    Returns the readings that were not stored before, so that callers
+    evaluate advisories once per reading however often it is re-sent.
+    Their primary keys are not set: upserts do not return them.
+    """
+    batch_size = batch_size or getattr(settings, 'SENSOR_INGEST_BATCH_SIZE', 1000)
+    unique = {}
+    for reading in readings:
+        unique[(reading.farm_plot_id, reading.recorded_at)] = reading
+    if len(unique) != len(readings):
+        readings = list(unique.values())
+    if not readings:
+        return []
+    existing = stored_keys(readings)
+
+    options = {}
+    features = connection.features
+    if features.supports_update_conflicts:
+        options = {
+            'update_conflicts': True,
+            'update_fields': [*METRIC_FIELDS, 'device', 'notes'],
+        }
+        if features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['farm_plot', 'recorded_at']
+    else:
+        options = {'ignore_conflicts': True}
+    SensorData.objects.bulk_create(readings, batch_size=batch_size, **options)
+    refresh_rollups(readings)
+    invalidate_plot_readings(*(reading.farm_plot_id for reading in readings))
+    return [reading for key, reading in unique.items() if key not in existing]
+
+
+def clean_batch(raw_rows, plot_farmers, device=None):
+    """
+    Validate raw rows against ``plot_farmers``.
+
+    Returns ``(accepted, results)``: the valid SensorData instances and one
+    accept/reject result per input row, in input order.
+    """
+    limit = max_batch_rows()
+    results = []
+    accepted = []
+    for index, raw in enumerate(raw_rows):
+        if index >= limit:
+            raise IngestError(f'Batch exceeds the limit of {limit} readings.')
+        reading, errors = clean_reading(raw, plot_farmers, device)
+        if errors:
+            results.append({'row': index, 'status': 'rejected', 'errors': errors})
+        else:
+            accepted.append(reading)
+            results.append({'row': index, 'status': 'accepted'})
+    return accepted, results
+
+
+def store_readings(readings, plot_farmers):
+    """
+    Write validated readings and their advisories in one transaction.
+
+    Only readings that were not stored before are evaluated, so a retried
+    batch does not write its advisories again.
+    """
+    from advisory.views import generate_advisories_bulk
+
+    with transaction.atomic():
+        inserted = write_readings(readings)
+        return generate_advisories_bulk(inserted, plot_farmers)
+
+
+def ingest_readings(raw_rows, farmer=None, device=None):
+    """
+    Validate, store and evaluate a batch of readings.
+
+    The batch belongs either to a logged-in ``farmer`` (any of their plots)
+    or to an authenticated ``device`` (its own plot only, resolved from the
+    device cache without touching the database). Returns a dict with the
+    accepted/rejected counts and one result per input row, in input order.
+    """
+    if device is not None:
+        plot_farmers = {device.plot_id: device.farmer_id}
+    else:
+        plot_farmers = dict(
+            FarmPlot.objects.filter(farmer=farmer).values_list('plot_id', 'farmer_id')
+        )
+
+    accepted, results = clean_batch(raw_rows, plot_farmers, device)
+    advisories = store_readings(accepted, plot_farmers)
+
+    return {
+        'accepted': len(accepted),
+        'rejected': len(results) - len(accepted),
+        'advisories': len(advisories),
+        'results': results,
+    }
@@ -0,0 +1,323 @@
+import gc
+import json
+import math
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+from django.utils import timezone
+
+from advisory.models import AdvisoryLog
+from farm.dashboard import invalidate_farmers
+from farm.models import FarmPlot, SensorData, SensorDevice
+from sass.querybudget import QueryRecorder
+
+# One benchmarked request: ``request(client, n)`` for the n-th run, and an
+# optional ``prepare()`` that runs untimed before it.
+Scenario = namedtuple('Scenario', ['request', 'prepare'], defaults=[None])
+SCENARIOS = (
+    'dashboard', 'dashboard_cold', 'plot_detail', 'plot_series', 'advisory_list', 'market_price_list',
+    'sensor_ingest',
+)
+# Metrics compared with a baseline; query counts are exact, so any increase counts.
+# Tail latencies are reported but not compared: over a few hundred requests
+# they move by more than any useful threshold between identical runs.
+TIMED_METRICS = ('p50_ms', 'peak_kb')
+COUNTED_METRICS = ('queries',)
+# Timing jitter between identical runs; a latency regression must also exceed this many milliseconds.
+DEFAULT_MIN_MS = 5.0
+# The timed requests of each scenario are split into this many rounds, and
+# the scenarios take turns round by round, so a slow spell of the machine is
+# shared by all of them instead of landing on whichever ran at the time.
+ROUNDS = 5
+# Scenarios that add data; they run after the others so every read sees the seeded dataset.
+WRITE_SCENARIOS = ('sensor_ingest',)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (which must not be empty)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def build_scenarios(farmer, plot, token, ingest_rows):
+    plot_url = reverse('plot_detail', args=[plot.pk])
+    series_url = reverse('plot_series', args=[plot.pk])
+    ingest_url = reverse('sensor_data_bulk')
+    # Ingested readings start after the seeded history and never repeat.
+    start = int(timezone.now().timestamp()) + 3600
+
+    def ingest(client, n):
+        readings = [
+            {'recorded_at': start + n * ingest_rows + row, 'temperature': 28.5, 'moisture': 72.0,
+             'humidity': 81.0, 'ph_level': 6.4}
+            for row in range(ingest_rows)
+        ]
+        return client.post(ingest_url, json.dumps({'readings': readings}), content_type='application/json',
+                           HTTP_AUTHORIZATION=f'Token {token}')
+
+    return {
+        'dashboard': Scenario(lambda client, n: client.get(reverse('dashboard'))),
+        'dashboard_cold': Scenario(
+            lambda client, n: client.get(reverse('dashboard')),
+            lambda: invalidate_farmers([farmer.pk], 'plots', 'advisories'),
+        ),
+        'plot_detail': Scenario(lambda client, n: client.get(plot_url)),
+        # The chart data of plot_detail, over the seeded history.
+        'plot_series': Scenario(lambda client, n: client.get(series_url, {'start': 0})),
+        'advisory_list': Scenario(lambda client, n: client.get(reverse('advisory_list'))),
+        'market_price_list': Scenario(lambda client, n: client.get(reverse('market_price_list'))),
+        'sensor_ingest': Scenario(ingest),
+    }
+
+
+def bench_caches():
+    """The configured caches under a key prefix of this run's own."""
+    prefix = f'bench-{uuid.uuid4().hex[:12]}'
+    return {
+        alias: {**config, 'KEY_PREFIX': f'{prefix}:{config.get("KEY_PREFIX", "")}'}
+        for alias, config in settings.CACHES.items()
+    }
+
+
+@contextmanager
+def test_database():
+    """Create a test database for ``default``, migrated and empty, and drop it afterwards."""
+    test_settings = connection.settings_dict['TEST']
+    name, scratch = test_settings['NAME'], None
+    if connection.vendor == 'sqlite' and test_settings['NAME'] in (None, '', ':memory:'):
+        # An in-memory database would hide the cost of writing to disk.
+        scratch = tempfile.mkdtemp(prefix='sass-bench-')
+        test_settings['NAME'] = os.path.join(scratch, 'bench.sqlite3')
+    try:
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'}, serialized_aliases=set())
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+    finally:
+        if scratch:
+            test_settings['NAME'] = name
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+def regressions(current, baseline, threshold, min_ms=DEFAULT_MIN_MS):
+    """
+    Describe each metric of ``current`` that is worse than ``baseline`` by
+    more than ``threshold`` percent (and, for latencies, ``min_ms``).
+    """
+    problems = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        for metric in TIMED_METRICS + COUNTED_METRICS:
+            old, new = before.get(metric), result[metric]
+            if old is None:
+                continue
+            limit = old if metric in COUNTED_METRICS else old * (1 + threshold / 100)
+            if metric.endswith('_ms'):
+                limit = max(limit, old + min_ms)
+            if new > limit:
+                change = f'{(new - old) / old:+.0%}' if old else 'new'
+                problems.append(f'{name} {metric}: {old:g} -> {new:g} ({change})')
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the dashboard, plot detail and chart series, advisory and market price lists and sensor ingestion '
+        'through the test client against a generated dataset in a throwaway test database. Reports latency '
+        'percentiles, queries, SQL time and peak Python memory per scenario; --output writes them as JSON '
+        'and --baseline fails on regressions against an earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmers', type=int, default=50, help='Farmers to generate (default: 50).')
+        parser.add_argument('--years', type=float, default=0.1, help='Years of readings per plot (default: 0.1).')
+        parser.add_argument('--interval', type=int, default=60, help='Minutes between readings (default: 60).')
+        parser.add_argument('--seed', type=int, default=7, help='seed_data random seed (default: 7).')
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Run only these scenarios.')
+        parser.add_argument('--iterations', type=int, default=200, help='Timed requests per scenario (default: 200).')
+        parser.add_argument(
+            '--warmup', type=int, default=5, help='Untimed requests before each round of a scenario (default: 5).',
+        )
+        parser.add_argument('--ingest-rows', type=int, default=500, help='Readings per ingest request (default: 500).')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare with.')
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help='Percent by which latency or memory may exceed the baseline (default: 20).',
+        )
+        parser.add_argument(
+            '--min-ms', type=float, default=DEFAULT_MIN_MS,
+            help=f'Milliseconds a latency must also grow by to count as a regression (default: {DEFAULT_MIN_MS:g}).',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0 or options['ingest_rows'] < 1:
+            raise CommandError('--iterations and --ingest-rows must be positive and --warmup must not be negative.')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {exc}')
+        names = options['scenario'] or SCENARIOS
+
+        # DEBUG would log every query on the connection and skew the timings.
+        # The run gets a database of its own, so the scenarios commit (and pay
+        # for it) like real requests and on_commit work such as the dashboard
+        # invalidation runs, and cache keys of its own, so ids reused by the
+        # fresh database never meet entries cached for the real one.
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                               CACHES=bench_caches()):
+            with test_database():
+                farmer, plot, token, dataset = self.seed(options)
+                client = Client()
+                client.force_login(farmer)
+                scenarios = build_scenarios(farmer, plot, token, options['ingest_rows'])
+                results = self.measure({name: scenarios[name] for name in names}, client, options)
+
+        report = {
+            'meta': {
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'created_at': timezone.now().isoformat(timespec='seconds'),
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'ingest_rows': options['ingest_rows'],
+                'dataset': dataset,
+            },
+            'scenarios': results,
+        }
+        self.print_report(results)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+                handle.write('\n')
+            self.stdout.write(f'Results written to {options["output"]}.')
+
+        if baseline is not None:
+            if baseline.get('meta', {}).get('dataset') != dataset:
+                self.stdout.write(self.style.WARNING('The baseline was measured on a different dataset.'))
+            problems = regressions(report, baseline, options['threshold'], options['min_ms'])
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f'REGRESSION  {problem}'))
+            if problems:
+                raise CommandError(f'{len(problems)} metric{"s" if len(problems) != 1 else ""} regressed.')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}.'))
+
+    def seed(self, options):
+        started = time.perf_counter()
+        call_command(
+            'seed_data', farmers=options['farmers'], years=options['years'], interval=options['interval'],
+            seed=options['seed'], stdout=StringIO(),
+        )
+        plot = FarmPlot.objects.select_related('farmer').order_by('pk').first()
+        if plot is None:
+            raise CommandError('The generated dataset has no plots; use a larger --farmers.')
+        device = SensorDevice(farm_plot=plot, name='Benchmark gateway')
+        token = device.issue_token()
+        device.save()
+        dataset = {
+            'farmers': options['farmers'],
+            'plots': FarmPlot.objects.count(),
+            'readings': SensorData.objects.count(),
+            'advisories': AdvisoryLog.objects.count(),
+        }
+        self.stdout.write(
+            f'Seeded {dataset["farmers"]:,} farmers, {dataset["plots"]:,} plots and {dataset["readings"]:,} '
+            f'readings in {time.perf_counter() - started:.1f}s.'
+        )
+        return plot.farmer, plot, token, dataset
+
+    def measure(self, scenarios, client, options):
+        runs = dict.fromkeys(scenarios, 0)
+
+        def run(name):
+            scenario = scenarios[name]
+            if scenario.prepare:
+                scenario.prepare()
+            with QueryRecorder() as recorder:
+                started = time.perf_counter()
+                response = scenario.request(client, runs[name])
+                elapsed = time.perf_counter() - started
+            runs[name] += 1
+            if response.status_code not in (200, 201):
+                raise CommandError(f'{name} returned HTTP {response.status_code}.')
+            return elapsed * 1000, recorder
+
+        samples = {name: ([], [], []) for name in scenarios}
+        reads = [name for name in scenarios if name not in WRITE_SCENARIOS]
+        writes = [name for name in scenarios if name in WRITE_SCENARIOS]
+        rounds = min(ROUNDS, options['iterations'])
+        for group in (reads, writes):
+            for number in range(rounds):
+                share = options['iterations'] // rounds + (number < options['iterations'] % rounds)
+                for name in group:
+                    self.sample(run, name, share, options['warmup'], *samples[name])
+
+        results = {}
+        for name in reads + writes:
+            timings, queries, sql_ms = samples[name]
+            # Tracing slows every allocation, so memory gets a request of its own.
+            run(name)
+            tracemalloc.start()
+            try:
+                run(name)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            results[name] = {
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'queries': max(queries),
+                'sql_ms': round(percentile(sql_ms, 50), 3),
+                'peak_kb': round(peak / 1024),
+            }
+        return results
+
+    def sample(self, run, name, count, warmup, timings, queries, sql_ms):
+        # Other scenarios ran in between; warm this one up again.
+        for _ in range(warmup):
+            run(name)
+        # Collector pauses would land on arbitrary requests and swamp the tail percentiles.
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(count):
+                elapsed, recorder = run(name)
+                timings.append(elapsed)
+                queries.append(len(recorder.queries))
+                sql_ms.append(recorder.time_ms)
+        finally:
+            gc.enable()
+
+    def print_report(self, results):
+        self.stdout.write(
+            f'{"scenario":<18} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8} {"sql ms":>8} {"peak KiB":>9}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<18} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+                f'{result["queries"]:>8} {result["sql_ms"]:>8.2f} {result["peak_kb"]:>9,}'
+            )
@@ -0,0 +1,54 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from farm.export import DEFAULT_CHUNK_SIZE, export_filename, iter_account_export
+
+Farmer = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Write one export ZIP (CSV per table, as served by the account export view) per farmer into a directory. '
+        'Rows are streamed, so memory does not grow with the size of an account.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmer', type=int, action='append', dest='farmers', help='Limit to a farmer id (repeatable).')
+        parser.add_argument('--output-dir', default='exports', help='Directory for the ZIP files (default: exports).')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Rows fetched and compressed per step (default: {DEFAULT_CHUNK_SIZE}).')
+
+    def handle(self, *args, **options):
+        farmers = Farmer.objects.order_by('pk')
+        if options['farmers']:
+            farmers = farmers.filter(pk__in=options['farmers'])
+            missing = set(options['farmers']) - set(farmers.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f'Unknown farmer ids: {", ".join(map(str, sorted(missing)))}')
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        chunk_size = max(1, options['chunk_size'])
+
+        started = time.perf_counter()
+        exported = total_bytes = 0
+        for farmer in farmers.iterator():
+            path = os.path.join(output_dir, export_filename(farmer))
+            partial = f'{path}.part'
+            size = 0
+            with open(partial, 'wb') as handle:
+                for data in iter_account_export(farmer.pk, chunk_size=chunk_size):
+                    handle.write(data)
+                    size += len(data)
+            os.replace(partial, path)
+            exported += 1
+            total_bytes += size
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{path}: {size:,} bytes')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {exported:,} accounts ({total_bytes / 1_048_576:.1f} MiB) to {output_dir} '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,153 @@
+import csv
+import os
+import time
+import zoneinfo
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from farm.device_auth import load_active_devices
+from farm.ingest import clean_reading, write_readings
+from farm.models import FarmPlot
+
+MAX_REPORTED_ERRORS = 20
+
+
+def _init_worker():
+    # Forked workers must not share the parent's database connections;
+    # spawned workers need the app registry set up first.
+    django.setup()
+    connections.close_all()
+
+
+def import_file(path, shard, shards, options):
+    """
+    Stream one CSV file into SENSOR_DATA.
+
+    With ``shards > 1`` only rows whose plot id falls in ``shard`` are
+    written, so several workers can share one file without touching the
+    same plots. Returns ``(read, imported, rejected, errors)``.
+    """
+    plot_farmers = dict(FarmPlot.objects.values_list('plot_id', 'farmer_id'))
+    devices = load_active_devices()
+    chunk_size = options['chunk_size']
+    read = imported = rejected = 0
+    errors = []
+    chunk = []
+
+    def flush():
+        nonlocal imported
+        with transaction.atomic():
+            write_readings(chunk, batch_size=chunk_size)
+        imported += len(chunk)
+        chunk.clear()
+
+    with timezone.override(zoneinfo.ZoneInfo(options['timezone'])), \
+            open(path, newline='', encoding='utf-8') as handle:
+        reader = csv.DictReader(handle)
+        if not reader.fieldnames or 'recorded_at' not in reader.fieldnames or not (
+                {'plot', 'device'} & set(reader.fieldnames)):
+            raise CommandError(f'{path}: header needs "recorded_at" and a "plot" or "device" column.')
+        for line_no, raw in enumerate(reader, start=2):
+            device = None
+            device_id = raw.get('device')
+            if device_id:
+                device = devices.get(int(device_id)) if device_id.isdigit() else None
+                if device is None:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(f'{path}:{line_no}: unknown or inactive device {device_id!r}')
+                    continue
+                plot_id = device.plot_id
+            else:
+                plot_id = raw.get('plot') or ''
+                plot_id = int(plot_id) if plot_id.isdigit() else 0
+            if shards > 1 and plot_id % shards != shard:
+                continue
+            read += 1
+            if not raw.get('recorded_at'):
+                reading, row_errors = None, {'recorded_at': 'A timestamp is required for imports.'}
+            else:
+                reading, row_errors = clean_reading(raw, plot_farmers, device)
+            if row_errors:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f'{path}:{line_no}: {row_errors}')
+                continue
+            chunk.append(reading)
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    return read, imported, rejected, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Import historical sensor readings from CSV files, keeping the source timestamps. '
+        'Columns: recorded_at, plot or device, temperature, moisture, humidity, ph_level, notes. '
+        'Re-importing the same rows updates them instead of creating duplicates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='CSV files to import.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per upsert transaction (default: 5000).')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (default: 1).')
+        parser.add_argument(
+            '--partition', choices=['file', 'plot'], default='file',
+            help='Split work per file, or per plot id so several workers can share one large file.',
+        )
+        parser.add_argument(
+            '--timezone', default=timezone.get_current_timezone_name(),
+            help='Time zone for timestamps without an offset (default: project TIME_ZONE).',
+        )
+
+    def handle(self, *args, **options):
+        for path in options['files']:
+            if not os.path.isfile(path):
+                raise CommandError(f'File not found: {path}')
+        try:
+            zoneinfo.ZoneInfo(options['timezone'])
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            raise CommandError(f"Unknown time zone: {options['timezone']}")
+
+        workers = max(1, options['workers'])
+        if options['partition'] == 'plot':
+            jobs = [(path, shard, workers) for path in options['files'] for shard in range(workers)]
+        else:
+            jobs = [(path, 0, 1) for path in options['files']]
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite allows one writer at a time; extra workers only parallelise parsing.'
+            ))
+
+        started = time.perf_counter()
+        totals = [0, 0, 0]
+        if workers == 1:
+            for job in jobs:
+                self._collect(totals, import_file(*job, options))
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [pool.submit(import_file, *job, options) for job in jobs]
+                for future in as_completed(futures):
+                    self._collect(totals, future.result())
+
+        elapsed = time.perf_counter() - started
+        read, imported, rejected = totals
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported:,} of {read:,} rows ({rejected:,} rejected) '
+            f'in {elapsed:.1f}s ({rate:,.0f} rows/s).'
+        ))
+
+    def _collect(self, totals, result):
+        read, imported, rejected, errors = result
+        totals[0] += read
+        totals[1] += imported
+        totals[2] += rejected
+        for error in errors:
+            self.stderr.write(error)
@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import signal
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+
+from advisory.checks import warn_if_process_local_cache
+from farm.coalescer import Backpressure, WriteCoalescer
+from farm.device_auth import devices_version, load_active_devices
+from farm.ingest import METRIC_FIELDS, clean_reading
+from farm.models import FarmPlot
+
+logger = logging.getLogger(__name__)
+
+# Longest line accepted over TCP; a client exceeding it is disconnected.
+MAX_LINE_BYTES = 4096
+
+PROTOCOL_HELP = """
+Line protocol, one reading per line (UTF-8, comma separated):
+
+    <target>,<timestamp>,<temperature>,<moisture>,<humidity>,<ph>
+
+<target> is "p<plot id>" or "d<device id>". <timestamp> is epoch seconds
+or ISO 8601; leave it empty to use the time of receipt. Empty measurement
+fields are stored as NULL. Blank lines and lines starting with "#" are
+ignored. Example:
+
+    d12,1718870400,27.4,64.10,81.0,6.35
+    p7,,29.1,,78.5,
+"""
+
+
+def load_targets():
+    """Snapshot the devices version, the plot -> farmer map and active devices for line lookups."""
+    # Read the version first: a device changed while loading is loaded again next time.
+    version = devices_version()
+    plot_farmers = dict(FarmPlot.objects.values_list('plot_id', 'farmer_id'))
+    return version, plot_farmers, load_active_devices()
+
+
+class LineIngestor:
+    def __init__(self, coalescer, max_line=MAX_LINE_BYTES):
+        self.coalescer = coalescer
+        self.max_line = max_line
+        self.plot_farmers = {}
+        self.devices = {}
+        self.devices_version = None
+        self.received = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.oversized = 0
+        self.connections = 0
+
+    async def refresh(self):
+        self.devices_version, self.plot_farmers, self.devices = await sync_to_async(load_targets)()
+
+    async def devices_changed(self):
+        """True once a device was revoked or edited since the last refresh."""
+        return await sync_to_async(devices_version)() != self.devices_version
+
+    def parse_line(self, line):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            return None
+        fields = line.split(',')
+        if len(fields) != 6:
+            raise ValueError('expected 6 fields')
+        target, timestamp, *metrics = fields
+        raw = dict(zip(METRIC_FIELDS, metrics))
+        raw['recorded_at'] = timestamp
+        device = None
+        if target[:1] in ('d', 'D'):
+            device = self.devices.get(int(target[1:]))
+            if device is None:
+                raise ValueError(f'unknown device {target}')
+        elif target[:1] in ('p', 'P'):
+            raw['plot'] = target[1:]
+        else:
+            raise ValueError(f'bad target {target!r}')
+        reading, errors = clean_reading(raw, self.plot_farmers, device)
+        if errors:
+            raise ValueError(str(errors))
+        return reading
+
+    def parse_lines(self, lines):
+        readings = []
+        for line in lines:
+            try:
+                reading = self.parse_line(line)
+            except ValueError as exc:
+                self.rejected += 1
+                logger.debug('Rejected line %r: %s', line, exc)
+                continue
+            if reading is not None:
+                readings.append(reading)
+        self.received += len(readings)
+        return readings
+
+    def offer(self, readings):
+        """Queue readings without waiting; returns False and drops them if the queue is full."""
+        try:
+            self.coalescer.submit(readings, self.plot_farmers)
+        except Backpressure:
+            self.dropped += len(readings)
+            return False
+        return True
+
+    async def submit(self, readings):
+        # More readings than the whole queue holds would never be accepted at once.
+        size = self.coalescer.queue_size
+        while readings:
+            try:
+                self.coalescer.submit(readings[:size], self.plot_farmers)
+            except Backpressure:
+                if not self.coalescer.accepting:
+                    self.dropped += len(readings)
+                    return
+                # Stop reading from this socket until the writer catches up.
+                await asyncio.sleep(0.05)
+                continue
+            readings = readings[size:]
+
+    async def handle_tcp(self, reader, writer):
+        self.connections += 1
+        pending = b''
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                pending += chunk
+                *lines, pending = pending.split(b'\n')
+                if len(pending) > self.max_line or any(len(line) > self.max_line for line in lines):
+                    # Without a newline the buffer would grow for as long as the client keeps sending.
+                    self.oversized += 1
+                    logger.warning('Closing connection that sent a line over %d bytes', self.max_line)
+                    return
+                if lines:
+                    await self.submit(self.parse_lines([line.decode('utf-8', 'replace') for line in lines]))
+            if pending:
+                await self.submit(self.parse_lines([pending.decode('utf-8', 'replace')]))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+class UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, ingestor):
+        self.ingestor = ingestor
+
+    def datagram_received(self, data, addr):
+        lines = data.decode('utf-8', 'replace').splitlines()
+        readings = self.ingestor.parse_lines(lines)
+        if readings:
+            # Datagrams cannot be paused, so a full queue drops them.
+            self.ingestor.offer(readings)
+
+
+async def open_listeners(ingestor, host, tcp_port=None, udp_port=None, backlog=100):
+    """
+    Listen for lines on ``tcp_port`` and ``udp_port`` (None disables one, 0 picks a free port).
+
+    Returns ``(servers, transport)``: the TCP servers and the UDP transport or None.
+    """
+    servers = []
+    if tcp_port is not None:
+        servers.append(await asyncio.start_server(ingestor.handle_tcp, host, tcp_port, backlog=backlog))
+    transport = None
+    if udp_port is not None:
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: UDPProtocol(ingestor), local_addr=(host, udp_port),
+        )
+    return servers, transport
+
+
+class Command(BaseCommand):
+    help = 'Run an asyncio TCP/UDP server that ingests sensor readings in a compact line protocol.'
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.epilog = PROTOCOL_HELP
+        return parser
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1).')
+        parser.add_argument('--tcp-port', type=int, default=8094, help='TCP port, 0 to disable (default: 8094).')
+        parser.add_argument('--udp-port', type=int, default=8094, help='UDP port, 0 to disable (default: 8094).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per database flush.')
+        parser.add_argument('--flush-ms', type=int, default=500, help='Maximum time between flushes.')
+        parser.add_argument('--queue-size', type=int, default=200000, help='Readings buffered before backpressure.')
+        parser.add_argument('--backlog', type=int, default=4096, help='TCP listen backlog.')
+        parser.add_argument(
+            '--max-line', type=int, default=MAX_LINE_BYTES,
+            help=f'Longest TCP line in bytes; longer ones close the connection (default: {MAX_LINE_BYTES}).',
+        )
+        parser.add_argument(
+            '--refresh', type=int, default=60,
+            help='Seconds between plot/device map reloads; a device change reloads at the next report.',
+        )
+        parser.add_argument('--report-interval', type=int, default=10, help='Seconds between ingest rate reports.')
+
+    def handle(self, *args, **options):
+        if not options['tcp_port'] and not options['udp_port']:
+            raise CommandError('Enable at least one of --tcp-port and --udp-port.')
+        warn_if_process_local_cache()
+        self._raise_fd_limit()
+        asyncio.run(self.serve(options))
+
+    def _raise_fd_limit(self):
+        # Thousands of concurrent gateways need as many file descriptors.
+        try:
+            import resource
+        except ImportError:
+            return
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            target = 65536 if hard == resource.RLIM_INFINITY else hard
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            except (ValueError, OSError):
+                pass
+
+    async def serve(self, options):
+        loop = asyncio.get_running_loop()
+        coalescer = WriteCoalescer(
+            max_rows=options['batch_size'],
+            interval_ms=options['flush_ms'],
+            queue_size=options['queue_size'],
+        )
+        coalescer.start()
+        ingestor = LineIngestor(coalescer, max_line=options['max_line'])
+        await ingestor.refresh()
+
+        servers, transport = await open_listeners(
+            ingestor, options['host'], options['tcp_port'] or None, options['udp_port'] or None, options['backlog'],
+        )
+        for server in servers:
+            host, port = server.sockets[0].getsockname()[:2]
+            self.stdout.write(f"TCP listening on {host}:{port}")
+        if transport is not None:
+            host, port = transport.get_extra_info('sockname')[:2]
+            self.stdout.write(f"UDP listening on {host}:{port}")
+
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        reporter = loop.create_task(self.report(ingestor, options['report_interval'], options['refresh']))
+        try:
+            await stop.wait()
+        finally:
+            self.stdout.write('Shutting down, flushing queued readings...')
+            reporter.cancel()
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+            if transport is not None:
+                transport.close()
+            await coalescer.close()
+            self.write_report(ingestor, coalescer, 0, 0)
+            self.stdout.write(self.style.SUCCESS('Ingest server stopped.'))
+
+    async def report(self, ingestor, interval, refresh):
+        last_received = 0
+        last_time = time.monotonic()
+        last_refresh = last_time
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            try:
+                # A revoked device stops being accepted at the next report, not the next refresh.
+                if now - last_refresh >= refresh or await ingestor.devices_changed():
+                    await ingestor.refresh()
+                    last_refresh = now
+            except Exception:
+                logger.exception('Failed to reload plot/device map')
+                last_refresh = now
+            rate = (ingestor.received - last_received) / (now - last_time)
+            self.write_report(ingestor, ingestor.coalescer, rate, ingestor.connections)
+            last_received = ingestor.received
+            last_time = now
+
+    def write_report(self, ingestor, coalescer, rate, connections):
+        stats = coalescer.stats()
+        self.stdout.write(
+            f"{rate:,.0f} readings/s | received {ingestor.received:,} | "
+            f"written {stats['flushed_rows']:,} | rejected {ingestor.rejected:,} | "
+            f"dropped {ingestor.dropped:,} | oversized {ingestor.oversized:,} | failed {stats['failed_rows']:,} | "
+            f"queue {stats['queue_depth']:,} | avg flush {stats['avg_flush_size']} | "
+            f"connections {connections}"
+        )
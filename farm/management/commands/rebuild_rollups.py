@@ -0,0 +1,69 @@
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from farm.models import FarmPlot, SensorData
+from farm.rollups import refresh_ranges
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min), timezone.get_default_timezone())
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the hourly and daily sensor rollups from SENSOR_DATA and the archived readings '
+        'for a date range, e.g. after deleting readings in bulk or changing TIME_ZONE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day (YYYY-MM-DD); default: the oldest reading.')
+        parser.add_argument('--end', help='Last day, inclusive (YYYY-MM-DD); default: the newest reading.')
+        parser.add_argument('--plot', type=int, action='append', dest='plots', help='Limit to a plot id (repeatable).')
+        parser.add_argument('--days', type=int, default=31, help='Days recomputed per transaction (default: 31).')
+
+    def handle(self, *args, **options):
+        readings = SensorData.objects.all()
+        plots = FarmPlot.objects.order_by('plot_id')
+        if options['plots']:
+            readings = readings.filter(farm_plot_id__in=options['plots'])
+            plots = plots.filter(plot_id__in=options['plots'])
+        plot_ids = list(plots.values_list('plot_id', flat=True))
+        if not plot_ids:
+            raise CommandError('No matching plots.')
+
+        bounds = readings.aggregate(first=Min('recorded_at'), last=Max('recorded_at'))
+        tz = timezone.get_default_timezone()
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        if (options['start'] and start is None) or (options['end'] and end is None):
+            raise CommandError('--start and --end must be dates (YYYY-MM-DD).')
+        if start is None or end is None:
+            if bounds['first'] is None:
+                self.stdout.write('No readings to roll up.')
+                return
+            start = start or timezone.localtime(bounds['first'], tz).date()
+            end = end or timezone.localtime(bounds['last'], tz).date()
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+
+        started = time.perf_counter()
+        step = timedelta(days=max(1, options['days']))
+        day = start
+        while day <= end:
+            last = min(day + step, end + timedelta(days=1))
+            ranges = [(plot_id, _day_start(day), _day_start(last)) for plot_id in plot_ids]
+            with transaction.atomic():
+                refresh_ranges(ranges)
+            self.stdout.write(f'{day} .. {last - timedelta(days=1)}: {len(plot_ids):,} plots')
+            day = last
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rollups for {len(plot_ids):,} plots from {start} to {end} '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
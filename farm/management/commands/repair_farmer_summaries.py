@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from farm.summary import rebuild_summaries
+
+Farmer = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount FARMER_SUMMARY (plots, active crops, open advisories) and FARMER_CROP from the source tables '
+        'in batches of farmers, and report counters that had drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmer', type=int, action='append', dest='farmers', help='Limit to a farmer id (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Farmers recounted per transaction (default: 500).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift; write nothing.')
+
+    def handle(self, *args, **options):
+        farmers = Farmer.objects.order_by('pk')
+        if options['farmers']:
+            farmers = farmers.filter(pk__in=options['farmers'])
+        farmer_ids = list(farmers.values_list('pk', flat=True))
+        batch_size = max(1, options['batch_size'])
+
+        started = time.perf_counter()
+        drifted = 0
+        for offset in range(0, len(farmer_ids), batch_size):
+            drift = rebuild_summaries(farmer_ids[offset:offset + batch_size], save=not options['dry_run'])
+            for farmer_id, counters in sorted(drift.items()):
+                changes = ', '.join(f'{name} {stored} -> {counted}' for name, (stored, counted) in counters.items())
+                self.stdout.write(f'Farmer {farmer_id}: {changes}')
+            drifted += len(drift)
+
+        verb = 'Checked' if options['dry_run'] else 'Rebuilt'
+        style = self.style.WARNING if drifted else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{verb} {len(farmer_ids):,} farmer summaries in {time.perf_counter() - started:.1f}s; '
+            f'{drifted:,} had drifted.'
+        ))
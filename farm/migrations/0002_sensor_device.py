@@ -0,0 +1,43 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorDevice',
+            fields=[
+                ('device_id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('token_hash', models.CharField(editable=False, max_length=64, unique=True)),
+                ('token_prefix', models.CharField(editable=False, max_length=8)),
+                ('temperature_offset', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('moisture_offset', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('humidity_offset', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('ph_offset', models.DecimalField(decimal_places=2, default=0, max_digits=4)),
+                ('is_active', models.BooleanField(default=True)),
+                ('revoked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('farm_plot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='devices', to='farm.farmplot')),
+            ],
+            options={
+                'verbose_name': 'Sensor Device',
+                'verbose_name_plural': 'Sensor Devices',
+                'db_table': 'SENSOR_DEVICE',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='sensordata',
+            name='device',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sensor_data', to='farm.sensordevice'),
+        ),
+    ]
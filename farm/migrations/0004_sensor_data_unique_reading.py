@@ -0,0 +1,36 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:46
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_readings(apps, schema_editor):
+    # Keep the oldest row of every (plot, recorded_at) pair so the unique
+    # constraint below can be created on existing data.
+    SensorData = apps.get_model('farm', 'SensorData')
+    duplicates = (
+        SensorData.objects
+        .values('farm_plot_id', 'recorded_at')
+        .annotate(keep=Min('data_id'), copies=Count('data_id'))
+        .filter(copies__gt=1)
+    )
+    for row in duplicates.iterator():
+        SensorData.objects.filter(
+            farm_plot_id=row['farm_plot_id'],
+            recorded_at=row['recorded_at'],
+        ).exclude(data_id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0003_sensor_data_recorded_at_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_readings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sensordata',
+            constraint=models.UniqueConstraint(fields=('farm_plot', 'recorded_at'), name='unique_sensor_reading_per_plot_time'),
+        ),
+    ]
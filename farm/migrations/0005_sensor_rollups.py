@@ -0,0 +1,86 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0004_sensor_data_unique_reading'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorHourlyRollup',
+            fields=[
+                ('bucket', models.DateTimeField()),
+                ('readings', models.PositiveIntegerField(default=0)),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('temperature_sum', models.FloatField(blank=True, null=True)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('moisture_count', models.PositiveIntegerField(default=0)),
+                ('moisture_sum', models.FloatField(blank=True, null=True)),
+                ('moisture_min', models.FloatField(blank=True, null=True)),
+                ('moisture_max', models.FloatField(blank=True, null=True)),
+                ('humidity_count', models.PositiveIntegerField(default=0)),
+                ('humidity_sum', models.FloatField(blank=True, null=True)),
+                ('humidity_min', models.FloatField(blank=True, null=True)),
+                ('humidity_max', models.FloatField(blank=True, null=True)),
+                ('ph_level_count', models.PositiveIntegerField(default=0)),
+                ('ph_level_sum', models.FloatField(blank=True, null=True)),
+                ('ph_level_min', models.FloatField(blank=True, null=True)),
+                ('ph_level_max', models.FloatField(blank=True, null=True)),
+                ('rollup_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('farm_plot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farm.farmplot')),
+            ],
+            options={
+                'verbose_name': 'Hourly Sensor Rollup',
+                'verbose_name_plural': 'Hourly Sensor Rollups',
+                'db_table': 'SENSOR_ROLLUP_HOURLY',
+                'ordering': ['bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorDailyRollup',
+            fields=[
+                ('bucket', models.DateTimeField()),
+                ('readings', models.PositiveIntegerField(default=0)),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('temperature_sum', models.FloatField(blank=True, null=True)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('moisture_count', models.PositiveIntegerField(default=0)),
+                ('moisture_sum', models.FloatField(blank=True, null=True)),
+                ('moisture_min', models.FloatField(blank=True, null=True)),
+                ('moisture_max', models.FloatField(blank=True, null=True)),
+                ('humidity_count', models.PositiveIntegerField(default=0)),
+                ('humidity_sum', models.FloatField(blank=True, null=True)),
+                ('humidity_min', models.FloatField(blank=True, null=True)),
+                ('humidity_max', models.FloatField(blank=True, null=True)),
+                ('ph_level_count', models.PositiveIntegerField(default=0)),
+                ('ph_level_sum', models.FloatField(blank=True, null=True)),
+                ('ph_level_min', models.FloatField(blank=True, null=True)),
+                ('ph_level_max', models.FloatField(blank=True, null=True)),
+                ('rollup_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('farm_plot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farm.farmplot')),
+            ],
+            options={
+                'verbose_name': 'Daily Sensor Rollup',
+                'verbose_name_plural': 'Daily Sensor Rollups',
+                'db_table': 'SENSOR_ROLLUP_DAILY',
+                'ordering': ['bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sensorhourlyrollup',
+            constraint=models.UniqueConstraint(fields=('farm_plot', 'bucket'), name='unique_hourly_rollup_per_plot'),
+        ),
+        migrations.AddConstraint(
+            model_name='sensordailyrollup',
+            constraint=models.UniqueConstraint(fields=('farm_plot', 'bucket'), name='unique_daily_rollup_per_plot'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0005_sensor_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plantingrecord',
+            index=models.Index(fields=['farm_plot', 'status'], name='planting_plot_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plantingrecord',
+            index=models.Index(condition=models.Q(('status__in', ['planted', 'growing'])), fields=['farm_plot', 'crop'], name='planting_active_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('farm', '0006_planting_record_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmerSummary',
+            fields=[
+                ('farmer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('plot_count', models.IntegerField(default=0)),
+                ('active_crop_count', models.IntegerField(default=0)),
+                ('open_advisory_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Farmer Summary',
+                'verbose_name_plural': 'Farmer Summaries',
+                'db_table': 'FARMER_SUMMARY',
+            },
+        ),
+        migrations.CreateModel(
+            name='FarmerCrop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_plantings', models.IntegerField(default=0)),
+                ('crop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farm.crop')),
+                ('farmer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Farmer Crop',
+                'verbose_name_plural': 'Farmer Crops',
+                'db_table': 'FARMER_CROP',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='farmercrop',
+            constraint=models.UniqueConstraint(fields=('farmer', 'crop'), name='unique_farmer_crop'),
+        ),
+    ]
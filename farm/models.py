@@ -1,5 +1,9 @@
+import hashlib
+import secrets
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 Farmer = get_user_model()
 
@@ -82,19 +86,36 @@ class PlantingRecord(models.Model):
         verbose_name = 'Planting Record'
         verbose_name_plural = 'Planting Records'
         ordering = ['-planting_date']
+        indexes = [
+            models.Index(fields=['farm_plot', 'status'], name='planting_plot_status_idx'),
+            # Active plantings per plot (advisories, dashboard); skipped on
+            # backends without partial indexes.
+            models.Index(fields=['farm_plot', 'crop'], condition=models.Q(status__in=['planted', 'growing']),
+                         name='planting_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.crop.name} - {self.farm_plot.location} ({self.planting_date})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        record = super().from_db(db, field_names, values)
+        # The stored plot, crop and status, which the counters in farm.signals
+        # move away from on save without reading the row again.
+        if {'farm_plot_id', 'crop_id', 'status'} <= set(field_names):
+            record._stored_planting = (record.farm_plot_id, record.crop_id, record.status)
+        return record
 
 
 class SensorData(models.Model):
     data_id = models.AutoField(primary_key=True)
     farm_plot = models.ForeignKey(FarmPlot, on_delete=models.CASCADE, related_name='sensor_data')
+    device = models.ForeignKey('SensorDevice', on_delete=models.SET_NULL, null=True, blank=True, related_name='sensor_data')
     temperature = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     moisture = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     humidity = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     ph_level = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
-    recorded_at = models.DateTimeField(auto_now_add=True)
+    recorded_at = models.DateTimeField(default=timezone.now)
     notes = models.TextField(blank=True)
     
     class Meta:
@@ -102,7 +123,155 @@ class SensorData(models.Model):
         verbose_name = 'Sensor Data'
         verbose_name_plural = 'Sensor Data'
         ordering = ['-recorded_at']
+        constraints = [
+            models.UniqueConstraint(fields=['farm_plot', 'recorded_at'], name='unique_sensor_reading_per_plot_time'),
+        ]
     
     def __str__(self):
         return f"{self.farm_plot.location} - {self.recorded_at}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        reading = super().from_db(db, field_names, values)
+        # The stored plot and time, whose rollup buckets farm.signals
+        # refreshes when a save moves the reading.
+        if {'farm_plot_id', 'recorded_at'} <= set(field_names):
+            reading._stored_reading = (reading.farm_plot_id, reading.recorded_at)
+        return reading
+
+
+class SensorDevice(models.Model):
+    device_id = models.AutoField(primary_key=True)
+    farm_plot = models.ForeignKey(FarmPlot, on_delete=models.CASCADE, related_name='devices')
+    name = models.CharField(max_length=100)
+    token_hash = models.CharField(max_length=64, unique=True, editable=False)
+    token_prefix = models.CharField(max_length=8, editable=False)
+    temperature_offset = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    moisture_offset = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    humidity_offset = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    ph_offset = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    is_active = models.BooleanField(default=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'SENSOR_DEVICE'
+        verbose_name = 'Sensor Device'
+        verbose_name_plural = 'Sensor Devices'
+        ordering = ['name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.farm_plot.location})"
+    
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def issue_token(self):
+        """Generate a new API token, store its hash and return the raw token once."""
+        token = secrets.token_urlsafe(32)
+        self.token_hash = self.hash_token(token)
+        self.token_prefix = token[:8]
+        return token
+    
+    def revoke(self):
+        self.is_active = False
+        self.revoked_at = timezone.now()
+        self.save(update_fields=['is_active', 'revoked_at', 'updated_at'])
+
+
+class SensorRollup(models.Model):
+    """
+    Per-plot aggregate of the readings in one time bucket.
+
+    Each metric keeps its own count, sum, min and max because readings may
+    leave any metric empty; the average is ``sum / count``.
+    """
+    farm_plot = models.ForeignKey(FarmPlot, on_delete=models.CASCADE, related_name='+')
+    bucket = models.DateTimeField()
+    readings = models.PositiveIntegerField(default=0)
+    temperature_count = models.PositiveIntegerField(default=0)
+    temperature_sum = models.FloatField(null=True, blank=True)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+    moisture_count = models.PositiveIntegerField(default=0)
+    moisture_sum = models.FloatField(null=True, blank=True)
+    moisture_min = models.FloatField(null=True, blank=True)
+    moisture_max = models.FloatField(null=True, blank=True)
+    humidity_count = models.PositiveIntegerField(default=0)
+    humidity_sum = models.FloatField(null=True, blank=True)
+    humidity_min = models.FloatField(null=True, blank=True)
+    humidity_max = models.FloatField(null=True, blank=True)
+    ph_level_count = models.PositiveIntegerField(default=0)
+    ph_level_sum = models.FloatField(null=True, blank=True)
+    ph_level_min = models.FloatField(null=True, blank=True)
+    ph_level_max = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        abstract = True
+        ordering = ['bucket']
+    
+    def average(self, metric):
+        count = getattr(self, f'{metric}_count')
+        return getattr(self, f'{metric}_sum') / count if count else None
+
+
+class SensorHourlyRollup(SensorRollup):
+    rollup_id = models.BigAutoField(primary_key=True)
+    
+    class Meta(SensorRollup.Meta):
+        db_table = 'SENSOR_ROLLUP_HOURLY'
+        verbose_name = 'Hourly Sensor Rollup'
+        verbose_name_plural = 'Hourly Sensor Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['farm_plot', 'bucket'], name='unique_hourly_rollup_per_plot'),
+        ]
+
+
+class SensorDailyRollup(SensorRollup):
+    rollup_id = models.BigAutoField(primary_key=True)
+    
+    class Meta(SensorRollup.Meta):
+        db_table = 'SENSOR_ROLLUP_DAILY'
+        verbose_name = 'Daily Sensor Rollup'
+        verbose_name_plural = 'Daily Sensor Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['farm_plot', 'bucket'], name='unique_daily_rollup_per_plot'),
+        ]
+
 
+class FarmerSummary(models.Model):
+    """
+    Dashboard counters of one farmer, maintained by ``farm.summary``.
+
+    The counters are plain integers so a drifted row never blocks a write;
+    ``repair_farmer_summaries`` puts them right.
+    """
+    farmer = models.OneToOneField(Farmer, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    plot_count = models.IntegerField(default=0)
+    active_crop_count = models.IntegerField(default=0)
+    open_advisory_count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'FARMER_SUMMARY'
+        verbose_name = 'Farmer Summary'
+        verbose_name_plural = 'Farmer Summaries'
+    
+    def __str__(self):
+        return f"{self.farmer_id}: {self.plot_count} plots, {self.active_crop_count} crops"
+
+
+class FarmerCrop(models.Model):
+    """Number of planted/growing records a farmer has of one crop; backs ``FarmerSummary.active_crop_count``."""
+    farmer = models.ForeignKey(Farmer, on_delete=models.CASCADE, related_name='+')
+    crop = models.ForeignKey(Crop, on_delete=models.CASCADE, related_name='+')
+    active_plantings = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'FARMER_CROP'
+        verbose_name = 'Farmer Crop'
+        verbose_name_plural = 'Farmer Crops'
+        constraints = [
+            models.UniqueConstraint(fields=['farmer', 'crop'], name='unique_farmer_crop'),
+        ]
@@ -0,0 +1,252 @@
+"""
+Hourly and daily sensor rollups.
+
+SENSOR_ROLLUP_HOURLY and SENSOR_ROLLUP_DAILY keep a count, sum, min and
+max per metric for each plot and bucket. ``refresh_rollups`` runs with
+every batch written by ``write_readings`` (and from the SensorData signals
+for single saves and deletes). It recomputes only the buckets the batch
+touched: hourly rows come from the raw readings in those hours, in
+SENSOR_DATA and in the archive files of readings moved out by
+``archive_sensor_data`` (see ``farm.archive``), and daily rows from the
+hourly rows. Upserted duplicates and late readings stay exact, archived
+history keeps its rollups when they are recomputed, and the cost follows
+the batch rather than the plot's history. Buckets follow the project
+TIME_ZONE whatever zone is active.
+
+``rollup_series`` reads the table that fits a time range, so a chart over
+a year reads about as many rows as one over a day.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.db import connection
+from django.db.models import Count, FloatField, Max, Min, Q, Sum
+from django.db.models.functions import Cast, TruncDay, TruncHour
+from django.utils import timezone
+
+from .archive import archived_until, read_range, to_micros
+from .models import SensorDailyRollup, SensorData, SensorHourlyRollup
+
+METRICS = ('temperature', 'moisture', 'humidity', 'ph_level')
+ROLLUP_FIELDS = ['readings', *(f'{metric}_{part}' for metric in METRICS for part in ('count', 'sum', 'min', 'max'))]
+# Ranges per aggregate query; keeps the OR'd filter well inside SQLite's
+# expression depth limit.
+MAX_RANGES_PER_QUERY = 200
+# Ranges up to this long are served from hourly rows, longer ones from daily rows.
+HOURLY_SPAN = timedelta(days=31)
+# Every time zone offset is a multiple of a quarter hour, so each quarter
+# hour of archived readings lies in a single local hour.
+QUARTER_HOUR = 900
+
+
+def _hour(moment):
+    return timezone.localtime(moment, timezone.get_default_timezone()).replace(minute=0, second=0, microsecond=0)
+
+
+def _next_hour(bucket):
+    return _hour(bucket + timedelta(hours=1))
+
+
+def _day(moment):
+    local = timezone.localtime(moment, timezone.get_default_timezone())
+    return timezone.make_aware(datetime.combine(local.date(), time.min), timezone.get_default_timezone())
+
+
+def _next_day(bucket):
+    return _day(bucket + timedelta(days=1, hours=12))
+
+
+def _runs(plot_moments, floor, advance):
+    """Group each plot's touched buckets into contiguous ``(plot_id, start, end)`` ranges."""
+    ranges = []
+    for plot_id, moments in plot_moments.items():
+        run = None
+        for bucket in sorted({floor(moment) for moment in moments}):
+            if run is not None and run[2] >= bucket:
+                run[2] = advance(bucket)
+                continue
+            run = [plot_id, bucket, advance(bucket)]
+            ranges.append(run)
+    return [tuple(run) for run in ranges]
+
+
+def _filter(ranges, field):
+    condition = Q()
+    for plot_id, start, end in ranges:
+        condition |= Q(farm_plot_id=plot_id, **{f'{field}__gte': start, f'{field}__lt': end})
+    return condition
+
+
+def _aggregate_readings(ranges):
+    tz = timezone.get_default_timezone()
+    aggregates = {'readings': Count('data_id')}
+    for metric in METRICS:
+        value = Cast(metric, FloatField())
+        aggregates.update({
+            f'{metric}_count': Count(metric),
+            f'{metric}_sum': Sum(value),
+            f'{metric}_min': Min(value),
+            f'{metric}_max': Max(value),
+        })
+    rows = {
+        (row['farm_plot_id'], row['period']): row
+        for row in SensorData.objects.filter(_filter(ranges, 'recorded_at'))
+        .annotate(period=TruncHour('recorded_at', tzinfo=tz))
+        .values('farm_plot_id', 'period')
+        .annotate(**aggregates)
+        .order_by()
+    }
+    # A late reading can land in an hour that is already partly archived.
+    for row in _aggregate_archive(ranges):
+        key = (row['farm_plot_id'], row['period'])
+        rows[key] = _merge(rows[key], row) if key in rows else row
+    return rows.values()
+
+
+def _aggregate_archive(ranges):
+    """Aggregate the archived readings in ``ranges`` per plot and hour, like ``_aggregate_readings``."""
+    rows = []
+    for plot_id, start, end in ranges:
+        # Live writes are nearly always newer than the archive; leave its files alone then.
+        until = archived_until(plot_id)
+        if until is None or to_micros(start) > until:
+            continue
+        times, columns = read_range(plot_id, start, end)
+        if not len(times):
+            continue
+        # A late reading stored at an archived timestamp replaces the archived one.
+        live = SensorData.objects.filter(farm_plot_id=plot_id, recorded_at__gte=start, recorded_at__lt=end)
+        live = np.array([to_micros(moment) for moment in live.values_list('recorded_at', flat=True)], dtype=np.int64)
+        if len(live):
+            keep = ~np.isin(np.round(times * 1_000_000).astype(np.int64), live)
+            times, columns = times[keep], {metric: values[keep] for metric, values in columns.items()}
+            if not len(times):
+                continue
+        quarters, inverse = np.unique((times // QUARTER_HOUR).astype(np.int64), return_inverse=True)
+        periods = [
+            _hour(datetime.fromtimestamp(quarter * QUARTER_HOUR, dt_timezone.utc)) for quarter in quarters.tolist()
+        ]
+        # Archived times are sorted, so each hour is one contiguous slice.
+        hours = np.cumsum([False] + [later != earlier for earlier, later in zip(periods, periods[1:])])[inverse]
+        starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+        aggregates = {'readings': np.diff(np.r_[starts, len(times)]).tolist()}
+        for metric in METRICS:
+            values = columns[metric]
+            present = ~np.isnan(values)
+            counts = np.add.reduceat(present.astype(np.int64), starts)
+            aggregates[f'{metric}_count'] = counts.tolist()
+            for part, values_per_hour in (
+                ('sum', np.add.reduceat(np.where(present, values, 0.0), starts)),
+                ('min', np.fmin.reduceat(values, starts)),
+                ('max', np.fmax.reduceat(values, starts)),
+            ):
+                aggregates[f'{metric}_{part}'] = [
+                    value if count else None for value, count in zip(values_per_hour.tolist(), counts.tolist())
+                ]
+        for position, first in enumerate(starts.tolist()):
+            row = {'farm_plot_id': plot_id, 'period': periods[inverse[first]]}
+            row.update((name, column[position]) for name, column in aggregates.items())
+            rows.append(row)
+    return rows
+
+
+def _merge(row, other):
+    merged = dict(row, readings=row['readings'] + other['readings'])
+    for metric in METRICS:
+        merged[f'{metric}_count'] = row[f'{metric}_count'] + other[f'{metric}_count']
+        for part, combine in (('sum', lambda a, b: a + b), ('min', min), ('max', max)):
+            values = [value for value in (row[f'{metric}_{part}'], other[f'{metric}_{part}']) if value is not None]
+            merged[f'{metric}_{part}'] = combine(*values) if len(values) == 2 else (values[0] if values else None)
+    return merged
+
+
+def _aggregate_hours(ranges):
+    tz = timezone.get_default_timezone()
+    aggregates = {'readings': Sum('readings')}
+    for metric in METRICS:
+        aggregates.update({
+            f'{metric}_count': Sum(f'{metric}_count'),
+            f'{metric}_sum': Sum(f'{metric}_sum'),
+            f'{metric}_min': Min(f'{metric}_min'),
+            f'{metric}_max': Max(f'{metric}_max'),
+        })
+    return (
+        SensorHourlyRollup.objects.filter(_filter(ranges, 'bucket'))
+        .annotate(period=TruncDay('bucket', tzinfo=tz))
+        .values('farm_plot_id', 'period')
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def _refresh(model, ranges, aggregate):
+    for offset in range(0, len(ranges), MAX_RANGES_PER_QUERY):
+        chunk = ranges[offset:offset + MAX_RANGES_PER_QUERY]
+        fresh = {}
+        for row in aggregate(chunk):
+            plot_id, period = row.pop('farm_plot_id'), row.pop('period')
+            fresh[(plot_id, period)] = model(farm_plot_id=plot_id, bucket=period, **row)
+        existing = dict(
+            ((plot_id, bucket), pk)
+            for pk, plot_id, bucket in model.objects.filter(_filter(chunk, 'bucket')).values_list(
+                'pk', 'farm_plot_id', 'bucket')
+        )
+        stale = [pk for key, pk in existing.items() if key not in fresh]
+        if stale:
+            model.objects.filter(pk__in=stale).delete()
+        _save(model, list(fresh.values()), existing)
+
+
+def _save(model, rows, existing):
+    features = connection.features
+    if features.supports_update_conflicts:
+        options = {'update_conflicts': True, 'update_fields': ROLLUP_FIELDS}
+        if features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['farm_plot', 'bucket']
+        model.objects.bulk_create(rows, batch_size=500, **options)
+        return
+    created = []
+    updated = []
+    for row in rows:
+        row.pk = existing.get((row.farm_plot_id, row.bucket))
+        (created if row.pk is None else updated).append(row)
+    model.objects.bulk_update(updated, ROLLUP_FIELDS, batch_size=500)
+    model.objects.bulk_create(created, batch_size=500, ignore_conflicts=True)
+
+
+def refresh_ranges(ranges):
+    """
+    Recompute both rollups for ``(plot_id, start, end)`` ranges.
+
+    ``start`` and ``end`` should fall on day boundaries in TIME_ZONE so the
+    daily rows cover whole days.
+    """
+    _refresh(SensorHourlyRollup, ranges, _aggregate_readings)
+    _refresh(SensorDailyRollup, ranges, _aggregate_hours)
+
+
+def refresh_rollups(readings):
+    """Recompute the hourly and daily buckets touched by ``readings``."""
+    plot_moments = {}
+    for reading in readings:
+        if reading.recorded_at is not None:
+            plot_moments.setdefault(reading.farm_plot_id, []).append(reading.recorded_at)
+    if not plot_moments:
+        return
+    _refresh(SensorHourlyRollup, _runs(plot_moments, _hour, _next_hour), _aggregate_readings)
+    _refresh(SensorDailyRollup, _runs(plot_moments, _day, _next_day), _aggregate_hours)
+
+
+def rollup_series(plot_id, start, end):
+    """
+    Return ``(resolution, rows)`` for a plot between ``start`` and ``end``.
+
+    ``resolution`` is ``'hour'`` or ``'day'``; ``rows`` are rollup
+    instances in time order.
+    """
+    if end - start <= HOURLY_SPAN:
+        model, resolution, start = SensorHourlyRollup, 'hour', _hour(start)
+    else:
+        model, resolution, start = SensorDailyRollup, 'day', _day(start)
+    rows = model.objects.filter(farm_plot_id=plot_id, bucket__gte=start, bucket__lt=end).order_by('bucket')
+    return resolution, list(rows)
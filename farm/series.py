@@ -0,0 +1,143 @@
+"""
+Downsampled sensor series for charts.
+
+``load_series`` returns at most about ``points`` points per metric for any
+time range. Ranges with up to ``SENSOR_SERIES_MAX_RAW`` readings are read
+as flat float columns from SENSOR_DATA and, for archived history, from the
+memory-mapped archive (see ``farm.archive``); busier ranges fall back to the
+hourly or daily rollup averages (see ``farm.rollups``), so memory stays
+bounded too. Each metric is reduced with Largest-Triangle-Three-Buckets,
+which keeps the peaks and troughs that striding or plain averaging drop.
+Missing values split a metric into runs that are downsampled separately
+and joined by a null point, so charts show a gap instead of a fall to zero.
+"""
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .archive import count_range, read_range
+from .models import SensorData
+from .rollups import rollup_series
+
+
+def max_raw_readings():
+    return getattr(settings, 'SENSOR_SERIES_MAX_RAW', 50000)
+
+
+def lttb(x, y, threshold):
+    """Return the indices Largest-Triangle-Three-Buckets keeps to reduce ``(x, y)`` to ``threshold`` points."""
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:max(threshold, 1)]
+
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last points are always kept.
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_stop = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_stop = n - 1, n
+        next_x = x[next_start:next_stop].mean()
+        next_y = y[next_start:next_stop].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - next_x) * (y[start:stop] - py) - (px - x[start:stop]) * (next_y - py))
+        previous = start + int(areas.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample(times, values, points):
+    """
+    Reduce one metric to about ``points`` ``[time, value]`` pairs.
+
+    ``values`` uses NaN for missing readings. Each run of present values is
+    reduced on its own, with a share of ``points`` proportional to its
+    length, and runs are separated by ``[time, None]`` at the first missing
+    reading. When there are very many short gaps, only those longer than
+    two output intervals are kept so the payload stays bounded.
+    """
+    present = ~np.isnan(values)
+    if not present.any():
+        return []
+    positions = np.flatnonzero(present)
+    # A break sits between consecutive present values with a missing one in between.
+    breaks = np.flatnonzero(np.diff(positions) > 1)
+    if len(breaks) > points // 2:
+        span = times[positions[-1]] - times[positions[0]]
+        gaps = times[positions[breaks + 1]] - times[positions[breaks]]
+        breaks = breaks[gaps >= 2 * span / points]
+
+    output = []
+    budget = max(points - len(breaks), 3)
+    runs = np.split(positions, breaks + 1)
+    for number, run in enumerate(runs):
+        if number:
+            output.append([_millis(times[runs[number - 1][-1] + 1]), None])
+        share = max(min(len(run), 2), int(budget * len(run) / len(positions)))
+        run_times, run_values = times[run], values[run]
+        for index in lttb(run_times, run_values, share):
+            output.append([_millis(run_times[index]), round(float(run_values[index]), 2)])
+    return output
+
+
+def _millis(seconds):
+    return int(round(float(seconds) * 1000))
+
+
+def _raw_columns(readings, metrics):
+    rows = list(
+        readings.order_by('recorded_at')
+        .annotate(**{f'{metric}_value': Cast(metric, FloatField()) for metric in metrics})
+        .values_list('recorded_at', *(f'{metric}_value' for metric in metrics))
+    )
+    times = np.array([row[0].timestamp() for row in rows], dtype=float)
+    columns = {
+        metric: np.array([row[position] for row in rows], dtype=float)
+        for position, metric in enumerate(metrics, start=1)
+    }
+    return times, columns
+
+
+def _rollup_columns(rows, metrics):
+    times = np.array([row.bucket.timestamp() for row in rows], dtype=float)
+    columns = {metric: np.array([row.average(metric) for row in rows], dtype=float) for metric in metrics}
+    return times, columns
+
+
+def load_series(plot_id, start, end, points, metrics):
+    """
+    Return the downsampled series of a plot between ``start`` and ``end``.
+
+    The result is a dict with the ``source`` used (``'raw'``, ``'hour'`` or
+    ``'day'``), the number of ``readings`` it covers and one list of
+    ``[epoch_millis, value]`` pairs per metric under ``series``.
+    """
+    readings = SensorData.objects.filter(farm_plot_id=plot_id, recorded_at__gte=start, recorded_at__lt=end)
+    total = readings.count() + count_range(plot_id, start, end)
+    if total <= max_raw_readings():
+        source = 'raw'
+        times, columns = _raw_columns(readings, metrics)
+        archived_times, archived_columns = read_range(plot_id, start, end, metrics)
+        if len(archived_times):
+            times = np.concatenate([archived_times, times])
+            order = np.argsort(times, kind='stable')
+            times = times[order]
+            columns = {
+                metric: np.concatenate([archived_columns[metric], columns[metric]])[order] for metric in metrics
+            }
+    else:
+        source, rows = rollup_series(plot_id, start, end)
+        times, columns = _rollup_columns(rows, metrics)
+    return {
+        'source': source,
+        'readings': total,
+        'series': {metric: downsample(times, columns[metric], points) for metric in metrics},
+    }
@@ -0,0 +1,200 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from advisory.models import AdvisoryLog
+
+from .dashboard import (
+    invalidate_crop_prices, invalidate_farmer, invalidate_plot_plantings, invalidate_plot_readings,
+)
+from .device_auth import invalidate_device
+from .models import Crop, FarmerCrop, FarmPlot, PlantingRecord, SensorData, SensorDevice
+from .rollups import refresh_rollups
+from .summary import (
+    ACTIVE_STATUSES, add_active_planting, add_open_advisories, add_plots, rebuild_summaries, remove_active_crop,
+)
+
+Farmer = get_user_model()
+
+
+@receiver(post_save, sender=SensorDevice)
+@receiver(post_delete, sender=SensorDevice)
+def sensor_device_changed(sender, instance, **kwargs):
+    invalidate_device(instance.pk)
+
+
+@receiver(pre_save, sender=FarmPlot)
+def farm_plot_moving(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_farmer_id = (
+            FarmPlot.objects.filter(pk=instance.pk).values_list('farmer_id', flat=True).first()
+        )
+
+
+# Every plot-based dashboard panel is stored under the farmer's plot
+# version, so this also covers readings and advisories removed by a
+# cascading plot delete.
+@receiver(post_save, sender=FarmPlot)
+@receiver(post_delete, sender=FarmPlot)
+def farm_plot_changed(sender, instance, **kwargs):
+    invalidate_farmer(instance.farmer_id)
+    invalidate_farmer(getattr(instance, '_previous_farmer_id', None))
+
+
+@receiver(post_save, sender=FarmPlot)
+def farm_plot_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_farmer_id', None)
+    if created:
+        add_plots(instance.farmer_id, 1)
+    elif previous is not None and previous != instance.farmer_id:
+        # The plot took its plantings and advisories along; recount both.
+        rebuild_summaries([previous, instance.farmer_id])
+
+
+def _open_advisories(**filters):
+    return dict(
+        AdvisoryLog.objects.filter(executed=False, **filters).values('farmer_id').annotate(total=Count('pk'))
+        .values_list('farmer_id', 'total')
+    )
+
+
+# Advisories and FarmerCrop rows go in fast cascades without signals, so
+# count what the counters lose before the delete and subtract it after.
+# Cascaded planting records do send signals, but leave their counters to
+# the plot (see planting_record_changed), which subtracts them per crop.
+@receiver(pre_delete, sender=FarmPlot)
+def farm_plot_deleting(sender, instance, **kwargs):
+    instance._open_advisories = _open_advisories(farm_plot=instance)
+    instance._active_plantings = dict(
+        PlantingRecord.objects.filter(farm_plot=instance, status__in=ACTIVE_STATUSES).values('crop_id')
+        .annotate(total=Count('pk')).values_list('crop_id', 'total')
+    )
+
+
+@receiver(post_delete, sender=FarmPlot)
+def farm_plot_deleted(sender, instance, **kwargs):
+    add_plots(instance.farmer_id, -1)
+    add_open_advisories({farmer_id: -total for farmer_id, total in instance._open_advisories.items()})
+    for crop_id, total in instance._active_plantings.items():
+        add_active_planting(instance.farmer_id, crop_id, -total)
+
+
+@receiver(pre_delete, sender=Crop)
+def crop_deleting(sender, instance, **kwargs):
+    instance._open_advisories = _open_advisories(crop=instance)
+    instance._grown_by = list(
+        FarmerCrop.objects.filter(crop=instance, active_plantings__gt=0).values_list('farmer_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Crop)
+def crop_deleted(sender, instance, **kwargs):
+    add_open_advisories({farmer_id: -total for farmer_id, total in instance._open_advisories.items()})
+    remove_active_crop(instance._grown_by)
+
+
+@receiver(post_save, sender=Crop)
+def crop_saved(sender, instance, **kwargs):
+    # The price panel shows the crop name.
+    invalidate_crop_prices(instance.pk)
+
+
+@receiver(pre_save, sender=PlantingRecord)
+def planting_record_moving(sender, instance, **kwargs):
+    # Remember the old plot, crop and status so a record that moves or
+    # leaves the active statuses updates both sides. Records loaded from
+    # the database carry them (see PlantingRecord.from_db); only one built
+    # by hand with a pk is read back.
+    instance._previous_planting = getattr(instance, '_stored_planting', None)
+    if instance._previous_planting is None and instance.pk is not None:
+        instance._previous_planting = (
+            PlantingRecord.objects.filter(pk=instance.pk).values_list('farm_plot_id', 'crop_id', 'status').first()
+        )
+    instance._previous_plot_id = instance._previous_planting and instance._previous_planting[0]
+
+
+def _deleted_with(origin, *models):
+    """Whether a delete started from an instance or queryset of one of ``models``."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+def _active_crop(record, plot_id, crop_id, status):
+    """Return ``(farmer_id, crop_id)`` for a planted/growing record, else None."""
+    if status not in ACTIVE_STATUSES:
+        return None
+    # Forms and the admin assign the plot object, so its farmer is usually at hand.
+    if PlantingRecord.farm_plot.is_cached(record) and record.farm_plot.pk == plot_id:
+        return record.farm_plot.farmer_id, crop_id
+    return FarmPlot.objects.filter(pk=plot_id).values_list('farmer_id', flat=True).first(), crop_id
+
+
+@receiver(post_save, sender=PlantingRecord)
+@receiver(post_delete, sender=PlantingRecord)
+def planting_record_changed(sender, instance, **kwargs):
+    invalidate_plot_plantings(instance.farm_plot_id, getattr(instance, '_previous_plot_id', None))
+
+    if kwargs.get('signal') is post_delete:
+        # A plot delete subtracts its records per crop, a crop delete drops
+        # the crop's counters and a farmer delete the whole summary.
+        if _deleted_with(kwargs.get('origin'), FarmPlot, Crop, Farmer):
+            return
+        before, after = _active_crop(instance, instance.farm_plot_id, instance.crop_id, instance.status), None
+    else:
+        previous = getattr(instance, '_previous_planting', None)
+        before = previous and _active_crop(instance, *previous)
+        after = _active_crop(instance, instance.farm_plot_id, instance.crop_id, instance.status)
+        instance._stored_planting = (instance.farm_plot_id, instance.crop_id, instance.status)
+    if before != after:
+        if before and before[0] is not None:
+            add_active_planting(*before, -1)
+        if after and after[0] is not None:
+            add_active_planting(*after, 1)
+
+
+# Bulk writes refresh rollups in write_readings(); these cover single saves
+# from forms and the admin, and deletes through the admin or QuerySet.delete().
+@receiver(pre_save, sender=SensorData)
+def sensor_data_moving(sender, instance, **kwargs):
+    # Readings loaded from the database carry their stored plot and time
+    # (see SensorData.from_db); only one built by hand with a pk is read back.
+    instance._previous_reading = getattr(instance, '_stored_reading', None)
+    if instance._previous_reading is None and instance.pk is not None:
+        instance._previous_reading = (
+            SensorData.objects.filter(pk=instance.pk).values_list('farm_plot_id', 'recorded_at').first()
+        )
+
+
+@receiver(post_save, sender=SensorData)
+def sensor_data_changed(sender, instance, **kwargs):
+    readings = [instance]
+    previous = getattr(instance, '_previous_reading', None)
+    if previous is not None and previous != (instance.farm_plot_id, instance.recorded_at):
+        readings.append(SensorData(farm_plot_id=previous[0], recorded_at=previous[1]))
+    refresh_rollups(readings)
+    invalidate_plot_readings(instance.farm_plot_id, previous and previous[0])
+    instance._stored_reading = (instance.farm_plot_id, instance.recorded_at)
+
+
+@receiver(pre_delete, sender=SensorData)
+def sensor_data_deleting(sender, instance, **kwargs):
+    # A plot or farmer delete takes the plot's rollups with it.
+    origin = kwargs.get('origin')
+    if _deleted_with(origin, FarmPlot, Farmer):
+        return
+    if not hasattr(origin, '_deleted_readings'):
+        origin._deleted_readings = []
+    origin._deleted_readings.append(instance)
+
+
+@receiver(post_delete, sender=SensorData)
+def sensor_data_deleted(sender, instance, **kwargs):
+    # Every pre_delete runs before the rows go, so the first post_delete of
+    # a delete refreshes all of its buckets at once.
+    origin = kwargs.get('origin')
+    readings = getattr(origin, '_deleted_readings', None)
+    if readings:
+        origin._deleted_readings = []
+        refresh_rollups(readings)
+        invalidate_plot_readings(*(reading.farm_plot_id for reading in readings))
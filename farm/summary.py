@@ -0,0 +1,154 @@
+"""
+Per-farmer dashboard counters.
+
+FarmerSummary holds a farmer's plot count, the number of distinct crops
+with a planted/growing record and the number of unexecuted advisories, so
+reading them is one primary-key lookup (``summary_for``). FarmerCrop counts
+active plantings per farmer and crop; the crop counter only moves when one
+of those goes from zero to non-zero or back.
+
+Writers apply ``F()`` increments inside their own transaction: the signals
+in ``farm.signals`` and ``advisory.signals`` for single saves and deletes,
+and the bulk advisory writers for ``bulk_create``. Farmers without a
+summary row are skipped; ``summary_for`` counts theirs from scratch on
+first read. ``repair_farmer_summaries`` recomputes rows in bulk and reports
+drift left by writes that bypass all of this (``QuerySet.update()``, raw
+SQL).
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+from advisory.models import AdvisoryLog
+
+from .models import FarmerCrop, FarmerSummary, FarmPlot, PlantingRecord
+
+ACTIVE_STATUSES = ('planted', 'growing')
+COUNTERS = ('plot_count', 'active_crop_count', 'open_advisory_count')
+
+
+def add_plots(farmer_id, delta):
+    FarmerSummary.objects.filter(pk=farmer_id).update(plot_count=F('plot_count') + delta)
+
+
+def add_open_advisories(deltas):
+    """Apply ``{farmer_id: delta}`` to the unexecuted advisory counters."""
+    for farmer_id, delta in deltas.items():
+        if delta:
+            FarmerSummary.objects.filter(pk=farmer_id).update(open_advisory_count=F('open_advisory_count') + delta)
+
+
+@transaction.atomic
+def add_active_planting(farmer_id, crop_id, delta):
+    """Count ``delta`` more (or fewer) active plantings of a crop for a farmer."""
+    # Locking the summary row serialises a farmer's changes, so the count
+    # read back below is the one this increment produced.
+    if not FarmerSummary.objects.select_for_update().filter(pk=farmer_id).exists():
+        return
+    rows = FarmerCrop.objects.filter(farmer_id=farmer_id, crop_id=crop_id)
+    if not rows.update(active_plantings=F('active_plantings') + delta):
+        if delta < 0:
+            # Already gone, e.g. in the fast cascade of a crop delete.
+            return
+        FarmerCrop.objects.create(farmer_id=farmer_id, crop_id=crop_id, active_plantings=delta)
+    after = rows.values_list('active_plantings', flat=True).get()
+    before = after - delta
+    if (before > 0) != (after > 0):
+        FarmerSummary.objects.filter(pk=farmer_id).update(
+            active_crop_count=F('active_crop_count') + (1 if after > 0 else -1)
+        )
+
+
+def remove_active_crop(farmer_ids):
+    """Drop one active crop from each farmer, for a crop that is being deleted."""
+    FarmerSummary.objects.filter(pk__in=farmer_ids).update(active_crop_count=F('active_crop_count') - 1)
+
+
+def count_summaries(farmer_ids):
+    """
+    Count the summaries of ``farmer_ids`` from scratch.
+
+    Returns ``(counters, crops)``: ``{farmer_id: {counter: value}}`` and
+    ``{(farmer_id, crop_id): active plantings}``, with three grouped queries.
+    """
+    counters = {farmer_id: dict.fromkeys(COUNTERS, 0) for farmer_id in farmer_ids}
+    plots = FarmPlot.objects.filter(farmer_id__in=farmer_ids).values('farmer_id').annotate(total=Count('pk'))
+    for row in plots:
+        counters[row['farmer_id']]['plot_count'] = row['total']
+    advisories = AdvisoryLog.objects.filter(farmer_id__in=farmer_ids, executed=False).values('farmer_id').annotate(
+        total=Count('pk')
+    )
+    for row in advisories:
+        counters[row['farmer_id']]['open_advisory_count'] = row['total']
+    plantings = PlantingRecord.objects.filter(
+        farm_plot__farmer_id__in=farmer_ids, status__in=ACTIVE_STATUSES
+    ).values_list('farm_plot__farmer_id', 'crop_id').annotate(total=Count('pk'))
+    crops = {(farmer_id, crop_id): total for farmer_id, crop_id, total in plantings}
+    for farmer_id, _ in crops:
+        counters[farmer_id]['active_crop_count'] += 1
+    return counters, crops
+
+
+@transaction.atomic
+def rebuild_summaries(farmer_ids, save=True):
+    """
+    Recount and, with ``save``, store the summaries of ``farmer_ids``.
+
+    Returns ``{farmer_id: {counter: (stored, counted)}}`` for existing rows
+    whose counters had drifted. FarmerCrop rows are rewritten as well.
+    Concurrent first reads may both create a row; the second insert is
+    ignored.
+    """
+    farmer_ids = list(farmer_ids)
+    stored = {summary.pk: summary for summary in FarmerSummary.objects.select_for_update().filter(pk__in=farmer_ids)}
+    counters, crops = count_summaries(farmer_ids)
+    drift = {}
+    for farmer_id, counted in counters.items():
+        summary = stored.get(farmer_id)
+        if summary is None:
+            continue
+        changed = {
+            name: (getattr(summary, name), value) for name, value in counted.items() if getattr(summary, name) != value
+        }
+        if changed:
+            drift[farmer_id] = changed
+    if not save:
+        return drift
+
+    for farmer_id, summary in stored.items():
+        for name, value in counters[farmer_id].items():
+            setattr(summary, name, value)
+    FarmerSummary.objects.bulk_update(stored.values(), COUNTERS, batch_size=500)
+    FarmerSummary.objects.bulk_create([
+        FarmerSummary(farmer_id=farmer_id, **counted) for farmer_id, counted in counters.items() if farmer_id not in stored
+    ], batch_size=500, ignore_conflicts=True)
+    _write_crops(farmer_ids, crops)
+    return drift
+
+
+def _write_crops(farmer_ids, crops):
+    FarmerCrop.objects.filter(farmer_id__in=farmer_ids).delete()
+    FarmerCrop.objects.bulk_create([
+        FarmerCrop(farmer_id=farmer_id, crop_id=crop_id, active_plantings=total)
+        for (farmer_id, crop_id), total in crops.items()
+    ], batch_size=500, ignore_conflicts=True)
+
+
+def summary_for(farmer_id):
+    """Return a farmer's FarmerSummary, counting it first if it does not exist yet."""
+    try:
+        return FarmerSummary.objects.get(pk=farmer_id)
+    except FarmerSummary.DoesNotExist:
+        return _create_summary(farmer_id)
+
+
+@transaction.atomic
+def _create_summary(farmer_id):
+    # The row is known to be missing, so unlike rebuild_summaries there is
+    # nothing to lock or read back: the counted values are what was stored.
+    # A concurrent first read inserts the same counts; the later insert is
+    # ignored.
+    counters, crops = count_summaries([farmer_id])
+    summary = FarmerSummary(farmer_id=farmer_id, **counters[farmer_id])
+    FarmerSummary.objects.bulk_create([summary], ignore_conflicts=True)
+    _write_crops([farmer_id], crops)
+    return summary
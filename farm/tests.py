@@ -0,0 +1,674 @@
+import asyncio
+import csv
+import os
+import tempfile
+import zipfile
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+import numpy as np
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from advisory.models import AdvisoryLog
+from advisory.views import generate_advisories_bulk
+from market.models import MarketPrice
+from sass.pagination import KeysetPaginator
+from sass.querybudget import QueryBudgetExceeded, assert_query_budget
+from sass.queryplans import FullScanFound, assert_no_full_scans
+
+from .coalescer import WriteCoalescer
+from .dashboard import dashboard_panels
+from .device_auth import VERSION_KEY, bump_devices_version, clear_cache, resolve_token
+from .ingest import ingest_readings
+from .management.commands.ingest_server import LineIngestor, open_listeners
+from .models import Crop, FarmPlot, PlantingRecord, SensorData, SensorDailyRollup, SensorDevice, SensorHourlyRollup
+from .rollups import refresh_rollups
+from .series import downsample, load_series, lttb
+from .summary import rebuild_summaries, summary_for
+
+Farmer = get_user_model()
+
+
+def reading(plot_id, minute, device_id=None, moisture='70.00'):
+    return SensorData(
+        farm_plot_id=plot_id, device_id=device_id, moisture=Decimal(moisture),
+        recorded_at=datetime(2025, 1, 1, 0, minute, tzinfo=dt_timezone.utc),
+    )
+
+
+class WriteCoalescerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dead_letter = os.path.join(directory.name, 'dead.csv')
+        self.written = []
+        self.calls = 0
+
+    def run_batch(self, readings, writer):
+        async def main():
+            coalescer = WriteCoalescer(max_rows=100, interval_ms=10, writer=writer)
+            coalescer.start()
+            coalescer.submit(readings, {reading.farm_plot_id: 1 for reading in readings})
+            await coalescer.close()
+            return coalescer.stats()
+
+        with override_settings(SENSOR_DEAD_LETTER_PATH=self.dead_letter, SENSOR_COALESCE_BACKOFF_MS=1), \
+                self.assertLogs('farm.coalescer', 'WARNING'):
+            return asyncio.run(main())
+
+    def test_transient_failure_is_retried(self):
+        def writer(readings, plot_farmers):
+            self.calls += 1
+            if self.calls < 3:
+                raise ConnectionError('database went away')
+            self.written.extend(readings)
+
+        stats = self.run_batch([reading(1, 0), reading(2, 1)], writer)
+        self.assertEqual(len(self.written), 2)
+        self.assertEqual(stats['retried_flushes'], 2)
+        self.assertEqual(stats['failed_rows'], 0)
+        self.assertFalse(os.path.exists(self.dead_letter))
+
+    def test_bad_row_does_not_sink_the_batch(self):
+        def writer(readings, plot_farmers):
+            if any(reading.moisture < 0 for reading in readings):
+                raise ValueError('moisture out of range')
+            self.written.extend(readings)
+
+        bad = reading(2, 5, device_id=7, moisture='-1.00')
+        stats = self.run_batch([reading(1, 0, device_id=3), reading(2, 1, device_id=7), bad, reading(3, 2)], writer)
+        self.assertEqual(len(self.written), 3)
+        self.assertNotIn(bad, self.written)
+        self.assertEqual(stats['flushed_rows'], 3)
+        self.assertEqual(stats['dead_letter_rows'], 1)
+        with open(self.dead_letter, newline='') as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['plot'], '2')
+        self.assertEqual(rows[0]['moisture'], '-1.00')
+        self.assertIn('moisture out of range', rows[0]['error'])
+
+
+class IngestServerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        farmer = Farmer.objects.create_user('gateway-owner')
+        cls.plot = FarmPlot.objects.create(farmer=farmer, location='Jitra, Kedah', size_hectares=1, soil_type='loamy')
+
+    @asynccontextmanager
+    async def serving(self, max_line=4096, queue_size=None):
+        coalescer = WriteCoalescer(max_rows=100, interval_ms=10, queue_size=queue_size)
+        coalescer.start()
+        ingestor = LineIngestor(coalescer, max_line=max_line)
+        await ingestor.refresh()
+        servers, transport = await open_listeners(ingestor, '127.0.0.1', tcp_port=0, udp_port=0)
+        try:
+            yield ingestor, servers[0].sockets[0].getsockname()[1], transport.get_extra_info('sockname')[1]
+        finally:
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+            transport.close()
+            await coalescer.close()
+
+    async def wait_for(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        self.fail('Timed out waiting for the ingest server.')
+
+    async def test_tcp_and_udp_lines_are_stored(self):
+        plot = self.plot.pk
+        async with self.serving() as (ingestor, tcp_port, udp_port):
+            reader, writer = await asyncio.open_connection('127.0.0.1', tcp_port)
+            writer.write(f'p{plot},1718870400,27.4,64.10,81.0,6.35\n# comment\np{plot},1718870460,27.5,,,'.encode())
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+
+            udp, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=('127.0.0.1', udp_port),
+            )
+            udp.sendto(f'p{plot},1718870520,28.0,60.00,,\nnot a reading\n'.encode())
+            udp.close()
+            await self.wait_for(lambda: ingestor.received == 3 and ingestor.rejected == 1)
+
+        moistures = [reading.moisture async for reading in SensorData.objects.filter(
+            farm_plot_id=plot).order_by('recorded_at')]
+        self.assertEqual(moistures, [Decimal('64.10'), None, Decimal('60.00')])
+
+    async def test_chunk_larger_than_the_queue_is_split(self):
+        lines = [f'p{self.plot.pk},{1718870400 + minute * 60},27.0,60.00,,' for minute in range(12)]
+        async with self.serving(queue_size=5) as (ingestor, _, _):
+            await asyncio.wait_for(ingestor.submit(ingestor.parse_lines(lines)), 5)
+        self.assertEqual(ingestor.dropped, 0)
+        self.assertEqual(await SensorData.objects.filter(farm_plot=self.plot).acount(), 12)
+
+    async def test_device_change_triggers_a_reload(self):
+        async with self.serving() as (ingestor, _, _):
+            self.assertFalse(await ingestor.devices_changed())
+            await sync_to_async(cache.delete)(VERSION_KEY)
+            self.assertTrue(await ingestor.devices_changed())
+
+    async def test_overlong_line_closes_the_connection(self):
+        async with self.serving(max_line=64) as (ingestor, tcp_port, _):
+            reader, writer = await asyncio.open_connection('127.0.0.1', tcp_port)
+            writer.write(b'p1,' + b'9' * 100)
+            await writer.drain()
+            with self.assertLogs('farm.management.commands.ingest_server', 'WARNING'):
+                self.assertEqual(await asyncio.wait_for(reader.read(), 2), b'')
+            writer.close()
+        self.assertEqual(ingestor.oversized, 1)
+        self.assertEqual(ingestor.received, 0)
+
+
+class DeviceTokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        farmer = Farmer.objects.create_user('probe-owner')
+        plot = FarmPlot.objects.create(farmer=farmer, location='Sik, Kedah', size_hectares=1, soil_type='loamy')
+        cls.device = SensorDevice(farm_plot=plot, name='Probe 1', moisture_offset=Decimal('1.50'))
+        cls.token = cls.device.issue_token()
+        cls.device.save()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(clear_cache)
+
+    def post(self, *readings):
+        return self.client.post(
+            reverse('sensor_data_bulk'), {'readings': list(readings)}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token}',
+        )
+
+    def test_revoked_token_is_rejected(self):
+        response = self.post({'recorded_at': '2025-01-01T08:00:00Z', 'moisture': '60'})
+        self.assertEqual(response.status_code, 201)
+        reading = SensorData.objects.get()
+        self.assertEqual((reading.device_id, reading.moisture), (self.device.pk, Decimal('61.50')))
+
+        self.device.revoke()
+        response = self.post({'recorded_at': '2025-01-01T09:00:00Z', 'moisture': '60'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(SensorData.objects.count(), 1)
+
+    def test_revocation_by_another_process_is_seen_at_once(self):
+        self.assertIsNotNone(resolve_token(self.token))
+        # The other process's write, without this process's signals...
+        SensorDevice.objects.filter(pk=self.device.pk).update(is_active=False)
+        self.assertIsNotNone(resolve_token(self.token))
+        # ...and its version bump in the shared cache once it commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_devices_version()
+        self.assertIsNone(resolve_token(self.token))
+
+
+class IngestReadingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('padi-farmer')
+        cls.plot = FarmPlot.objects.create(
+            farmer=cls.farmer, location='Arau, Perlis', size_hectares=2, soil_type='clay'
+        )
+        crop = Crop.objects.create(name='Padi', optimal_moisture_min=60, optimal_moisture_max=85)
+        PlantingRecord.objects.create(farm_plot=cls.plot, crop=crop, planting_date=date(2024, 12, 1), status='growing')
+
+    def setUp(self):
+        # TestCase never commits, so on-commit cache invalidations of earlier tests do not run.
+        cache.clear()
+
+    def ingest(self, *rows):
+        return ingest_readings([{'plot': self.plot.pk, **row} for row in rows], farmer=self.farmer)
+
+    def test_resent_readings_are_not_evaluated_again(self):
+        dry = {'recorded_at': '2025-01-01T08:00:00Z', 'moisture': '30'}
+        self.assertEqual(self.ingest(dry)['advisories'], 1)
+        advisories = AdvisoryLog.objects.count()
+
+        with mock.patch('advisory.views.generate_advisories_bulk', wraps=generate_advisories_bulk) as evaluate:
+            result = self.ingest(dry, {'recorded_at': '2025-01-01T09:00:00Z', 'moisture': '40'})
+        self.assertEqual(result['accepted'], 2)
+        self.assertEqual(result['advisories'], 0)
+        evaluated = evaluate.call_args.args[0]
+        self.assertEqual([reading.moisture for reading in evaluated], [40])
+        self.assertEqual(AdvisoryLog.objects.count(), advisories)
+        self.assertEqual(SensorData.objects.filter(farm_plot=self.plot).count(), 2)
+
+    def test_bulk_endpoint_stores_valid_rows_and_reports_the_rest(self):
+        other = FarmPlot.objects.create(farmer=Farmer.objects.create_user('neighbour'), location='Kodiang, Kedah',
+                                        size_hectares=1, soil_type='clay')
+        self.client.force_login(self.farmer)
+        payload = (
+            'plot,recorded_at,moisture,ph_level\n'
+            f'{self.plot.pk},2025-01-02T08:00:00Z,70,6.5\n'
+            f'{self.plot.pk},2025-01-02T09:00:00Z,abc,\n'
+            f'{other.pk},2025-01-02T08:00:00Z,70,\n'
+        )
+        response = self.client.post(reverse('sensor_data_bulk'), payload, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        result = response.json()
+        self.assertEqual((result['accepted'], result['rejected']), (1, 2))
+        self.assertEqual([row['status'] for row in result['results']], ['accepted', 'rejected', 'rejected'])
+        self.assertEqual(set(result['results'][1]['errors']), {'moisture'})
+        self.assertEqual(set(result['results'][2]['errors']), {'plot'})
+        self.assertEqual(list(SensorData.objects.values_list('farm_plot_id', 'moisture', 'ph_level')),
+                         [(self.plot.pk, Decimal('70.00'), Decimal('6.50'))])
+
+    def test_bulk_endpoint_needs_a_login_or_token(self):
+        response = self.client.post(reverse('sensor_data_bulk'), [], content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class AccountExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('export-farmer')
+        plot = FarmPlot.objects.create(farmer=cls.farmer, location='Kangar, Perlis', size_hectares=1, soil_type='clay')
+        SensorData.objects.bulk_create(reading(plot.pk, minute) for minute in range(5))
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await sync_to_async(self.async_client.force_login)(self.farmer)
+        response = await self.async_client.get(reverse('account_export'))
+        # A sync iterator would be read in full before the first byte is sent.
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        with zipfile.ZipFile(BytesIO(content)) as bundle:
+            self.assertEqual(len(bundle.read('sensor_data.csv').decode().splitlines()), 6)
+
+
+class ArchivedRollupTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        archive_settings = override_settings(SENSOR_ARCHIVE_DIR=archive_dir.name)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+        farmer = Farmer.objects.create_user('archive-farmer')
+        self.plot = FarmPlot.objects.create(farmer=farmer, location='Kuala Perlis, Perlis', size_hectares=1,
+                                            soil_type='sandy')
+        self.hour = datetime(2023, 5, 1, 2, tzinfo=dt_timezone.utc)
+        for minute, moisture in [(0, '60.00'), (20, '70.00')]:
+            SensorData.objects.create(farm_plot=self.plot, moisture=Decimal(moisture),
+                                      recorded_at=self.hour.replace(minute=minute))
+        call_command('archive_sensor_data', older_than=365, stdout=StringIO())
+        self.assertFalse(SensorData.objects.exists())
+
+    def rollup(self, model):
+        row = model.objects.get(farm_plot=self.plot)
+        return row.readings, row.moisture_count, row.moisture_sum, row.moisture_min, row.moisture_max
+
+    def test_rebuild_keeps_archived_history(self):
+        call_command('rebuild_rollups', start='2023-05-01', end='2023-05-01', stdout=StringIO())
+        self.assertEqual(self.rollup(SensorHourlyRollup), (2, 2, 130.0, 60.0, 70.0))
+        self.assertEqual(self.rollup(SensorDailyRollup), (2, 2, 130.0, 60.0, 70.0))
+
+    def test_late_reading_in_an_archived_hour_adds_to_it(self):
+        SensorData.objects.create(farm_plot=self.plot, moisture=Decimal('50.00'),
+                                  recorded_at=self.hour.replace(minute=40))
+        self.assertEqual(self.rollup(SensorHourlyRollup), (3, 3, 180.0, 50.0, 70.0))
+        self.assertEqual(self.rollup(SensorDailyRollup), (3, 3, 180.0, 50.0, 70.0))
+
+    def test_late_reading_at_an_archived_time_replaces_it(self):
+        SensorData.objects.create(farm_plot=self.plot, moisture=Decimal('50.00'), recorded_at=self.hour)
+        self.assertEqual(self.rollup(SensorHourlyRollup), (2, 2, 120.0, 50.0, 70.0))
+
+    def test_readings_newer_than_the_archive_do_not_read_it(self):
+        with mock.patch('farm.rollups.read_range') as read_range:
+            SensorData.objects.create(farm_plot=self.plot, moisture=Decimal('55.00'),
+                                      recorded_at=self.hour + timedelta(days=1))
+        read_range.assert_not_called()
+
+
+class RollupSignalTests(TestCase):
+    def setUp(self):
+        farmer = Farmer.objects.create_user('rollup-farmer')
+        self.plot = FarmPlot.objects.create(farmer=farmer, location='Kangar, Perlis', size_hectares=1,
+                                            soil_type='clay')
+        self.hour = datetime(2025, 3, 1, 2, tzinfo=dt_timezone.utc)
+        for minute, moisture in [(0, '60.00'), (20, '70.00')]:
+            SensorData.objects.create(farm_plot=self.plot, moisture=Decimal(moisture),
+                                      recorded_at=self.hour.replace(minute=minute))
+
+    def rollups(self, model):
+        return list(model.objects.filter(farm_plot=self.plot).order_by('bucket').values_list(
+            'readings', 'moisture_sum', 'moisture_min', 'moisture_max'))
+
+    def test_moving_a_reading_updates_both_hours(self):
+        reading = SensorData.objects.get(recorded_at=self.hour.replace(minute=20))
+        reading.recorded_at = self.hour + timedelta(hours=1)
+        with CaptureQueriesContext(connection) as queries:
+            reading.save()
+        # The stored time comes from the loaded row, not another SELECT.
+        self.assertFalse([query for query in queries if '"SENSOR_DATA"."data_id" =' in query['sql']
+                          and query['sql'].startswith('SELECT')])
+        self.assertEqual(self.rollups(SensorHourlyRollup), [(1, 60.0, 60.0, 60.0), (1, 70.0, 70.0, 70.0)])
+        self.assertEqual(self.rollups(SensorDailyRollup), [(2, 130.0, 60.0, 70.0)])
+
+    def test_deletes_update_the_rollups(self):
+        SensorData.objects.filter(recorded_at=self.hour).delete()
+        self.assertEqual(self.rollups(SensorHourlyRollup), [(1, 70.0, 70.0, 70.0)])
+        self.assertEqual(self.rollups(SensorDailyRollup), [(1, 70.0, 70.0, 70.0)])
+
+        SensorData.objects.get().delete()
+        self.assertEqual(self.rollups(SensorHourlyRollup), [])
+        self.assertEqual(self.rollups(SensorDailyRollup), [])
+
+    def test_plot_delete_does_not_refresh_per_reading(self):
+        with mock.patch('farm.signals.refresh_rollups') as refresh:
+            self.plot.delete()
+        refresh.assert_not_called()
+        self.assertFalse(SensorHourlyRollup.objects.exists())
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_panels_move_on_when_the_change_commits(self):
+        farmer = Farmer.objects.create_user('dashboard-farmer')
+        plot = FarmPlot.objects.create(farmer=farmer, location='Raub, Pahang', size_hectares=1, soil_type='loamy')
+        self.assertEqual(dashboard_panels(farmer.pk)['advisories'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            advisory = AdvisoryLog.objects.create(farmer=farmer, farm_plot=plot, advisory_type='other',
+                                                  title='Check the drains', message='Check the drains')
+            # Until the commit other requests must not cache under a new version.
+            self.assertEqual(dashboard_panels(farmer.pk)['advisories'], [])
+        self.assertEqual(dashboard_panels(farmer.pk)['advisories'], [advisory])
+
+
+class PlotSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('series-farmer')
+        cls.plot = FarmPlot.objects.create(farmer=cls.farmer, location='Lenggong, Perak', size_hectares=1,
+                                           soil_type='loam')
+        cls.start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        readings = SensorData.objects.bulk_create(
+            SensorData(farm_plot=cls.plot, moisture=Decimal(60 + step % 7),
+                       temperature=None if 20 <= step < 30 else Decimal('27.00'),
+                       recorded_at=cls.start + timedelta(minutes=15 * step))
+            for step in range(96)
+        )
+        refresh_rollups(readings)
+
+    def setUp(self):
+        self.client.force_login(self.farmer)
+
+    def test_out_of_range_times_are_rejected(self):
+        url = reverse('plot_series', args=[self.plot.pk])
+        for params in ({'end': '1e300'}, {'start': 'inf'}, {'end': '0001-01-01T00:00:00Z'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_lttb_keeps_the_ends_and_the_peak(self):
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        y[500] = 10
+        kept = lttb(x, y, 50)
+        self.assertEqual(len(kept), 50)
+        self.assertTrue({0, 500, 999} <= set(kept.tolist()))
+        self.assertTrue((np.diff(kept) > 0).all())
+
+    def test_downsample_leaves_a_gap_for_missing_values(self):
+        times = np.arange(100, dtype=float) * 60
+        values = np.ones(100)
+        values[40:50] = np.nan
+        series = downsample(times, values, 20)
+        self.assertIn([40 * 60 * 1000, None], series)
+        self.assertLessEqual(len(series), 21)
+        self.assertEqual(series[0], [0, 1.0])
+        self.assertEqual(series[-1], [99 * 60 * 1000, 1.0])
+
+    def test_busy_ranges_fall_back_to_rollups(self):
+        end = self.start + timedelta(days=1)
+        raw = load_series(self.plot.pk, self.start, end, 500, ['moisture', 'temperature'])
+        self.assertEqual((raw['source'], raw['readings'], len(raw['series']['moisture'])), ('raw', 96, 96))
+        # The missing temperatures split the series at the first of them.
+        self.assertIn([int((self.start + timedelta(minutes=15 * 20)).timestamp() * 1000), None],
+                      raw['series']['temperature'])
+        with override_settings(SENSOR_SERIES_MAX_RAW=50):
+            hourly = load_series(self.plot.pk, self.start, end, 500, ['moisture'])
+        self.assertEqual((hourly['source'], len(hourly['series']['moisture'])), ('hour', 24))
+        first_hour = np.mean([60 + step % 7 for step in range(4)])
+        self.assertAlmostEqual(hourly['series']['moisture'][0][1], round(first_hour, 2))
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('pager-farmer')
+        start = datetime(2025, 2, 1, tzinfo=dt_timezone.utc)
+        for location in ('Alor Setar, Kedah', 'Pendang, Kedah'):
+            plot = FarmPlot.objects.create(farmer=cls.farmer, location=location, size_hectares=1, soil_type='clay')
+            # Both plots share every timestamp, so the pk has to break ties.
+            for hour in range(3):
+                SensorData.objects.create(farm_plot=plot, moisture=70, recorded_at=start + timedelta(hours=hour))
+
+    def test_pages_walk_every_row_once_in_both_directions(self):
+        readings = SensorData.objects.all()
+        expected = list(readings.order_by('-recorded_at', '-pk').values_list('pk', flat=True))
+        paginator = KeysetPaginator(readings, ('-recorded_at', '-pk'), per_page=4)
+        first = paginator.page()
+        self.assertEqual((first.has_previous, first.has_next), (False, True))
+        # A reading stored meanwhile does not shift the next page.
+        SensorData.objects.create(farm_plot=FarmPlot.objects.first(), moisture=70,
+                                  recorded_at=datetime(2025, 3, 1, tzinfo=dt_timezone.utc))
+        second = paginator.page(first.next_cursor)
+        self.assertEqual([row.pk for row in first] + [row.pk for row in second], expected)
+        self.assertEqual((second.has_previous, second.has_next), (True, False))
+        back = paginator.page(second.previous_cursor)
+        self.assertEqual([row.pk for row in back], expected[:4])
+
+    def test_list_view_keeps_the_filter_across_pages(self):
+        plot = FarmPlot.objects.order_by('pk').first()
+        start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        SensorData.objects.bulk_create(
+            SensorData(farm_plot=plot, moisture=70, recorded_at=start + timedelta(hours=hour)) for hour in range(50)
+        )
+        self.client.force_login(self.farmer)
+        first = self.client.get(reverse('sensor_data_list'), {'plot': plot.pk}).context['page']
+        self.assertEqual(len(first), 50)
+        self.assertIn(f'plot={plot.pk}', first.next_query)
+
+        second = self.client.get(reverse('sensor_data_list') + first.next_query).context['page']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next)
+        self.assertEqual({reading.farm_plot_id for reading in second}, {plot.pk})
+
+    def test_bad_cursor_is_a_bad_request(self):
+        self.client.force_login(self.farmer)
+        response = self.client.get(reverse('sensor_data_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SeedDataTests(TestCase):
+    def seed(self, **options):
+        call_command('seed_data', farmers=2, plots_per_farmer=[1, 2], years=0.01, interval=360, price_days=3,
+                     end='2025-01-31', stdout=StringIO(), **options)
+
+    def test_seeds_every_table_and_refuses_to_seed_twice(self):
+        self.seed()
+        plots = FarmPlot.objects.count()
+        self.assertEqual(Farmer.objects.count(), 2)
+        self.assertTrue(2 <= plots <= 4)
+        self.assertTrue(PlantingRecord.objects.exists())
+        readings = SensorData.objects.count()
+        self.assertGreater(readings, 0)
+        self.assertEqual(SensorData.objects.values('farm_plot').distinct().count(), plots)
+        # Rollups cover every reading.
+        self.assertEqual(sum(SensorDailyRollup.objects.values_list('readings', flat=True)), readings)
+        self.assertTrue(MarketPrice.objects.exists())
+
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed(seed=7)
+        self.assertEqual(Farmer.objects.count(), 4)
+
+
+class SummarySignalTests(TestCase):
+    def setUp(self):
+        self.farmer = Farmer.objects.create_user('summary-farmer')
+        self.plot = FarmPlot.objects.create(farmer=self.farmer, location='Kuala Kangsar, Perak', size_hectares=2,
+                                            soil_type='loamy')
+        self.crops = [Crop.objects.create(name=name) for name in ('Keledek', 'Ubi Kayu')]
+        summary_for(self.farmer.pk)
+
+    def assertCountersExact(self):
+        self.assertEqual(rebuild_summaries([self.farmer.pk], save=False), {})
+
+    def selects_from(self, queries, table):
+        return [
+            query['sql'] for query in queries if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+        ]
+
+    def test_saves_of_loaded_rows_do_not_read_them_back(self):
+        AdvisoryLog.objects.create(farmer=self.farmer, farm_plot=self.plot, advisory_type='other', title='Weed',
+                                   message='Weed the plot')
+        PlantingRecord.objects.create(farm_plot=self.plot, crop=self.crops[0], planting_date='2025-02-01')
+        advisory = AdvisoryLog.objects.get()
+        record = PlantingRecord.objects.select_related('farm_plot').get()
+        with CaptureQueriesContext(connection) as captured:
+            advisory.executed = True
+            advisory.save()
+            record.status = 'harvested'
+            record.save()
+        self.assertEqual(self.selects_from(captured.captured_queries, 'ADVISORY_LOG'), [])
+        self.assertEqual(self.selects_from(captured.captured_queries, 'PLANTING_RECORD'), [])
+        self.assertEqual(self.selects_from(captured.captured_queries, 'FARM_PLOT'), [])
+        self.assertCountersExact()
+
+    def test_plot_delete_subtracts_plantings_per_crop(self):
+        PlantingRecord.objects.bulk_create(
+            PlantingRecord(farm_plot=self.plot, crop=self.crops[index % 2], planting_date='2025-02-01',
+                           status='growing')
+            for index in range(20)
+        )
+        rebuild_summaries([self.farmer.pk])
+        other = FarmPlot.objects.create(farmer=self.farmer, location='Lenggong, Perak', size_hectares=1,
+                                        soil_type='clay')
+        PlantingRecord.objects.create(farm_plot=other, crop=self.crops[0], planting_date='2025-02-01',
+                                      status='growing')
+        with CaptureQueriesContext(connection) as captured:
+            self.plot.delete()
+        self.assertEqual(self.selects_from(captured.captured_queries, 'FARM_PLOT'), [])
+        self.assertLess(len(captured.captured_queries), 30)
+        self.assertEqual(summary_for(self.farmer.pk).active_crop_count, 1)
+        self.assertCountersExact()
+
+
+class QueryPlanTests(TestCase):
+    """The views' queries must not read SENSOR_DATA, PLANTING_RECORD or ADVISORY_LOG in full."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('plan-farmer')
+        other = Farmer.objects.create_user('plan-neighbour')
+        crop = Crop.objects.create(name='Tebu', optimal_moisture_min=55, optimal_moisture_max=80)
+        plots = [
+            FarmPlot.objects.create(farmer=owner, location='Bukit Mertajam, Penang', size_hectares=1, soil_type='clay')
+            for owner in (cls.farmer, cls.farmer, other)
+        ]
+        cls.plot = plots[0]
+        PlantingRecord.objects.bulk_create(
+            PlantingRecord(farm_plot=plot, crop=crop, planting_date=date(2025, 1, 1) + timedelta(days=day),
+                           status='growing' if day % 2 else 'harvested')
+            for plot in plots for day in range(30)
+        )
+        now = timezone.now()
+        SensorData.objects.bulk_create(
+            SensorData(farm_plot=plot, moisture=Decimal('65.00'), recorded_at=now - timedelta(minutes=15 * step))
+            for plot in plots for step in range(60)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.farmer)
+
+    def get_pages(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page'].has_next)
+        self.assertEqual(self.client.get(url + response.context['page'].next_query).status_code, 200)
+
+    def test_dashboard_and_plot_views(self):
+        with assert_no_full_scans() as recorder:
+            self.client.get(reverse('dashboard'))
+            self.client.get(reverse('plot_detail', args=[self.plot.pk]))
+            self.client.get(reverse('plot_series', args=[self.plot.pk]), {'start': '2025-01-01T00:00:00Z'})
+        self.assertTrue(recorder.statements)
+
+    def test_list_pages(self):
+        with assert_no_full_scans():
+            self.get_pages(reverse('planting_record_list'))
+            self.get_pages(reverse('sensor_data_list'))
+            self.get_pages(reverse('sensor_data_list'), plot=self.plot.pk)
+
+    def test_full_scan_is_caught(self):
+        with self.assertRaisesMessage(FullScanFound, 'SENSOR_DATA read in full'):
+            with assert_no_full_scans():
+                list(SensorData.objects.filter(notes='calibrated'))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """The list pages stay within their query budgets, page after page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('budget-farmer')
+        crops = [Crop.objects.create(name=name) for name in ('Jagung', 'Ubi Kayu')]
+        plots = [
+            FarmPlot.objects.create(farmer=cls.farmer, location='Kluang, Johor', size_hectares=1, soil_type='loam')
+            for _ in range(2)
+        ]
+        cls.plot = plots[0]
+        PlantingRecord.objects.bulk_create(
+            PlantingRecord(farm_plot=plot, crop=crops[day % 2], planting_date=date(2025, 1, 1) + timedelta(days=day),
+                           status='growing')
+            for plot in plots for day in range(30)
+        )
+        now = timezone.now()
+        SensorData.objects.bulk_create(
+            SensorData(farm_plot=plot, moisture=Decimal('65.00'), recorded_at=now - timedelta(minutes=15 * step))
+            for plot in plots for step in range(60)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.farmer)
+
+    def get_pages(self, url, queries, **params):
+        with assert_query_budget(queries=queries, repeats=1):
+            response = self.client.get(url, params)
+        self.assertTrue(response.context['page'].has_next)
+        with assert_query_budget(queries=queries, repeats=1):
+            self.assertEqual(self.client.get(url + response.context['page'].next_query).status_code, 200)
+
+    def test_list_pages(self):
+        self.get_pages(reverse('planting_record_list'), 4)
+        self.get_pages(reverse('sensor_data_list'), 5)
+        self.get_pages(reverse('sensor_data_list'), 5, plot=self.plot.pk)
+
+    def test_n_plus_one_is_caught(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'likely an N+1'):
+            with assert_query_budget(repeats=1):
+                [record.crop.name for record in PlantingRecord.objects.filter(farm_plot=self.plot)]
+
+    @override_settings(QUERY_BUDGETS={'planting_record_list': {'queries': 2}})
+    def test_strict_middleware_fails_the_request(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, '(budget 2)'):
+            self.client.get(reverse('planting_record_list'))
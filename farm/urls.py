@@ -6,12 +6,17 @@ urlpatterns = [
     path('plots/', views.plot_list, name='plot_list'),
     path('plots/create/', views.plot_create, name='plot_create'),
     path('plots/<int:pk>/', views.plot_detail, name='plot_detail'),
+    path('plots/<int:pk>/series/', views.plot_series, name='plot_series'),
     path('plots/<int:pk>/edit/', views.plot_edit, name='plot_edit'),
     path('plots/<int:pk>/delete/', views.plot_delete, name='plot_delete'),
     path('planting-records/', views.planting_record_list, name='planting_record_list'),
     path('planting-records/create/', views.planting_record_create, name='planting_record_create'),
     path('sensor-data/', views.sensor_data_list, name='sensor_data_list'),
     path('sensor-data/create/', views.sensor_data_create, name='sensor_data_create'),
+    path('sensor-data/bulk/', views.sensor_data_bulk, name='sensor_data_bulk'),
+    path('sensor-data/ingest/', views.sensor_data_ingest, name='sensor_data_ingest'),
+    path('sensor-data/ingest/stats/', views.sensor_ingest_stats, name='sensor_ingest_stats'),
+    path('export/', views.account_export, name='account_export'),
     path('knowledge-base/', views.knowledge_base, name='knowledge_base'),
 ]
 
@@ -1,59 +1,61 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
+from sass.pagination import paginate
+from sass.querybudget import query_budget
 from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from datetime import timedelta
 from .models import FarmPlot, Crop, PlantingRecord, SensorData
+from .coalescer import Backpressure, coalescer_stats, get_coalescer
+from .dashboard import dashboard_panels
+from .export import aiter_account_export, export_filename, iter_account_export
+from .device_auth import authenticate_device, get_request_token, resolve_token
 from .forms import FarmPlotForm, PlantingRecordForm, SensorDataForm
-from advisory.models import AdvisoryLog
+from .ingest import (
+    METRIC_FIELDS, IngestError, clean_batch, iter_payload, ingest_readings, parse_timestamp, store_readings,
+)
+from .series import load_series
 
+Farmer = get_user_model()
 
+# Chart ranges offered on plot_detail.
+CHART_RANGES = {
+    '1d': ('1 day', timedelta(days=1)),
+    '7d': ('7 days', timedelta(days=7)),
+    '30d': ('30 days', timedelta(days=30)),
+    '1y': ('1 year', timedelta(days=365)),
+}
+
+
+# Cold panels cost about 8 queries; a farmer's first visit also counts their summary.
+@query_budget(queries=16, repeats=1)
 @login_required
 def dashboard(request):
-    farmer = request.user
-    plots = FarmPlot.objects.filter(farmer=farmer)
-    total_plots = plots.count()
-    
-    active_plantings = PlantingRecord.objects.filter(
-        farm_plot__farmer=farmer,
-        status__in=['planted', 'growing']
-    )
-    active_crops = active_plantings.values('crop').distinct().count()
-    
-    latest_advisories = AdvisoryLog.objects.filter(
-        farmer=farmer,
-        executed=False
-    ).order_by('-created_at')[:5]
-    
-    latest_sensor_data = SensorData.objects.filter(
-        farm_plot__farmer=farmer
-    ).order_by('-recorded_at')[:5]
-    
-    active_plantings_with_crops = active_plantings.select_related('crop')
-    price_summary = []
-    for planting in active_plantings_with_crops:
-        from market.models import MarketPrice
-        latest_price = MarketPrice.objects.filter(
-            crop=planting.crop
-        ).order_by('-date').first()
-        if latest_price:
-            price_summary.append({
-                'crop': planting.crop.name,
-                'price': latest_price.price_per_kg,
-                'unit': latest_price.unit
-            })
-    
+    # Panels come from the per-farmer fragment cache (see farm.dashboard).
+    panels = dashboard_panels(request.user.pk)
+    summary = panels['summary']
     context = {
-        'total_plots': total_plots,
-        'active_crops': active_crops,
-        'latest_advisories': latest_advisories,
-        'latest_sensor_data': latest_sensor_data,
-        'price_summary': price_summary,
+        'total_plots': summary.plot_count,
+        'active_crops': summary.active_crop_count,
+        'open_advisories': summary.open_advisory_count,
+        'latest_advisories': panels['advisories'],
+        'latest_sensor_data': panels['readings'],
+        'price_summary': panels['prices'],
     }
     return render(request, 'farm/dashboard.html', context)
 
 
+@query_budget(queries=4, repeats=1)
 @login_required
 def plot_list(request):
     plots = FarmPlot.objects.filter(farmer=request.user)
@@ -75,29 +77,61 @@ def plot_create(request):
     return render(request, 'farm/plot_form.html', {'form': form, 'title': 'Create Farm Plot'})
 
 
+@query_budget(queries=5, repeats=1)
 @login_required
 def plot_detail(request, pk):
     plot = get_object_or_404(FarmPlot, pk=pk, farmer=request.user)
-    planting_records = plot.planting_records.all()
-    sensor_data = list(plot.sensor_data.all()[:30])
-    
-    import json
-    sensor_chart_data = {
-        'labels': json.dumps([sd.recorded_at.strftime('%Y-%m-%d %H:%M') for sd in sensor_data]),
-        'moisture': json.dumps([float(sd.moisture) if sd.moisture else 0 for sd in sensor_data]),
-        'temperature': json.dumps([float(sd.temperature) if sd.temperature else 0 for sd in sensor_data]),
-        'humidity': json.dumps([float(sd.humidity) if sd.humidity else 0 for sd in sensor_data]),
-    }
+    planting_records = plot.planting_records.select_related('crop')
+    chart_range = request.GET.get('range')
+    if chart_range not in CHART_RANGES:
+        chart_range = '1d'
     
+    # The chart loads its points from plot_series.
     context = {
         'plot': plot,
         'planting_records': planting_records,
-        'sensor_data': sensor_data,
-        'sensor_chart_data': sensor_chart_data,
+        'chart_range': chart_range,
+        'chart_seconds': int(CHART_RANGES[chart_range][1].total_seconds()),
+        'chart_ranges': [(key, label) for key, (label, _) in CHART_RANGES.items()],
     }
     return render(request, 'farm/plot_detail.html', context)
 
 
+@query_budget(queries=6, repeats=1)
+@login_required
+def plot_series(request, pk):
+    """
+    Chart series for a plot as JSON.
+
+    Query parameters: ``start`` and ``end`` (epoch seconds or ISO 8601;
+    default the last day), ``points`` (target points per metric) and
+    ``metrics`` (comma-separated; default all).
+    """
+    plot = get_object_or_404(FarmPlot, pk=pk, farmer=request.user)
+    try:
+        end = parse_timestamp(request.GET.get('end')) or timezone.now()
+        start = parse_timestamp(request.GET.get('start')) or end - timedelta(days=1)
+    except (ValueError, OverflowError, OSError) as exc:
+        # Out-of-range epochs and dates, and a default start before year 1.
+        return JsonResponse({'error': str(exc)}, status=400)
+    if start >= end:
+        return JsonResponse({'error': 'start must be before end.'}, status=400)
+    
+    max_points = getattr(settings, 'SENSOR_SERIES_MAX_POINTS', 2000)
+    try:
+        points = min(max(int(request.GET.get('points') or 500), 3), max_points)
+    except ValueError:
+        return JsonResponse({'error': 'points must be a whole number.'}, status=400)
+    
+    metrics = [name for name in (request.GET.get('metrics') or '').split(',') if name] or list(METRIC_FIELDS)
+    unknown = [name for name in metrics if name not in METRIC_FIELDS]
+    if unknown:
+        return JsonResponse({'error': f"Unknown metrics: {', '.join(unknown)}."}, status=400)
+    
+    result = load_series(plot.pk, start, end, points, metrics)
+    return JsonResponse({'plot': plot.pk, 'start': start.isoformat(), 'end': end.isoformat(), **result})
+
+
 @login_required
 def plot_edit(request, pk):
     plot = get_object_or_404(FarmPlot, pk=pk, farmer=request.user)
@@ -135,10 +169,12 @@ def planting_record_create(request):
     return render(request, 'farm/planting_record_form.html', {'form': form, 'title': 'Add Planting Record'})
 
 
+@query_budget(queries=4, repeats=1)
 @login_required
 def planting_record_list(request):
-    records = PlantingRecord.objects.filter(farm_plot__farmer=request.user)
-    return render(request, 'farm/planting_record_list.html', {'records': records})
+    records = PlantingRecord.objects.filter(farm_plot__farmer=request.user).select_related('farm_plot', 'crop')
+    page = paginate(request, records, ('-created_at', '-pk'), per_page=25)
+    return render(request, 'farm/planting_record_list.html', {'records': page, 'page': page})
 
 
 @login_required
@@ -156,24 +192,126 @@ def sensor_data_create(request):
     return render(request, 'farm/sensor_data_form.html', {'form': form, 'title': 'Add Sensor Data'})
 
 
+@csrf_exempt
+@require_POST
+def sensor_data_bulk(request):
+    # Devices authenticate with an API token and never touch the session.
+    # Browser sessions go through _sensor_data_bulk_session and its CSRF check.
+    device, token_present = authenticate_device(request)
+    if token_present and device is None:
+        return JsonResponse({'error': 'Invalid or revoked device token.'}, status=401)
+    if device is None:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        return _sensor_data_bulk_session(request)
+    return _ingest_response(request, device=device)
+
+
+@csrf_protect
+def _sensor_data_bulk_session(request):
+    return _ingest_response(request, farmer=request.user)
+
+
+def _ingest_response(request, farmer=None, device=None):
+    try:
+        rows = iter_payload(request, request.content_type)
+        result = ingest_readings(rows, farmer=farmer, device=device)
+    except IngestError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    status = 201 if result['accepted'] else 400
+    return JsonResponse(result, status=status)
+
+
+async def sensor_data_ingest(request):
+    # Async, device-only variant of sensor_data_bulk for ASGI deployments.
+    # Readings go to the in-process write coalescer and the response does
+    # not wait for the database commit.
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    token = get_request_token(request)
+    device = await sync_to_async(resolve_token)(token) if token else None
+    if device is None:
+        return JsonResponse({'error': 'A valid device token is required.'}, status=401)
+    
+    plot_farmers = {device.plot_id: device.farmer_id}
+    try:
+        accepted, results = clean_batch(iter_payload(request, request.content_type), plot_farmers, device)
+    except IngestError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    coalescer = get_coalescer()
+    if coalescer is None:
+        await sync_to_async(store_readings)(accepted, plot_farmers)
+        status = 201
+    else:
+        try:
+            coalescer.submit(accepted, plot_farmers)
+        except Backpressure as exc:
+            response = JsonResponse({'error': str(exc)}, status=503)
+            response['Retry-After'] = '1'
+            return response
+        status = 202
+    
+    return JsonResponse({
+        'accepted': len(accepted),
+        'rejected': len(results) - len(accepted),
+        'queued': status == 202,
+        'results': results,
+    }, status=status if accepted else 400)
+
+
+# csrf_exempt() in Django 4.2 wraps views in a sync function, which would
+# hide the coroutine from the handler, so mark the async view directly.
+sensor_data_ingest.csrf_exempt = True
+
+
+@staff_member_required
+def sensor_ingest_stats(request):
+    return JsonResponse(coalescer_stats())
+
+
+@query_budget(queries=5, repeats=1)
 @login_required
 def sensor_data_list(request):
     plot_id = request.GET.get('plot')
-    sensor_data = SensorData.objects.filter(farm_plot__farmer=request.user)
+    sensor_data = SensorData.objects.filter(farm_plot__farmer=request.user).select_related('farm_plot')
     if plot_id:
         sensor_data = sensor_data.filter(farm_plot_id=plot_id)
-    sensor_data = sensor_data.order_by('-recorded_at')[:50]
+    # With a plot filter each page is a range scan of the (farm_plot, recorded_at) unique index.
+    page = paginate(request, sensor_data, ('-recorded_at', '-pk'), per_page=50)
     
     plots = FarmPlot.objects.filter(farmer=request.user)
     
     context = {
-        'sensor_data': sensor_data,
+        'sensor_data': page,
+        'page': page,
         'plots': plots,
         'selected_plot': int(plot_id) if plot_id else None,
     }
     return render(request, 'farm/sensor_data_list.html', context)
 
 
+# A staff export looks the farmer up with the same query as the session user.
+@query_budget(queries=3, repeats=2)
+@login_required
+def account_export(request):
+    # Staff (agronomists) may export any farmer with ?farmer=<id>. The
+    # archive is built while it is sent, so its queries run after the view.
+    farmer = request.user
+    farmer_id = request.GET.get('farmer')
+    if farmer_id and farmer_id != str(request.user.pk):
+        if not request.user.is_staff:
+            raise PermissionDenied
+        farmer = get_object_or_404(Farmer, pk=int(farmer_id) if farmer_id.isdigit() else None)
+    if isinstance(request, ASGIRequest):
+        chunks = aiter_account_export(farmer.pk)
+    else:
+        chunks = iter_account_export(farmer.pk)
+    response = StreamingHttpResponse(chunks, content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(farmer)}"'
+    return response
+
+
 @login_required
 def knowledge_base(request):
     return render(request, 'farm/knowledge_base.html')
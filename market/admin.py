@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MarketPrice
+from .models import LatestMarketPrice, MarketPrice, PriceAlert
 
 
 @admin.register(MarketPrice)
@@ -9,3 +9,23 @@ class MarketPriceAdmin(admin.ModelAdmin):
     search_fields = ('crop__name', 'source')
     date_hierarchy = 'date'
 
+
+
+@admin.register(LatestMarketPrice)
+class LatestMarketPriceAdmin(admin.ModelAdmin):
+    list_display = ('crop', 'price_per_kg', 'unit', 'date')
+    search_fields = ('crop__name',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PriceAlert)
+class PriceAlertAdmin(admin.ModelAdmin):
+    list_display = ('farmer', 'crop', 'direction', 'threshold', 'is_active', 'last_triggered_at')
+    list_filter = ('direction', 'is_active', 'crop')
+    search_fields = ('farmer__username', 'crop__name')
+    raw_id_fields = ('farmer',)
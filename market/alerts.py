@@ -0,0 +1,105 @@
+"""
+Price alerts.
+
+A PriceAlert fires when its crop's latest price crosses the threshold: an
+"above" alert when the price moves from below the threshold to at or above
+it, a "below" alert the other way round. A price that stays on one side
+does not fire it again.
+
+``refresh_latest_prices`` hands every change of a crop's latest price to
+``notify_price_alerts`` as a PriceMove, so a whole import is matched at
+once. A crop's first price crosses nothing. When a price rises from p to
+q, the alerts that fire are exactly the active "above" alerts of that
+crop with p < threshold <= q: one range on the (crop, direction,
+threshold) index. Matching therefore reads the triggered alerts and
+nothing else, however many farmers subscribe to the crop. Triggered
+alerts are written as AdvisoryLog rows with one bulk insert.
+"""
+from collections import Counter, namedtuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from advisory.models import AdvisoryLog
+from farm.dashboard import invalidate_farmers
+from farm.summary import add_open_advisories
+
+from .models import PriceAlert
+
+PriceMove = namedtuple('PriceMove', ['previous', 'price', 'unit', 'date'])
+
+# Crops matched per query; each adds one or two ranges to the WHERE clause.
+CROPS_PER_QUERY = 200
+UPDATE_BATCH_SIZE = 500
+
+
+def _crossed(crop_id, move):
+    """The alerts of one crop that ``move`` crosses, as a Q of index ranges."""
+    if move.price > move.previous:
+        return Q(crop_id=crop_id, direction='above', threshold__gt=move.previous, threshold__lte=move.price)
+    if move.price < move.previous:
+        return Q(crop_id=crop_id, direction='below', threshold__lt=move.previous, threshold__gte=move.price)
+    return None
+
+
+def crossed_alerts(moves):
+    """The active alerts crossed by ``moves`` (``{crop_id: PriceMove}``), as a queryset."""
+    condition = Q()
+    for crop_id, move in moves.items():
+        crop_range = _crossed(crop_id, move)
+        if crop_range is not None:
+            condition |= crop_range
+    if not condition:
+        return PriceAlert.objects.none()
+    return PriceAlert.objects.filter(condition, is_active=True).select_related('crop')
+
+
+def triggered_alerts(moves):
+    """Return the alerts crossed by ``moves``, matched ``CROPS_PER_QUERY`` crops per query."""
+    moves = list(moves.items())
+    alerts = []
+    for offset in range(0, len(moves), CROPS_PER_QUERY):
+        alerts.extend(crossed_alerts(dict(moves[offset:offset + CROPS_PER_QUERY])))
+    return alerts
+
+
+def render(alert, move):
+    crop = alert.crop.name
+    if alert.direction == 'above':
+        title = f'{crop} price rose to {move.price} {move.unit}/kg'
+        crossing = 'at or above'
+    else:
+        title = f'{crop} price fell to {move.price} {move.unit}/kg'
+        crossing = 'at or below'
+    message = (
+        f'The latest {crop} price, {move.price} {move.unit}/kg on {move.date:%d %b %Y}, is {crossing} '
+        f'your alert threshold of {alert.threshold} (previously {move.previous}).'
+    )
+    return title, message
+
+
+def notify_price_alerts(moves):
+    """Write one advisory per alert that ``moves`` trigger; returns the AdvisoryLog rows."""
+    alerts = triggered_alerts(moves)
+    if not alerts:
+        return []
+    now = timezone.now()
+    logs = []
+    for alert in alerts:
+        title, message = render(alert, moves[alert.crop_id])
+        logs.append(AdvisoryLog(
+            farmer_id=alert.farmer_id,
+            advisory_type='other',
+            title=title,
+            message=message,
+            crop_id=alert.crop_id,
+            priority='medium',
+            created_at=now,
+        ))
+    AdvisoryLog.objects.bulk_create(logs, batch_size=1000)
+    alert_ids = [alert.pk for alert in alerts]
+    for offset in range(0, len(alert_ids), UPDATE_BATCH_SIZE):
+        PriceAlert.objects.filter(pk__in=alert_ids[offset:offset + UPDATE_BATCH_SIZE]).update(last_triggered_at=now)
+    invalidate_farmers((log.farmer_id for log in logs), 'advisories')
+    add_open_advisories(Counter(log.farmer_id for log in logs))
+    return logs
@@ -5,3 +5,5 @@ class MarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'market'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,19 @@
+from django import forms
+from .models import PriceAlert
+
+
+class PriceAlertForm(forms.ModelForm):
+    class Meta:
+        model = PriceAlert
+        fields = ['crop', 'direction', 'threshold']
+        widgets = {
+            'crop': forms.Select(attrs={'class': 'form-control'}),
+            'direction': forms.Select(attrs={'class': 'form-control'}),
+            'threshold': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0.01'}),
+        }
+
+    def clean_threshold(self):
+        threshold = self.cleaned_data['threshold']
+        if threshold <= 0:
+            raise forms.ValidationError('Enter a price above zero.')
+        return threshold
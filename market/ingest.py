@@ -0,0 +1,187 @@
+"""
+Bulk import of market prices.
+
+Price sheets arrive as CSV (``import_market_prices``) or as batches posted
+to ``market_price_bulk`` (JSON, NDJSON or CSV, see ``farm.ingest``). Each
+row names a crop, a date and a price::
+
+    crop,date,price_per_kg,unit,source,notes
+    Rice,2025-03-01,2.45,MYR,FAMA,
+
+``crop`` may be a crop id, a name or ``Name (Variety)``, resolved through
+one preloaded dictionary (``crop_lookup``). Prices are upserted on
+(crop, date, source): a re-sent quote replaces the stored price instead of
+adding a duplicate, so re-running an import is harmless. Writes bypass the
+MarketPrice signals, so callers refresh LatestMarketPrice for the crops
+they touched (``refresh_latest_prices``) once per import.
+
+Rows are validated into plain ``PriceRow`` tuples, so a rejected row
+costs no model instance, and the accepted ones are written with
+``bulk_create(update_conflicts=True)``.
+"""
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from farm.ingest import IngestError
+from farm.models import Crop
+
+from .models import MarketPrice
+from .prices import refresh_latest_prices
+
+PriceRow = namedtuple('PriceRow', ['crop_id', 'date', 'source', 'price_per_kg', 'unit', 'notes'])
+UNIQUE_FIELDS = ['crop', 'date', 'source']
+UPDATE_FIELDS = ['price_per_kg', 'unit', 'notes']
+# A key that names several crops; the row has to use an id or "Name (Variety)".
+AMBIGUOUS = object()
+
+_price_field = MarketPrice._meta.get_field('price_per_kg')
+PRICE_QUANTUM = Decimal(1).scaleb(-_price_field.decimal_places)
+PRICE_BOUND = Decimal(10) ** (_price_field.max_digits - _price_field.decimal_places)
+UNIT_LENGTH = MarketPrice._meta.get_field('unit').max_length
+SOURCE_LENGTH = MarketPrice._meta.get_field('source').max_length
+DEFAULT_UNIT = MarketPrice._meta.get_field('unit').default
+
+
+def max_batch_rows():
+    return getattr(settings, 'MARKET_IMPORT_MAX_ROWS', 10000)
+
+
+def _key(name):
+    return ' '.join(name.split()).casefold()
+
+
+def crop_lookup():
+    """Return ``{key: crop_id}`` for crop ids, names and ``Name (Variety)``, with one query."""
+    lookup = {}
+    for crop_id, name, variety in Crop.objects.values_list('crop_id', 'name', 'variety'):
+        lookup[str(crop_id)] = crop_id
+        keys = {_key(name)}
+        if variety:
+            keys.add(_key(f'{name} ({variety})'))
+        for key in keys:
+            lookup[key] = AMBIGUOUS if lookup.get(key, crop_id) != crop_id else crop_id
+    return lookup
+
+
+def _clean_price(value):
+    try:
+        price = Decimal(str(value).strip()).quantize(PRICE_QUANTUM)
+    except (InvalidOperation, ValueError):
+        raise ValueError('Enter a number.')
+    if not price.is_finite() or price <= 0 or price >= PRICE_BOUND:
+        raise ValueError(f'Enter a positive price below {PRICE_BOUND}.')
+    return price
+
+
+def clean_price(raw, crops, defaults=None):
+    """
+    Validate one raw price row against ``crops`` (see ``crop_lookup``).
+
+    Returns ``(PriceRow, None)`` for a valid row and ``(None, errors)``
+    otherwise. ``defaults`` may supply ``unit`` and ``source`` for sheets
+    that leave them out.
+    """
+    if not isinstance(raw, dict):
+        return None, {'__all__': 'Each price must be an object.'}
+    if '__error__' in raw:
+        return None, {'__all__': raw['__error__']}
+    defaults = defaults or {}
+
+    errors = {}
+    crop = raw.get('crop', raw.get('crop_id'))
+    crop_id = crops.get(_key(str(crop))) if crop not in (None, '') else None
+    if crop_id is AMBIGUOUS:
+        errors['crop'] = 'Several crops have this name; use the crop id or "Name (Variety)".'
+    elif crop_id is None:
+        errors['crop'] = 'Unknown crop.'
+
+    try:
+        day = date.fromisoformat(str(raw.get('date') or '').strip())
+    except ValueError:
+        errors['date'] = 'Enter a date as YYYY-MM-DD.'
+
+    price = raw.get('price_per_kg', raw.get('price'))
+    if price in (None, ''):
+        errors['price_per_kg'] = 'This field is required.'
+    else:
+        try:
+            price = _clean_price(price)
+        except ValueError as exc:
+            errors['price_per_kg'] = str(exc)
+
+    unit = (raw.get('unit') or defaults.get('unit') or DEFAULT_UNIT).strip()
+    if len(unit) > UNIT_LENGTH:
+        errors['unit'] = f'Ensure this value has at most {UNIT_LENGTH} characters.'
+    source = (raw.get('source') or defaults.get('source') or '').strip()
+    if len(source) > SOURCE_LENGTH:
+        errors['source'] = f'Ensure this value has at most {SOURCE_LENGTH} characters.'
+    if errors:
+        return None, errors
+
+    return PriceRow(crop_id, day, source, price, unit, raw.get('notes') or ''), None
+
+
+def write_prices(rows, batch_size=None):
+    """
+    Upsert validated PriceRows on (crop, date, source) in batches.
+
+    Within one call the last row for a key wins. Returns the crop ids
+    written; LatestMarketPrice is not refreshed here.
+    """
+    batch_size = batch_size or getattr(settings, 'MARKET_IMPORT_BATCH_SIZE', 1000)
+    unique = {}
+    for row in rows:
+        unique[(row.crop_id, row.date, row.source)] = row
+    prices = [MarketPrice(**row._asdict()) for row in unique.values()]
+    if not prices:
+        return set()
+
+    features = connection.features
+    with transaction.atomic():
+        if features.supports_update_conflicts:
+            options = {'update_conflicts': True, 'update_fields': UPDATE_FIELDS}
+            if features.supports_update_conflicts_with_target:
+                options['unique_fields'] = UNIQUE_FIELDS
+            MarketPrice.objects.bulk_create(prices, batch_size=batch_size, **options)
+        else:
+            # Replace the stored quotes of each key, then insert.
+            for price in prices:
+                MarketPrice.objects.filter(crop_id=price.crop_id, date=price.date, source=price.source).delete()
+            MarketPrice.objects.bulk_create(prices, batch_size=batch_size)
+    return {price.crop_id for price in prices}
+
+
+def import_prices(raw_rows, crops=None, defaults=None):
+    """
+    Validate and upsert one batch of price rows, then refresh the latest prices.
+
+    Returns a dict with the accepted/rejected counts and one result per
+    input row, in input order.
+    """
+    crops = crop_lookup() if crops is None else crops
+    limit = max_batch_rows()
+    accepted = []
+    results = []
+    for index, raw in enumerate(raw_rows):
+        if index >= limit:
+            raise IngestError(f'Batch exceeds the limit of {limit} prices.')
+        price, errors = clean_price(raw, crops, defaults)
+        if errors:
+            results.append({'row': index, 'status': 'rejected', 'errors': errors})
+        else:
+            accepted.append(price)
+            results.append({'row': index, 'status': 'accepted'})
+
+    with transaction.atomic():
+        crop_ids = write_prices(accepted)
+        if crop_ids:
+            refresh_latest_prices(crop_ids)
+    return {
+        'accepted': len(accepted),
+        'rejected': len(results) - len(accepted),
+        'results': results,
+    }
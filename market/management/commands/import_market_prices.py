@@ -0,0 +1,74 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from market.ingest import clean_price, crop_lookup, write_prices
+from market.prices import refresh_latest_prices
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Import market price sheets or back history from CSV files. '
+        'Columns: crop (id, name or "Name (Variety)"), date, price_per_kg (or price), unit, source, notes. '
+        'Prices are upserted on (crop, date, source), so re-importing a sheet updates it instead of duplicating it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='CSV files to import.')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Rows per transaction (default: 20000).')
+        parser.add_argument('--unit', default='', help='Unit for rows without one (default: the model default).')
+        parser.add_argument('--source', default='', help='Source for rows without one, e.g. the sheet publisher.')
+
+    def handle(self, *args, **options):
+        for path in options['files']:
+            if not os.path.isfile(path):
+                raise CommandError(f'File not found: {path}')
+        chunk_size = max(1, options['chunk_size'])
+        defaults = {'unit': options['unit'], 'source': options['source']}
+        crops = crop_lookup()
+
+        started = time.perf_counter()
+        read = imported = rejected = 0
+        touched = set()
+        chunk = []
+
+        def flush():
+            nonlocal imported
+            with transaction.atomic():
+                touched.update(write_prices(chunk))
+            imported += len(chunk)
+            chunk.clear()
+
+        for path in options['files']:
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                reader = csv.DictReader(handle)
+                fields = set(reader.fieldnames or ())
+                if not {'crop', 'date'} <= fields or not {'price_per_kg', 'price'} & fields:
+                    raise CommandError(f'{path}: header needs "crop", "date" and "price_per_kg" (or "price") columns.')
+                for line_no, raw in enumerate(reader, start=2):
+                    read += 1
+                    price, errors = clean_price(raw, crops, defaults)
+                    if errors:
+                        rejected += 1
+                        if rejected <= MAX_REPORTED_ERRORS:
+                            self.stderr.write(f'{path}:{line_no}: {errors}')
+                        continue
+                    chunk.append(price)
+                    if len(chunk) >= chunk_size:
+                        flush()
+        if chunk:
+            flush()
+        # Once per import rather than per chunk; also invalidates the dashboard price panels.
+        refresh_latest_prices(touched)
+
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported:,} of {read:,} rows ({rejected:,} rejected) for {len(touched):,} crops '
+            f'in {elapsed:.1f}s ({rate:,.0f} rows/s).'
+        ))
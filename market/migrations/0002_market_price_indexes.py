@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketprice',
+            index=models.Index(fields=['crop', '-date'], name='market_price_crop_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketprice',
+            index=models.Index(fields=['-date', '-created_at'], name='market_price_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_latest_prices(apps, schema_editor):
+    MarketPrice = apps.get_model('market', 'MarketPrice')
+    LatestMarketPrice = apps.get_model('market', 'LatestMarketPrice')
+    latest = {}
+    for price in MarketPrice.objects.order_by('crop_id', '-date', '-created_at', '-price_id').iterator():
+        if price.crop_id not in latest:
+            latest[price.crop_id] = LatestMarketPrice(
+                crop_id=price.crop_id, price=price, price_per_kg=price.price_per_kg, unit=price.unit, date=price.date,
+            )
+    LatestMarketPrice.objects.bulk_create(latest.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0006_planting_record_indexes'),
+        ('market', '0002_market_price_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestMarketPrice',
+            fields=[
+                ('crop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_price', serialize=False, to='farm.crop')),
+                ('price_per_kg', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit', models.CharField(max_length=20)),
+                ('date', models.DateField()),
+                ('price', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='market.marketprice')),
+            ],
+            options={
+                'verbose_name': 'Latest Market Price',
+                'verbose_name_plural': 'Latest Market Prices',
+                'db_table': 'MARKET_PRICE_LATEST',
+            },
+        ),
+        migrations.RunPython(fill_latest_prices, migrations.RunPython.noop),
+    ]
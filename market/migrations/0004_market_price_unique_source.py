@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_prices(apps, schema_editor):
+    # Keep the newest quote of each (crop, date, source); it is also the one
+    # LatestMarketPrice can point at, so no latest row is lost.
+    MarketPrice = apps.get_model('market', 'MarketPrice')
+    duplicated = (
+        MarketPrice.objects.values('crop_id', 'date', 'source').annotate(copies=Count('pk')).filter(copies__gt=1)
+    )
+    stale = []
+    for key in duplicated.iterator():
+        copies = MarketPrice.objects.filter(crop_id=key['crop_id'], date=key['date'], source=key['source'])
+        stale.extend(copies.order_by('-created_at', '-price_id').values_list('pk', flat=True)[1:])
+    for offset in range(0, len(stale), 500):
+        MarketPrice.objects.filter(pk__in=stale[offset:offset + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0003_latest_market_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_prices, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='marketprice',
+            name='market_price_crop_date_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='marketprice',
+            constraint=models.UniqueConstraint(fields=('crop', 'date', 'source'), name='unique_market_price_crop_date_source'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0007_farmer_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('market', '0004_market_price_unique_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceAlert',
+            fields=[
+                ('alert_id', models.AutoField(primary_key=True, serialize=False)),
+                ('direction', models.CharField(choices=[('above', 'Rises to or above'), ('below', 'Falls to or below')], max_length=5)),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('crop', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to='farm.crop')),
+                ('farmer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Price Alert',
+                'verbose_name_plural': 'Price Alerts',
+                'db_table': 'MARKET_PRICE_ALERT',
+                'indexes': [models.Index(fields=['crop', 'direction', 'threshold'], name='price_alert_match_idx'), models.Index(fields=['farmer', 'crop'], name='price_alert_farmer_idx')],
+            },
+        ),
+    ]
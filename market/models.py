@@ -1,6 +1,9 @@
+from django.contrib.auth import get_user_model
 from django.db import models
 from farm.models import Crop
 
+Farmer = get_user_model()
+
 
 class MarketPrice(models.Model):
     price_id = models.AutoField(primary_key=True)
@@ -17,7 +20,63 @@ class MarketPrice(models.Model):
         verbose_name = 'Market Price'
         verbose_name_plural = 'Market Prices'
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['-date', '-created_at'], name='market_price_date_idx'),
+        ]
+        constraints = [
+            # One quote per crop, day and source; imports upsert against it.
+            # It also serves the per-crop date range queries.
+            models.UniqueConstraint(fields=['crop', 'date', 'source'], name='unique_market_price_crop_date_source'),
+        ]
     
     def __str__(self):
         return f"{self.crop.name} - {self.price_per_kg} {self.unit} ({self.date})"
 
+
+
+class LatestMarketPrice(models.Model):
+    """The newest MarketPrice of each crop, kept current by ``market.prices.refresh_latest_prices``."""
+    crop = models.OneToOneField(Crop, on_delete=models.CASCADE, primary_key=True, related_name='latest_price')
+    price = models.ForeignKey(MarketPrice, on_delete=models.CASCADE, related_name='+')
+    price_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
+    unit = models.CharField(max_length=20)
+    date = models.DateField()
+
+    class Meta:
+        db_table = 'MARKET_PRICE_LATEST'
+        verbose_name = 'Latest Market Price'
+        verbose_name_plural = 'Latest Market Prices'
+
+    def __str__(self):
+        return f"{self.crop_id}: {self.price_per_kg} {self.unit} ({self.date})"
+
+
+class PriceAlert(models.Model):
+    """A farmer's request to be told when a crop's price crosses a threshold; see ``market.alerts``."""
+    DIRECTION_CHOICES = [
+        ('above', 'Rises to or above'),
+        ('below', 'Falls to or below'),
+    ]
+
+    alert_id = models.AutoField(primary_key=True)
+    # Both foreign keys lead one of the indexes below, which serve their lookups.
+    farmer = models.ForeignKey(Farmer, on_delete=models.CASCADE, related_name='price_alerts', db_index=False)
+    crop = models.ForeignKey(Crop, on_delete=models.CASCADE, related_name='price_alerts', db_index=False)
+    direction = models.CharField(max_length=5, choices=DIRECTION_CHOICES)
+    threshold = models.DecimalField(max_digits=10, decimal_places=2)
+    is_active = models.BooleanField(default=True)
+    last_triggered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'MARKET_PRICE_ALERT'
+        verbose_name = 'Price Alert'
+        verbose_name_plural = 'Price Alerts'
+        indexes = [
+            # Matching reads one threshold range per crop and direction.
+            models.Index(fields=['crop', 'direction', 'threshold'], name='price_alert_match_idx'),
+            models.Index(fields=['farmer', 'crop'], name='price_alert_farmer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.crop_id} {self.direction} {self.threshold} ({self.farmer_id})"
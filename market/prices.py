@@ -0,0 +1,72 @@
+"""
+Latest price per crop.
+
+LatestMarketPrice holds one row per crop with its newest MarketPrice (by
+``date``, then ``created_at``), so pages that show "current price" read it
+with a single join instead of one ``order_by('-date').first()`` per crop.
+Saving or deleting a MarketPrice refreshes its crop through the signals in
+``market.signals``; code that writes prices with ``bulk_create`` or
+``QuerySet.update`` must call ``refresh_latest_prices`` itself.
+
+A refresh that moves a crop's latest price to a newer quote, or re-prices
+the current one, also fires the price alerts it crosses (``market.alerts``).
+"""
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from farm.dashboard import invalidate_crop_prices
+from farm.models import Crop
+
+from .alerts import PriceMove, notify_price_alerts
+from .models import LatestMarketPrice, MarketPrice
+
+LATEST_FIELDS = ['price', 'price_per_kg', 'unit', 'date']
+
+
+def refresh_latest_prices(crop_ids=None):
+    """Recompute LatestMarketPrice for ``crop_ids`` (all crops when ``None``). Returns the rows written."""
+    crops = Crop.objects.all()
+    if crop_ids is not None:
+        crops = crops.filter(pk__in=set(crop_ids))
+    newest = MarketPrice.objects.filter(crop=OuterRef('pk')).order_by('-date', '-created_at', '-price_id')
+    with transaction.atomic():
+        # The current rows are locked before the newest quotes are read, so
+        # concurrent refreshes of a crop take turns: each sees what the last
+        # one wrote and fires (or skips) the alerts of its own move only.
+        current_rows = LatestMarketPrice.objects.select_for_update().filter(crop__in=crops).order_by('pk')
+        previous = {current.crop_id: current for current in current_rows.only('crop_id', 'price_per_kg', 'date')}
+        latest_ids = crops.annotate(latest_id=Subquery(newest.values('price_id')[:1])).values_list('pk', 'latest_id')
+        latest = {}
+        missing = []
+        for crop_id, price_id in latest_ids:
+            if price_id is None:
+                missing.append(crop_id)
+            else:
+                latest[price_id] = crop_id
+        rows = [
+            LatestMarketPrice(crop_id=price.crop_id, price=price, price_per_kg=price.price_per_kg,
+                              unit=price.unit, date=price.date)
+            for price in MarketPrice.objects.filter(pk__in=list(latest))
+        ]
+        moves = {}
+        for row in rows:
+            current = previous.get(row.crop_id)
+            # Deleting the newest quote falls back to an older one; that is not news.
+            if current is not None and row.date >= current.date and row.price_per_kg != current.price_per_kg:
+                moves[row.crop_id] = PriceMove(current.price_per_kg, row.price_per_kg, row.unit, row.date)
+
+        if missing:
+            LatestMarketPrice.objects.filter(crop_id__in=missing).delete()
+        features = connection.features
+        if features.supports_update_conflicts:
+            options = {'update_conflicts': True, 'update_fields': LATEST_FIELDS}
+            if features.supports_update_conflicts_with_target:
+                options['unique_fields'] = ['crop']
+            LatestMarketPrice.objects.bulk_create(rows, batch_size=500, **options)
+        else:
+            LatestMarketPrice.objects.filter(crop_id__in=[row.crop_id for row in rows]).delete()
+            LatestMarketPrice.objects.bulk_create(rows, batch_size=500)
+        if moves:
+            notify_price_alerts(moves)
+    invalidate_crop_prices(*missing, *(row.crop_id for row in rows))
+    return len(rows)
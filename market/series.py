@@ -0,0 +1,108 @@
+"""
+Per-crop market price series, computed in the database.
+
+``price_series`` returns, for every crop with prices in a date range, its
+daily price (the mean of that day's quotes) with 7- and 30-day moving
+averages and the change from the previous priced day, all from one
+grouped query with window functions:
+
+* the moving averages are ``AVG(...) OVER`` frames of ``RANGE 6`` / ``29``
+  days ``PRECEDING`` on a day number, so gaps in the data shorten the
+  window instead of stretching it over older quotes. Quotes from the 29
+  days before ``start`` are read so the first points have full windows;
+* the change comes from ``LAG`` over the crop's days;
+* each crop is downsampled to at most ``points`` points, keeping the last
+  day of each of ``points`` equal runs of days (and so always the latest
+  day). Averages and changes are computed before downsampling.
+
+The query is filtered on the window columns, so the rows that leave the
+database are the ones drawn, whatever the number of crops and quotes.
+"""
+from datetime import date, timedelta
+
+from django.db.models import (
+    Avg, Case, Count, ExpressionWrapper, F, FloatField, Func, IntegerField, Value, When, Window,
+)
+from django.db.models.expressions import RowRange, ValueRange
+from django.db.models.functions import Cast, Floor, Lag
+
+from .models import MarketPrice
+
+MOVING_AVERAGES = {'ma7': 7, 'ma30': 30}
+LOOKBACK_DAYS = max(MOVING_AVERAGES.values()) - 1
+
+
+class DayNumber(Func):
+    """Days since 1970-01-01 of a date column, so window frames can be ranged in days."""
+    output_field = IntegerField()
+    template = "(%(expressions)s - DATE '1970-01-01')"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(julianday(%(expressions)s) - 2440587.5 AS INTEGER)",
+                           **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="(TO_DAYS(%(expressions)s) - 719528)", **extra_context)
+
+
+class OverWindows(ExpressionWrapper):
+    """Arithmetic on window functions; Django would otherwise add it to the GROUP BY."""
+
+    def get_group_by_cols(self):
+        return []
+
+
+class WindowAvg(Func):
+    """``AVG`` for use inside Window() over an aggregate, which Avg() refuses to wrap."""
+    function = 'AVG'
+    window_compatible = True
+    output_field = FloatField()
+
+
+def series_queryset(start, end, crop_ids=None, points=120):
+    """The windowed, downsampled query behind ``price_series``, one row per kept crop-day."""
+    lookback = max(start, date.min + timedelta(days=LOOKBACK_DAYS)) - timedelta(days=LOOKBACK_DAYS)
+    prices = MarketPrice.objects.filter(date__gte=lookback, date__lte=end)
+    if crop_ids is not None:
+        prices = prices.filter(crop_id__in=crop_ids)
+    by_crop = {'partition_by': [F('crop_id')]}
+    by_day = {**by_crop, 'order_by': DayNumber('date').asc()}
+    in_range = Case(When(date__gte=start, then=Value(1)))
+
+    return prices.values('crop_id', 'date').annotate(
+        price=Cast(Avg('price_per_kg'), FloatField()),
+    ).annotate(
+        previous=Window(Lag(Avg('price_per_kg')), **by_day),
+        # Position among the crop's in-range days, and how many there are.
+        position=Window(Count(in_range), frame=RowRange(start=None, end=0), **by_day),
+        days=Window(Count(in_range), **by_crop),
+        **{
+            name: Window(WindowAvg(Avg('price_per_kg')), frame=ValueRange(start=-(width - 1), end=0), **by_day)
+            for name, width in MOVING_AVERAGES.items()
+        },
+    ).annotate(
+        # 1 on the last day of each of ``points`` equal runs of in-range days.
+        keep=OverWindows(
+            Floor(F('position') * points / F('days')) - Floor((F('position') - 1) * points / F('days')),
+            output_field=IntegerField(),
+        ),
+    ).filter(position__gt=0, keep__gt=0).order_by('crop_id', 'date')
+
+
+def price_series(start, end, crop_ids=None, points=120):
+    """
+    Return ``{crop_id: [point, ...]}`` for days in ``[start, end]``, oldest first.
+
+    Each point is a dict with ``date``, ``price``, ``ma7``, ``ma30`` and
+    ``change_pct`` (``None`` on a crop's first priced day).
+    """
+    series = {}
+    for row in series_queryset(start, end, crop_ids, points):
+        previous = float(row['previous']) if row['previous'] is not None else None
+        series.setdefault(row['crop_id'], []).append({
+            'date': row['date'],
+            'price': round(float(row['price']), 2),
+            **{name: round(float(row[name]), 2) for name in MOVING_AVERAGES},
+            'change_pct': round((float(row['price']) - previous) * 100 / previous, 2) if previous else None,
+        })
+    return series
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import MarketPrice
+from .prices import refresh_latest_prices
+
+
+@receiver(pre_save, sender=MarketPrice)
+def market_price_moving(sender, instance, **kwargs):
+    # A price moved to another crop must refresh the crop it left as well.
+    if instance.pk is not None:
+        instance._previous_crop_id = (
+            MarketPrice.objects.filter(pk=instance.pk).values_list('crop_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=MarketPrice)
+@receiver(post_delete, sender=MarketPrice)
+def market_price_changed(sender, instance, **kwargs):
+    refresh_latest_prices({instance.crop_id, getattr(instance, '_previous_crop_id', None)} - {None})
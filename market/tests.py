@@ -0,0 +1,127 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from advisory.models import AdvisoryLog
+from farm.models import Crop
+from sass.querybudget import assert_query_budget
+from sass.queryplans import assert_no_full_scans
+
+from .ingest import import_prices
+from .models import MarketPrice, PriceAlert
+from .series import price_series
+
+Farmer = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    """The market views and price imports must not read MARKET_PRICE or MARKET_PRICE_ALERT in full."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('plan-trader')
+        crops = [Crop.objects.create(name=name) for name in ('Nanas', 'Betik', 'Pisang')]
+        cls.crop = crops[0]
+        today = timezone.localdate()
+        MarketPrice.objects.bulk_create(
+            MarketPrice(crop=crop, price_per_kg=Decimal('2.00') + day % 7, date=today - timedelta(days=day))
+            for crop in crops for day in range(200)
+        )
+        PriceAlert.objects.bulk_create(
+            PriceAlert(farmer=cls.farmer, crop=crop, direction=direction, threshold=Decimal(threshold))
+            for crop in crops for direction, threshold in (('above', '5.00'), ('below', '2.50'))
+        )
+
+    def setUp(self):
+        self.client.force_login(self.farmer)
+
+    def test_market_views(self):
+        with assert_no_full_scans() as recorder:
+            self.client.get(reverse('market_price_list'))
+            self.client.get(reverse('market_price_list'), {'crop': self.crop.pk})
+            self.client.get(reverse('market_price_series'), {'crop': self.crop.pk})
+            self.client.get(reverse('price_alert_list'))
+        self.assertTrue(recorder.statements)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_market_price_list_stays_within_budget(self):
+        for params in ({}, {'crop': self.crop.pk}):
+            with assert_query_budget(queries=6, repeats=1):
+                response = self.client.get(reverse('market_price_list'), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['price_trends'])
+
+    def test_price_import(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with assert_no_full_scans():
+            result = import_prices([{'crop': self.crop.pk, 'date': tomorrow.isoformat(), 'price': '9.00'}])
+        self.assertEqual(result['accepted'], 1)
+
+
+class PriceSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = Farmer.objects.create_user('series-trader')
+        cls.crop = Crop.objects.create(name='Cili')
+        cls.start = date(2025, 1, 1)
+        # Ten priced days, a 20-day gap, then ten more; day d is priced d + 1.
+        cls.days = [*range(10), *range(30, 40)]
+        MarketPrice.objects.bulk_create(
+            MarketPrice(crop=cls.crop, price_per_kg=Decimal(day + 1), date=cls.start + timedelta(days=day),
+                        source=source)
+            for day in cls.days for source in ('FAMA', 'Pasar')
+        )
+
+    def test_moving_averages_span_days_not_rows(self):
+        series = price_series(self.start + timedelta(days=30), self.start + timedelta(days=39))[self.crop.pk]
+        self.assertEqual(len(series), 10)
+        first, last = series[0], series[-1]
+        self.assertEqual((first['date'], first['price']), (self.start + timedelta(days=30), 31.0))
+        # The gap leaves day 30 alone in its 7-day window; its 30-day window reaches back to day 1.
+        self.assertEqual(first['ma7'], 31.0)
+        self.assertEqual(first['ma30'], round((sum(range(2, 11)) + 31) / 10, 2))
+        self.assertEqual(last['ma7'], round(sum(range(34, 41)) / 7, 2))
+        self.assertEqual(first['change_pct'], round((31 - 10) * 100 / 10, 2))
+
+    def test_series_is_downsampled_to_the_latest_day_of_each_run(self):
+        series = price_series(self.start, self.start + timedelta(days=39), points=5)[self.crop.pk]
+        self.assertEqual([point['date'] for point in series],
+                         [self.start + timedelta(days=self.days[position]) for position in (3, 7, 11, 15, 19)])
+
+    def test_dates_near_year_one_are_not_a_server_error(self):
+        self.client.force_login(self.farmer)
+        for params in ({'end': '0001-01-01'}, {'start': '0001-01-05', 'end': '0001-02-01'}):
+            response = self.client.get(reverse('market_price_series'), params)
+            self.assertEqual(response.status_code, 200, params)
+            self.assertEqual(response.json()['crops'], {})
+            self.assertEqual(self.client.get(reverse('market_price_list'), params).status_code, 200)
+
+
+class PriceImportTests(TestCase):
+    def test_resent_quotes_replace_the_stored_price(self):
+        crop = Crop.objects.create(name='Durian')
+        day = timezone.localdate().isoformat()
+        import_prices([{'crop': crop.pk, 'date': day, 'price': '30.00', 'source': 'FAMA'}])
+        first = MarketPrice.objects.get(crop=crop)
+        result = import_prices([
+            {'crop': 'durian', 'date': day, 'price': '32.00', 'source': 'FAMA', 'notes': 'revised'},
+            {'crop': crop.pk, 'date': day, 'price': '31.00', 'source': 'Pasar'},
+        ])
+        self.assertEqual(result['accepted'], 2)
+        stored = MarketPrice.objects.get(crop=crop, source='FAMA')
+        self.assertEqual((stored.pk, stored.price_per_kg, stored.notes), (first.pk, Decimal('32.00'), 'revised'))
+        self.assertEqual(stored.created_at, first.created_at)
+        self.assertEqual(MarketPrice.objects.filter(crop=crop).count(), 2)
+
+    def test_crossing_a_threshold_fires_the_alert_once(self):
+        farmer = Farmer.objects.create_user('alert-trader')
+        crop = Crop.objects.create(name='Manggis')
+        PriceAlert.objects.create(farmer=farmer, crop=crop, direction='above', threshold=Decimal('10.00'))
+        today = timezone.localdate()
+        for offset, price in ((2, '8.00'), (1, '11.00'), (0, '12.00')):
+            import_prices([{'crop': crop.pk, 'date': (today - timedelta(days=offset)).isoformat(), 'price': price}])
+        self.assertEqual(AdvisoryLog.objects.filter(farmer=farmer).count(), 1)
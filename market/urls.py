@@ -3,5 +3,9 @@ from . import views
 
 urlpatterns = [
     path('market-prices/', views.market_price_list, name='market_price_list'),
+    path('market-prices/series/', views.market_price_series, name='market_price_series'),
+    path('market-prices/alerts/', views.price_alert_list, name='price_alert_list'),
+    path('market-prices/alerts/<int:pk>/delete/', views.price_alert_delete, name='price_alert_delete'),
+    path('market-prices/bulk/', views.market_price_bulk, name='market_price_bulk'),
 ]
 
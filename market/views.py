@@ -1,47 +1,199 @@
-from django.shortcuts import render
+import hmac
+import json
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .models import MarketPrice
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
+
+from farm.device_auth import get_request_token
+from farm.ingest import IngestError, iter_payload
 from farm.models import Crop
+from sass.querybudget import query_budget
+from .forms import PriceAlertForm
+from .ingest import import_prices
+from .models import LatestMarketPrice, MarketPrice, PriceAlert
+from .series import MOVING_AVERAGES, price_series
+
+DEFAULT_RANGE = timedelta(days=90)
+
+
+def _parse_day(value, default):
+    if not value:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError('start and end must be dates (YYYY-MM-DD).')
+    return parsed
+
+
+def _series_params(request):
+    """Return ``(start, end, crop_ids, points)`` from the query string; raises ValueError for bad input."""
+    end = _parse_day(request.GET.get('end'), timezone.localdate())
+    start = _parse_day(request.GET.get('start'), max(end, date.min + DEFAULT_RANGE) - DEFAULT_RANGE)
+    if start > end:
+        raise ValueError('start must not be after end.')
+    crop = request.GET.get('crop')
+    if crop and not crop.isdigit():
+        raise ValueError('crop must be a crop id.')
+    max_points = getattr(settings, 'MARKET_SERIES_MAX_POINTS', 365)
+    try:
+        points = min(max(int(request.GET.get('points') or 120), 2), max_points)
+    except ValueError:
+        raise ValueError('points must be a whole number.')
+    return start, end, [int(crop)] if crop else None, points
 
 
+@query_budget(queries=6, repeats=1)
 @login_required
 def market_price_list(request):
-    crop_filter = request.GET.get('crop')
-    prices = MarketPrice.objects.all()
-    
-    if crop_filter:
-        prices = prices.filter(crop_id=crop_filter)
-    
-    prices = prices.order_by('-date')[:100]
-    crops = Crop.objects.all().order_by('name')
-    
-    import json
+    crops = list(Crop.objects.order_by('name'))
+    try:
+        start, end, crop_ids, points = _series_params(request)
+    except ValueError as exc:
+        start, end, crop_ids, points = None, None, None, None
+        error = str(exc)
+    else:
+        error = None
+
     price_trends = {}
-    for price in prices:
-        crop_name = price.crop.name
-        if crop_name not in price_trends:
-            price_trends[crop_name] = {
-                'labels': [],
-                'prices': [],
-                'latest_price': price.price_per_kg,
-                'unit': price.unit
+    prices = []
+    if error is None:
+        # Windowed, downsampled series in one query (see market.series).
+        series = price_series(start, end, crop_ids, points)
+        units = dict(LatestMarketPrice.objects.filter(crop_id__in=list(series)).values_list('crop_id', 'unit'))
+        for crop in crops:
+            trend = series.get(crop.pk)
+            if not trend:
+                continue
+            latest = trend[-1]
+            price_trends[crop.pk] = {
+                'name': crop.name,
+                'labels': json.dumps([point['date'].isoformat() for point in trend]),
+                'prices': json.dumps([point['price'] for point in trend]),
+                **{name: json.dumps([point[name] for point in trend]) for name in MOVING_AVERAGES},
+                'latest_price': latest['price'],
+                'latest_date': latest['date'],
+                'latest_ma7': latest['ma7'],
+                'latest_ma30': latest['ma30'],
+                'change_pct': latest['change_pct'],
+                'unit': units.get(crop.pk, 'MYR'),
             }
-        price_trends[crop_name]['labels'].append(price.date.strftime('%Y-%m-%d'))
-        price_trends[crop_name]['prices'].append(float(price.price_per_kg))
-    
-    # Reverse the order so charts show chronological order (oldest to newest)
-    # Convert to JSON for template
-    for crop_name in price_trends:
-        price_trends[crop_name]['labels'].reverse()
-        price_trends[crop_name]['prices'].reverse()
-        price_trends[crop_name]['labels'] = json.dumps(price_trends[crop_name]['labels'])
-        price_trends[crop_name]['prices'] = json.dumps(price_trends[crop_name]['prices'])
-    
+        prices = MarketPrice.objects.filter(date__gte=start, date__lte=end).select_related('crop')
+        if crop_ids:
+            prices = prices.filter(crop_id__in=crop_ids)
+        prices = prices.order_by('-date', '-created_at')[:100]
+
     context = {
         'prices': prices,
         'crops': crops,
-        'selected_crop': int(crop_filter) if crop_filter else None,
+        'selected_crop': crop_ids[0] if crop_ids else None,
+        'start': start,
+        'end': end,
+        'error': error,
         'price_trends': price_trends,
     }
     return render(request, 'market/market_price_list.html', context)
 
+
+@query_budget(queries=4, repeats=1)
+@login_required
+def market_price_series(request):
+    """
+    Per-crop price series as JSON.
+
+    Query parameters: ``start`` and ``end`` (YYYY-MM-DD; default the last 90
+    days), ``crop`` (a crop id; default all) and ``points`` (most points
+    per crop).
+    """
+    try:
+        start, end, crop_ids, points = _series_params(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    series = price_series(start, end, crop_ids, points)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'crops': {str(crop_id): points for crop_id, points in series.items()},
+    })
+
+
+def _may_import_prices(user):
+    return user.has_perms(['market.add_marketprice', 'market.change_marketprice'])
+
+
+# One upsert statement per MARKET_IMPORT_BATCH_SIZE rows, so the count grows with the batch.
+@query_budget(queries=None, repeats=None)
+@csrf_exempt
+@require_POST
+def market_price_bulk(request):
+    """
+    Upsert a batch of prices (JSON ``{"prices": [...]}``, NDJSON or CSV; see market.ingest).
+
+    Price feeds authenticate with ``Authorization: Token <MARKET_IMPORT_TOKEN>``;
+    browser sessions need the add and change permissions on market prices
+    and go through the regular CSRF check.
+    """
+    token = get_request_token(request)
+    if token is not None:
+        expected = getattr(settings, 'MARKET_IMPORT_TOKEN', '')
+        if not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+            return JsonResponse({'error': 'Invalid import token.'}, status=401)
+        return _import_response(request)
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+    return _market_price_bulk_session(request)
+
+
+@csrf_protect
+def _market_price_bulk_session(request):
+    if not _may_import_prices(request.user):
+        return JsonResponse({'error': 'You may not import market prices.'}, status=403)
+    return _import_response(request)
+
+
+def _import_response(request):
+    try:
+        rows = iter_payload(request, request.content_type, key='prices', csv_columns=('crop', 'date'))
+        result = import_prices(rows)
+    except IngestError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    status = 201 if result['accepted'] else 400
+    return JsonResponse(result, status=status)
+
+
+@query_budget(queries=6, repeats=1)
+@login_required
+def price_alert_list(request):
+    if request.method == 'POST':
+        form = PriceAlertForm(request.POST)
+        if form.is_valid():
+            alert = form.save(commit=False)
+            alert.farmer = request.user
+            alert.save()
+            messages.success(request, 'Price alert created! You will get an advisory when the price crosses it.')
+            return redirect('price_alert_list')
+    else:
+        form = PriceAlertForm(initial={'crop': request.GET.get('crop')})
+    alerts = PriceAlert.objects.filter(farmer=request.user).select_related('crop', 'crop__latest_price').order_by(
+        'crop__name', 'direction', 'threshold',
+    )
+    return render(request, 'market/price_alert_list.html', {'form': form, 'alerts': alerts})
+
+
+@require_POST
+@login_required
+def price_alert_delete(request, pk):
+    alert = get_object_or_404(PriceAlert, pk=pk, farmer=request.user)
+    alert.delete()
+    messages.success(request, 'Price alert deleted.')
+    return redirect('price_alert_list')
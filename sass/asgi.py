@@ -1,5 +1,9 @@
 """
 ASGI config for sass project.
+
+Besides HTTP, the application answers the ASGI lifespan protocol so the
+sensor write coalescer (farm.coalescer) starts with the server and is
+flushed before it exits.
 """
 
 import os
@@ -8,5 +12,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sass.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from advisory.checks import warn_if_process_local_cache  # noqa: E402  (needs the app registry)
+from farm.coalescer import handle_lifespan  # noqa: E402
+
+warn_if_process_local_cache()
+
 
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+        return
+    await django_application(scope, receive, send)
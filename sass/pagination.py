@@ -0,0 +1,128 @@
+"""
+Keyset (cursor) pagination for list views.
+
+Pages are ordered by a unique key such as ``('-created_at', '-pk')`` and
+each page starts after the last row of the previous one with a
+``WHERE (created_at, pk) < (...)`` filter rather than an OFFSET, so page
+100 reads as few rows as page 1 and rows inserted meanwhile do not shift
+or repeat entries. Cursors are opaque URL-safe strings holding the
+direction and the key of the row to continue from; other query parameters
+(filters) are carried over into the page links unchanged.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Q
+
+CURSOR_PARAM = 'cursor'
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    has_next: bool
+    has_previous: bool
+    next_cursor: str = None
+    previous_cursor: str = None
+    # Query strings for the pager links, with the request's other parameters kept.
+    next_query: str = None
+    previous_query: str = None
+    first_query: str = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, whose last field must be unique.
+
+    ``ordering`` uses ``order_by()`` syntax, e.g. ``('-recorded_at', '-pk')``.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+        opts = queryset.model._meta
+        self.model_fields = [opts.pk if name == 'pk' else opts.get_field(name) for name in self.fields]
+
+    def encode(self, row, backwards):
+        values = []
+        for name in self.fields:
+            value = getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps(['p' if backwards else 'n', values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """Return ``(values, backwards)``; raises BadRequest for a cursor this paginator did not make."""
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            if direction not in ('n', 'p') or len(values) != len(self.fields):
+                raise ValueError(cursor)
+            values = [model_field.to_python(value) for model_field, value in zip(self.model_fields, values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise BadRequest('Invalid page cursor.')
+        return values, direction == 'p'
+
+    def _beyond(self, values, backwards):
+        # (a, b) < (x, y) spelled as a < x OR (a = x AND b < y), per field direction.
+        condition = Q()
+        for position, name in enumerate(self.fields):
+            lookup = 'lt' if self.descending[position] != backwards else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            for earlier in range(position):
+                step &= Q(**{self.fields[earlier]: values[earlier]})
+            condition |= step
+        # The OR alone is not a range to most planners; bounding the leading
+        # field as well lets them seek the index instead of skipping to it.
+        lookup = 'lte' if self.descending[0] != backwards else 'gte'
+        return Q(**{f'{self.fields[0]}__{lookup}': values[0]}) & condition
+
+    def page(self, cursor=None):
+        values, backwards = self.decode(cursor) if cursor else (None, False)
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._beyond(values, backwards))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, values is not None
+        return KeysetPage(
+            object_list=rows,
+            has_next=bool(rows) and has_next,
+            has_previous=bool(rows) and has_previous,
+            next_cursor=self.encode(rows[-1], False) if rows and has_next else None,
+            previous_cursor=self.encode(rows[0], True) if rows and has_previous else None,
+        )
+
+
+def paginate(request, queryset, ordering, per_page):
+    """Return the KeysetPage for ``request``'s ``cursor`` parameter, with pager query strings filled in."""
+    page = KeysetPaginator(queryset, ordering, per_page).page(request.GET.get(CURSOR_PARAM) or None)
+    params = request.GET.copy()
+    params.pop(CURSOR_PARAM, None)
+    page.first_query = f'?{params.urlencode()}'
+    for attribute, cursor in (('next_query', page.next_cursor), ('previous_query', page.previous_cursor)):
+        if cursor:
+            params[CURSOR_PARAM] = cursor
+            setattr(page, attribute, f'?{params.urlencode()}')
+    return page
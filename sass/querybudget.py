@@ -0,0 +1,167 @@
+"""
+Per-request query budgets.
+
+``QueryBudgetMiddleware`` records every query a request runs (through
+``connection.execute_wrapper``) and checks the total against the view's
+budget:
+
+* ``queries``: statements per request,
+* ``time_ms``: milliseconds spent in the database,
+* ``repeats``: times one SQL shape (the statement with literals and
+  ``IN`` lists collapsed) may run; more than that is usually an N+1.
+
+A view declares its budget with ``@query_budget(...)``; ``QUERY_BUDGETS``
+overrides it by URL name, and anything left unset falls back to
+``QUERY_BUDGET_DEFAULT``. ``None`` switches a limit off.
+
+Violations are logged as warnings on ``sass.querybudget``. With
+``QUERY_BUDGET_STRICT`` on (the default under ``manage.py test``; set it
+in CI too) the middleware raises QueryBudgetExceeded instead, so a test
+client request fails the test; ``assert_query_budget`` applies the same
+checks to a block of test code.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+LIMITS = ('queries', 'time_ms', 'repeats')
+DEFAULT_BUDGET = {'queries': 50, 'time_ms': None, 'repeats': 5}
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN \(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_shape(sql):
+    """Return ``sql`` with literals and ``IN`` lists collapsed, so repeats of one query compare equal."""
+    shape = _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+    return ' '.join(shape.split())
+
+
+def query_budget(**limits):
+    """Declare a view's budget, e.g. ``@query_budget(queries=8, repeats=2)``."""
+    unknown = set(limits) - set(LIMITS)
+    if unknown:
+        raise TypeError(f'Unknown query budget limits: {", ".join(sorted(unknown))}')
+
+    def decorator(view):
+        view.query_budget = limits
+        return view
+    return decorator
+
+
+def default_budget():
+    budget = dict(DEFAULT_BUDGET)
+    budget.update(getattr(settings, 'QUERY_BUDGET_DEFAULT', {}))
+    return budget
+
+
+def budget_for(match):
+    """Return the budget of a resolved URL (``request.resolver_match``)."""
+    budget = default_budget()
+    if match is not None:
+        budget.update(getattr(match.func, 'query_budget', {}))
+        budget.update(getattr(settings, 'QUERY_BUDGETS', {}).get(match.view_name, {}))
+    return budget
+
+
+class QueryRecorder:
+    """Context manager that records ``(sql, seconds)`` for every query on every connection."""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def time_ms(self):
+        return sum(seconds for _, seconds in self.queries) * 1000
+
+    def repeated(self, limit):
+        """Return ``[(shape, count)]`` for SQL shapes that ran more than ``limit`` times."""
+        counts = Counter(sql_shape(sql) for sql, _ in self.queries)
+        return [(shape, count) for shape, count in counts.most_common() if count > limit]
+
+    def violations(self, budget):
+        """Describe each way the recorded queries exceed ``budget``."""
+        problems = []
+        if budget.get('queries') is not None and len(self.queries) > budget['queries']:
+            problems.append(f'{len(self.queries)} queries (budget {budget["queries"]})')
+        if budget.get('time_ms') is not None and self.time_ms > budget['time_ms']:
+            problems.append(f'{self.time_ms:.1f} ms in SQL (budget {budget["time_ms"]} ms)')
+        if budget.get('repeats') is not None:
+            for shape, count in self.repeated(budget['repeats']):
+                problems.append(f'{count} x the same query, likely an N+1 (budget {budget["repeats"]}): {shape[:300]}')
+        return problems
+
+
+def _strict():
+    return getattr(settings, 'QUERY_BUDGET_STRICT', False)
+
+
+@contextmanager
+def assert_query_budget(**limits):
+    """
+    Fail if the block exceeds ``limits`` (on top of QUERY_BUDGET_DEFAULT).
+
+    Yields the QueryRecorder, e.g.::
+
+        with assert_query_budget(queries=6, repeats=1):
+            client.get(reverse('advisory_list'))
+    """
+    budget = default_budget()
+    budget.update(limits)
+    with QueryRecorder() as recorder:
+        yield recorder
+    problems = recorder.violations(budget)
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems))
+
+
+class QueryBudgetMiddleware:
+    """Check each request against its view's query budget; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', True):
+            return self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        if match is None or match.namespace in getattr(settings, 'QUERY_BUDGET_SKIP_NAMESPACES', ('admin',)):
+            return response
+        problems = recorder.violations(budget_for(match))
+        if problems:
+            message = f'Query budget exceeded on {request.method} {request.path} ({match.view_name}): ' + '; '.join(problems)
+            if _strict():
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
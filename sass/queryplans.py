@@ -0,0 +1,96 @@
+"""
+Query plan checks for tests.
+
+``assert_no_full_scans`` records the SELECTs a block of test code runs,
+usually test client requests to the views, and EXPLAINs each of them
+afterwards. It fails if a plan reads one of ``LARGE_TABLES`` in full. The
+statements come from the code under test, so the check follows the views
+as they change instead of a copy of their querysets::
+
+    with assert_no_full_scans():
+        self.client.get(reverse('sensor_data_list'))
+
+Test tables are tiny, and PostgreSQL would rather scan a tiny table than
+use an index. Sequential scans are therefore disabled while the plans are
+explained there, so a scan shows up only when no index can serve the
+query. Only SQLite and PostgreSQL plans are understood.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+
+# Tables that grow with usage; a full scan of any of them is a regression.
+LARGE_TABLES = ('SENSOR_DATA', 'ADVISORY_LOG', 'MARKET_PRICE', 'PLANTING_RECORD', 'MARKET_PRICE_ALERT')
+
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?"?(\w+)"?(.*)$')
+POSTGRES_SCAN = re.compile(r'Seq Scan on "?(\w+)"?', re.IGNORECASE)
+
+
+class FullScanFound(AssertionError):
+    pass
+
+
+def explain(sql, params=()):
+    """Return the plan of ``sql`` as text."""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def full_scans(plan):
+    """Return the large tables a plan reads in full."""
+    tables = set()
+    for line in plan.splitlines():
+        if connection.vendor == 'sqlite':
+            match = SQLITE_SCAN.search(line)
+            # "SCAN t USING INDEX i" walks an index in order (ORDER BY ... LIMIT); a bare "SCAN t" reads every row.
+            if match and 'USING' not in match.group(2):
+                tables.add(match.group(1))
+        else:
+            tables.update(POSTGRES_SCAN.findall(line))
+    return sorted(table for table in tables if table.upper() in LARGE_TABLES)
+
+
+class SelectRecorder:
+    """``execute_wrapper`` that keeps the distinct ``(sql, params)`` of every SELECT."""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.statements.setdefault((sql, tuple(params or ())), None)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def assert_no_full_scans():
+    """Fail if a SELECT run in the block reads a large table in full; yields the SelectRecorder."""
+    recorder = SelectRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+    problems = []
+    with _index_scans_preferred():
+        for sql, params in recorder.statements:
+            plan = explain(sql, params)
+            scans = full_scans(plan)
+            if scans:
+                problems.append(f'{", ".join(scans)} read in full by: {sql}\n    ' + plan.replace('\n', '\n    '))
+    if problems:
+        raise FullScanFound('\n'.join(problems))
+
+
+@contextmanager
+def _index_scans_preferred():
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = on')
@@ -3,6 +3,7 @@ Django settings for sass project.
 """
 
 import os
+import sys
 from pathlib import Path
 import dj_database_url # Library penting untuk database Render
 from dotenv import load_dotenv
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # <--- WAJIB ADA (Posisikan di sini)
+    'sass.querybudget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -144,4 +146,90 @@ AUTH_USER_MODEL = 'auth_app.Farmer'
 # Login URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
-LOGOUT_REDIRECT_URL = 'login'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'login'
+
+# Sensor ingestion
+# Maximum readings accepted per bulk request and rows per INSERT statement.
+SENSOR_INGEST_MAX_ROWS = int(os.getenv('SENSOR_INGEST_MAX_ROWS', '10000'))
+SENSOR_INGEST_BATCH_SIZE = int(os.getenv('SENSOR_INGEST_BATCH_SIZE', '1000'))
+# Seconds a resolved device token stays in the in-process cache. Revocations
+# reach every process sharing the cache (REDIS_URL) on their next request;
+# with the per-process LocMemCache other processes see them within this window.
+SENSOR_DEVICE_CACHE_TTL = int(os.getenv('SENSOR_DEVICE_CACHE_TTL', '60'))
+# Async ingestion (served under ASGI): flush queued readings every N ms or
+# M rows, whichever comes first; reject new batches once the queue is full.
+SENSOR_COALESCE_INTERVAL_MS = int(os.getenv('SENSOR_COALESCE_INTERVAL_MS', '200'))
+SENSOR_COALESCE_MAX_ROWS = int(os.getenv('SENSOR_COALESCE_MAX_ROWS', '1000'))
+SENSOR_COALESCE_QUEUE_SIZE = int(os.getenv('SENSOR_COALESCE_QUEUE_SIZE', '50000'))
+# A failed flush is retried with backoff (N retries, first wait in ms), then
+# written per device and per reading; rows that still fail are appended to
+# the dead-letter CSV (replay with import_sensor_csv).
+SENSOR_COALESCE_RETRIES = int(os.getenv('SENSOR_COALESCE_RETRIES', '3'))
+SENSOR_COALESCE_BACKOFF_MS = int(os.getenv('SENSOR_COALESCE_BACKOFF_MS', '100'))
+SENSOR_DEAD_LETTER_PATH = os.getenv('SENSOR_DEAD_LETTER_PATH', str(BASE_DIR / 'dead_letter' / 'sensor_readings.csv'))
+
+# Market price import (market/ingest.py): prices accepted per bulk request
+# and rows per upsert statement. Price feeds post to market_price_bulk with
+# "Authorization: Token <MARKET_IMPORT_TOKEN>"; leave it empty to allow
+# only signed-in users with the market price permissions.
+MARKET_IMPORT_MAX_ROWS = int(os.getenv('MARKET_IMPORT_MAX_ROWS', '10000'))
+MARKET_IMPORT_BATCH_SIZE = int(os.getenv('MARKET_IMPORT_BATCH_SIZE', '1000'))
+MARKET_IMPORT_TOKEN = os.getenv('MARKET_IMPORT_TOKEN', '')
+
+# Cache
+# Advisory planting entries and dashboard panels live here. Set REDIS_URL so
+# web, ASGI and ingest_server processes share one cache and see each other's
+# invalidations; otherwise each process keeps its own, which servers log as a
+# warning at start (advisory.W001). A dashboard takes a dozen or so entries
+# per farmer; LocMemCache evicts beyond CACHE_MAX_ENTRIES (Django's default
+# is only 300).
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sass',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '100000'))},
+        }
+    }
+# Upper bound in seconds on how long a cached planting or crop range can
+# outlive a change that bypassed the model signals.
+ADVISORY_PLANTING_CACHE_TTL = int(os.getenv('ADVISORY_PLANTING_CACHE_TTL', '3600'))
+# Seconds between checks of the advisory rules' version (ADVISORY_RULE count and
+# latest updated_at); a rule edit reaches every process within this time.
+ADVISORY_RULES_CHECK_SECONDS = int(os.getenv('ADVISORY_RULES_CHECK_SECONDS', '5'))
+# Upper bound in seconds on how long a cached dashboard panel can outlive a
+# change that bypassed the model signals and bulk writers.
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '600'))
+
+# Query budgets (see sass/querybudget.py): per-request limits on statements,
+# milliseconds of SQL and repeats of one SQL shape (N+1). Views declare theirs
+# with @query_budget; QUERY_BUDGETS overrides by URL name, e.g.
+# {'advisory_list': {'queries': 8}}. Violations are logged, except under
+# `manage.py test` and wherever QUERY_BUDGET_STRICT=true (CI), where they raise.
+TESTING = sys.argv[1:2] == ['test']
+QUERY_BUDGET_ENABLED = os.getenv('QUERY_BUDGET_ENABLED', 'True').lower() == 'true'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', str(TESTING)).lower() == 'true'
+QUERY_BUDGET_DEFAULT = {'queries': 50, 'time_ms': None, 'repeats': 5}
+QUERY_BUDGETS = {}
+# Anomaly advisories: EWMA weight of a new reading, z-score limit, readings
+# before z-scores are trusted, and minutes between alerts per plot and metric.
+# ADVISORY_ANOMALY_RATE_LIMITS may override the per-hour rate limits by metric.
+ADVISORY_ANOMALY_ALPHA = float(os.getenv('ADVISORY_ANOMALY_ALPHA', '0.05'))
+ADVISORY_ANOMALY_Z_LIMIT = float(os.getenv('ADVISORY_ANOMALY_Z_LIMIT', '4.0'))
+ADVISORY_ANOMALY_WARMUP = int(os.getenv('ADVISORY_ANOMALY_WARMUP', '30'))
+ADVISORY_ANOMALY_COOLDOWN_MINUTES = int(os.getenv('ADVISORY_ANOMALY_COOLDOWN_MINUTES', '60'))
+# Plot chart series: ranges with more raw readings than this are drawn from
+# the rollups; SENSOR_SERIES_MAX_POINTS caps the points a client may request.
+SENSOR_SERIES_MAX_RAW = int(os.getenv('SENSOR_SERIES_MAX_RAW', '50000'))
+SENSOR_SERIES_MAX_POINTS = int(os.getenv('SENSOR_SERIES_MAX_POINTS', '2000'))
+# Retention: archive_sensor_data moves readings older than this many days
+# into per-plot, per-month NumPy files under SENSOR_ARCHIVE_DIR.
+SENSOR_RETENTION_DAYS = int(os.getenv('SENSOR_RETENTION_DAYS', '365'))
+SENSOR_ARCHIVE_DIR = os.getenv('SENSOR_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'sensor'))
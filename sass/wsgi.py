@@ -10,3 +10,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sass.settings')
 
 application = get_wsgi_application()
 
+from advisory.checks import warn_if_process_local_cache  # noqa: E402  (needs the app registry)
+
+warn_if_process_local_cache()
+